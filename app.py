@@ -2,12 +2,57 @@
 
 import html
 import io
+import os
 import time
+import zipfile
+from collections import OrderedDict
+from pathlib import Path
+from typing import TYPE_CHECKING
 
-import numpy as np
 import streamlit as st
 from PIL import Image
-from sklearn.ensemble import RandomForestClassifier
+
+from cipher_engine import (
+    CODEC_NAMES,
+    CODEC_NONE,
+    DEFAULT_OUTPUT,
+    FORMAT_SHARD,
+    FORMAT_TEXT,
+    MODEL_VERSION,
+    OUTPUT_FORMATS,
+    ImageHandle,
+    JobQueue,
+    ResultCache,
+    analyze_batch,
+    analyze_frames,
+    available_outputs,
+    choose_codec,
+    content_key,
+    embed_message_inplace,
+    embed_stream_inplace,
+    embed_frames,
+    embed_shards,
+    encode_output,
+    extract_frames,
+    extract_message,
+    extract_shards,
+    extract_stream,
+    feature_schema_hash,
+    heatmap_overlay,
+    load_steganalysis_model,
+    localize,
+    locate,
+    memory_budget,
+    model_loaded,
+    shard_capacity,
+    span,
+    warm_up,
+    warm_up_enabled,
+)
+from cipher_engine.compression import SAMPLE_SIZE
+
+if TYPE_CHECKING:
+    from sklearn.ensemble import RandomForestClassifier
 
 st.set_page_config(
     page_title="Cipher Engine",
@@ -16,9 +61,126 @@ st.set_page_config(
     initial_sidebar_state="collapsed",
 )
 
-MESSAGE_DELIMITER = "#####"
-ANALYSIS_RESOLUTION = (128, 128)
-RANDOM_SEED = 42
+
+@st.cache_resource
+def result_cache() -> ResultCache:
+    """Decode and analysis results shared by every session, keyed by upload content."""
+    return ResultCache()
+
+
+@st.cache_resource
+def model_warm_up():
+    """Load scikit-learn and the model on a background thread, once per process."""
+    return warm_up()
+
+
+@st.cache_resource
+def job_queue() -> JobQueue:
+    """Encode, decode and analysis jobs of every session, run a bounded number at a time."""
+    return JobQueue()
+
+
+SESSION_HANDLES = 3
+PROGRESS_INTERVAL = 0.5
+
+
+def upload_key(upload, *parts) -> str:
+    # getvalue() shares the upload's buffer; getbuffer() would copy it first.
+    with span("hash"):
+        return content_key(upload.getvalue(), *parts)
+
+
+def ingest(upload) -> ImageHandle:
+    """This session's handle for an uploaded image, shared by reruns and tabs.
+
+    Uploads are hashed once per ``file_id``; the same image uploaded in two
+    tabs maps to one handle, so its pixels are decoded at most once. The
+    session keeps the most recently used ``SESSION_HANDLES`` handles.
+    """
+    handles = st.session_state.setdefault("ingest_handles", OrderedDict())
+    keys = st.session_state.setdefault("ingest_keys", {})
+    file_id = getattr(upload, "file_id", None)
+    key = keys.get(file_id)
+    if key is None:
+        key = upload_key(upload)
+        if file_id is not None:
+            keys[file_id] = key
+    handle = handles.get(key)
+    if handle is None:
+        handle = handles[key] = ImageHandle(upload.getvalue(), key)
+        while len(handles) > SESSION_HANDLES:
+            handles.popitem(last=False)
+        for stale in [fid for fid, k in keys.items() if k not in handles]:
+            del keys[stale]
+    handles.move_to_end(key)
+    return handle
+
+
+def pool_workers() -> int:
+    # Frame and shard jobs fan out to worker processes. A job submitted now
+    # gets an even share of the cores with the jobs already running: all of
+    # them when it runs alone.
+    queue = job_queue()
+    sharing = min(queue.stats().running + 1, queue.workers)
+    return max(1, (os.cpu_count() or 1) // sharing)
+
+
+def cached(cache: ResultCache, key: str, compute):
+    """``compute()`` through the shared result cache, and whether it was a hit."""
+    hit = key in cache
+    return cache.get_or_compute(key, compute), hit
+
+
+def submit_job(tab: str, label: str, title: str, fn, *args, **meta) -> None:
+    """Queue ``fn(*args)`` as this session's job in ``tab``, replacing the one shown there."""
+    job = job_queue().submit(label, fn, *args, meta=dict(meta, title=title))
+    st.session_state.setdefault("jobs", {})[tab] = job.id
+
+
+def render_job(tab: str, renderers, failure: str) -> None:
+    """This session's job in ``tab``: live progress while it runs, then its result panel.
+
+    Finished jobs stay in the queue, so their results and downloads survive
+    reruns; ``renderers`` maps job labels to the functions drawing them.
+    """
+    job_id = st.session_state.get("jobs", {}).get(tab)
+    if job_id is None:
+        return
+    job = job_queue().get(job_id)
+    if job is None:
+        st.write("")
+        st.info("The last result has expired. Run it again.")
+    elif not job.done:
+        render_progress(job_id)
+    elif job.error is not None:
+        st.error(f"{failure}: {job.error}")
+    else:
+        renderers[job.label](job)
+
+
+@st.fragment(run_every=PROGRESS_INTERVAL)
+def render_progress(job_id: str) -> None:
+    # Only this fragment reruns while the job is in flight; the whole script
+    # reruns once to draw the result.
+    queue = job_queue()
+    job = queue.get(job_id)
+    if job is None or job.done:
+        st.rerun()
+    title = job.meta["title"]
+    report = job.progress
+    if job.started is None:
+        stats = queue.stats()
+        fraction = 0.0
+        text = f"{title} queued · {stats.running} of {stats.workers} workers busy"
+    elif report is None:
+        fraction = 0.0
+        text = f"{title} {time.time() - job.started:.1f}s"
+    else:
+        fraction = report.fraction or 0.0
+        done = f"{report.done:,} / {report.total:,}" if report.total else f"{report.done:,}"
+        text = f"{title} {done} {report.unit} · {time.time() - job.started:.1f}s"
+    st.write("")
+    st.progress(fraction, text=text)
 
 
 def inject_styles() -> None:
@@ -241,119 +403,103 @@ def inject_styles() -> None:
     )
 
 
-@st.cache_data
-def text_to_binary(text: str) -> str:
-    return "".join(format(ord(c), "08b") for c in text)
-
-
-@st.cache_data
-def binary_to_text(binary: str) -> str:
-    aligned = binary[: len(binary) - (len(binary) % 8)]
-    try:
-        return "".join(chr(int(aligned[i : i + 8], 2)) for i in range(0, len(aligned), 8))
-    except Exception:
-        return ""
-
-
-def embed_message(image: Image.Image, message: str) -> Image.Image:
-    arr = np.array(image)
-    if arr.ndim != 3:
-        raise ValueError("Image must be RGB (3 channels).")
-
-    bitstream = text_to_binary(message + MESSAGE_DELIMITER)
-    if len(bitstream) > arr.size:
-        raise ValueError(
-            f"Payload size ({len(bitstream)} bits) exceeds image capacity ({arr.size} bits)."
-        )
-
-    flat = arr.flatten()
-    bits = np.array([int(b) for b in bitstream], dtype=np.uint8)
-    flat[: len(bits)] = (flat[: len(bits)] & 0xFE) | bits
-
-    return Image.fromarray(flat.reshape(arr.shape).astype("uint8"))
-
-
-def extract_message(image: Image.Image) -> str:
-    flat = np.array(image).flatten()
-    decoded = np.packbits(flat & 1).tobytes().decode("utf-8", errors="ignore")
-    if MESSAGE_DELIMITER in decoded:
-        return decoded.split(MESSAGE_DELIMITER)[0]
-    return "No valid hidden message detected."
-
-
-def extract_features(image: Image.Image) -> np.ndarray:
-    arr = np.array(image.resize(ANALYSIS_RESOLUTION).convert("RGB"))
-    hist, _ = np.histogram(arr, bins=256, range=(0, 256))
-    probs = hist / hist.sum()
-    nonzero = probs[probs > 0]
-    entropy = -np.sum(nonzero * np.log2(nonzero))
-    return np.array([
-        np.mean(arr),
-        np.var(arr),
-        entropy,
-        np.var(arr & 1),
-        np.mean(np.abs(np.diff(arr.astype(float), axis=1))),
-    ]).reshape(1, -1)
-
-
-@st.cache_resource
-def load_steganalysis_model() -> RandomForestClassifier:
-    X, y = [], []
-
-    for _ in range(50):
-        img = np.random.randint(0, 256, (*ANALYSIS_RESOLUTION, 3), dtype=np.uint8) & 0xFE
-        X.append(extract_features(Image.fromarray(img))[0])
-        y.append(0)
-
-    for _ in range(50):
-        base = np.random.randint(0, 256, (*ANALYSIS_RESOLUTION, 3), dtype=np.uint8)
-        noise = np.random.randint(0, 2, (*ANALYSIS_RESOLUTION, 3), dtype=np.uint8)
-        X.append(extract_features(Image.fromarray((base & 0xFE) | noise))[0])
-        y.append(1)
-
-    clf = RandomForestClassifier(n_estimators=50, max_depth=5, random_state=RANDOM_SEED)
-    clf.fit(X, y)
-    return clf
-
-
-def stego_probability(image: Image.Image, model: RandomForestClassifier) -> float:
-    return model.predict_proba(extract_features(image))[0][1]
-
-
 def render_encode_tab() -> None:
     col_input, col_params = st.columns([1, 1], gap="medium")
 
     with col_input:
         st.markdown("#### Carrier Image")
-        uploaded_carrier = st.file_uploader(
-            "Upload Image", type=["png", "jpg"], key="enc_u", label_visibility="collapsed"
-        )
+        shard_carriers = []
+        uploaded_carrier = None
+        if st.checkbox("Shard across several carriers", key="enc_shard"):
+            shard_carriers = st.file_uploader(
+                "Upload Images",
+                type=["png", "jpg", "gif"],
+                accept_multiple_files=True,
+                key="enc_us",
+                label_visibility="collapsed",
+            )
+        else:
+            uploaded_carrier = st.file_uploader(
+                "Upload Image", type=["png", "jpg", "gif"], key="enc_u", label_visibility="collapsed"
+            )
 
     with col_params:
         st.markdown("#### Message Payload")
-        secret_message = st.text_area(
-            "Message",
-            placeholder="Enter secure payload data...",
-            height=100,
-            label_visibility="collapsed",
+        payload_mode = st.radio(
+            "Payload", ["Text", "File"], horizontal=True, key="enc_mode", label_visibility="collapsed"
+        )
+        secret_message = ""
+        payload_file = None
+        if payload_mode == "Text":
+            secret_message = st.text_area(
+                "Message",
+                placeholder="Enter secure payload data...",
+                height=100,
+                label_visibility="collapsed",
+            )
+            payload_size = len(secret_message.encode("utf-8"))
+        else:
+            payload_file = st.file_uploader("Payload File", key="enc_f", label_visibility="collapsed")
+            payload_size = payload_file.size if payload_file is not None else 0
+        bits = st.select_slider("Bits / Channel", options=[1, 2, 3, 4], value=1, key="enc_bits")
+        scatter_key = st.text_input(
+            "Scatter Key", type="password", placeholder="Optional shared secret", key="enc_key"
+        ) or None
+        compress = st.checkbox("Compress payload", value=True, key="enc_zip")
+        outputs = available_outputs()
+        output = st.selectbox(
+            "Output Format",
+            outputs,
+            index=outputs.index(DEFAULT_OUTPUT),
+            format_func=lambda name: OUTPUT_FORMATS[name].label,
+            key="enc_out",
+            help="Lossless either way: faster encodes give larger files. "
+            "Shard sets and animations are always written as PNG.",
         )
 
+        # Payloads up to SAMPLE_SIZE are sized exactly, longer ones from their
+        # leading sample. The estimate is cached, so reruns (and keystrokes past
+        # the sample of a long message) never run the codecs again.
+        codec, stored_size = CODEC_NONE, payload_size
+        if compress and payload_size:
+            data = secret_message.encode("utf-8") if payload_file is None else payload_file.getvalue()
+            sample = data[:SAMPLE_SIZE]
+            codec, ratio = result_cache().get_or_compute(
+                content_key("codec", sample), lambda: choose_codec(sample)
+            )
+            stored_size = round(payload_size * ratio)
+        codec_name = CODEC_NAMES[codec]
+        ratio = stored_size / payload_size if payload_size else 1.0
+
+        frames = 1
         if uploaded_carrier:
-            img = Image.open(uploaded_carrier).convert("RGB")
-            w, h = img.size
-            capacity = (w * h * 3) // 8
-            valid = len(secret_message) + len(MESSAGE_DELIMITER) < capacity
+            # Header metadata only: reruns while typing never touch the pixels.
+            handle = ingest(uploaded_carrier)
+            (w, h), frames = handle.info.size, handle.info.frames
+            capacity = handle.capacity(bits)
+            # Raw payload bytes that fit at this payload's compression ratio.
+            effective = int(capacity / ratio) if ratio else capacity
+            within_budget = handle.info.working_set <= memory_budget()
+            valid = within_budget and stored_size <= capacity
             color = "#30D158" if valid else "#FF453A"
-            state = "READY" if valid else "OVERFLOW"
+            state = "READY" if valid else "OVERFLOW" if within_budget else "OVER BUDGET"
             st.markdown(
                 f"""
                 <div class="telemetry-row">
                     <span class="telemetry-key">Dimensions</span>
-                    <span class="telemetry-val">{w}x{h} px</span>
+                    <span class="telemetry-val">{w}x{h} px{f" · {frames} frames" if frames > 1 else ""}</span>
                 </div>
                 <div class="telemetry-row">
                     <span class="telemetry-key">Capacity</span>
-                    <span class="telemetry-val">{capacity:,} bits</span>
+                    <span class="telemetry-val">{capacity:,} bytes · {bits}-LSB</span>
+                </div>
+                <div class="telemetry-row">
+                    <span class="telemetry-key">Effective Capacity</span>
+                    <span class="telemetry-val">≈{effective:,} bytes · ratio {ratio:.2f}</span>
+                </div>
+                <div class="telemetry-row">
+                    <span class="telemetry-key">Payload</span>
+                    <span class="telemetry-val">{payload_size:,} → {stored_size:,} bytes · {codec_name}</span>
                 </div>
                 <div class="telemetry-row">
                     <span class="telemetry-key">System State</span>
@@ -362,6 +508,39 @@ def render_encode_tab() -> None:
                 """,
                 unsafe_allow_html=True,
             )
+        elif shard_carriers:
+            capacity = 0
+            for upload in shard_carriers:
+                upload.seek(0)
+                capacity += shard_capacity(upload, bits)
+            effective = int(capacity / ratio) if ratio else capacity
+            valid = stored_size <= capacity
+            color = "#30D158" if valid else "#FF453A"
+            st.markdown(
+                f"""
+                <div class="telemetry-row">
+                    <span class="telemetry-key">Carriers</span>
+                    <span class="telemetry-val">{len(shard_carriers)} images</span>
+                </div>
+                <div class="telemetry-row">
+                    <span class="telemetry-key">Capacity</span>
+                    <span class="telemetry-val">{capacity:,} bytes · {bits}-LSB</span>
+                </div>
+                <div class="telemetry-row">
+                    <span class="telemetry-key">Effective Capacity</span>
+                    <span class="telemetry-val">≈{effective:,} bytes · ratio {ratio:.2f}</span>
+                </div>
+                <div class="telemetry-row">
+                    <span class="telemetry-key">Payload</span>
+                    <span class="telemetry-val">{payload_size:,} → {stored_size:,} bytes · {codec_name}</span>
+                </div>
+                <div class="telemetry-row">
+                    <span class="telemetry-key">System State</span>
+                    <span class="telemetry-val" style="color:{color}">{"READY" if valid else "OVERFLOW"}</span>
+                </div>
+                """,
+                unsafe_allow_html=True,
+            )
         else:
             st.markdown(
                 """<div style="flex-grow:1; display:flex; align-items:center; justify-content:center;
@@ -370,60 +549,231 @@ def render_encode_tab() -> None:
             )
 
         st.write("")
-        is_ready = uploaded_carrier is not None and secret_message != ""
+        has_carrier = uploaded_carrier is not None or bool(shard_carriers)
+        is_ready = has_carrier and (secret_message != "" or payload_file is not None)
         run_encode = st.button(
             "Encode Message", disabled=not is_ready, key="btn_enc", use_container_width=True
         )
 
     if run_encode and is_ready:
-        try:
-            t0 = time.time()
-            encoded = embed_message(Image.open(uploaded_carrier).convert("RGB"), secret_message)
-            elapsed = time.time() - t0
-
-            st.write("")
-            st.markdown(
-                f"<div style='color:#30D158; font-family:\"JetBrains Mono\", monospace; font-size:0.85rem;'>"
-                f"✔ Encoding complete — {elapsed:.4f}s</div>",
-                unsafe_allow_html=True,
+        payload = secret_message if payload_file is None else payload_file.getvalue()
+        if shard_carriers:
+            submit_job(
+                "encode",
+                "encode_shards",
+                "Embedding shards...",
+                encode_shard_set,
+                [upload.getvalue() for upload in shard_carriers],
+                [upload.name for upload in shard_carriers],
+                payload,
+                bits,
+                scatter_key,
+                compress,
+                pool_workers(),
+                bits=bits,
             )
+        elif frames > 1:
+            submit_job(
+                "encode",
+                "encode_frames",
+                "Embedding frames...",
+                encode_animation,
+                handle.data,
+                payload,
+                bits,
+                scatter_key,
+                compress,
+                pool_workers(),
+                bits=bits,
+            )
+        else:
+            key = content_key(handle.key, "encode", payload, bits, scatter_key, compress, output)
+            source = secret_message if payload_file is None else io.BytesIO(payload)
+            submit_job(
+                "encode",
+                "encode",
+                "Encoding...",
+                cached,
+                result_cache(),
+                key,
+                lambda: encode_still(handle, source, bits, scatter_key, compress, output),
+                bits=bits,
+                payload_size=payload_size,
+                output=output,
+            )
+    render_job(
+        "encode",
+        {
+            "encode": render_encode,
+            "encode_frames": render_frames_encode,
+            "encode_shards": render_shard_encode,
+        },
+        "Error",
+    )
 
-            buf = io.BytesIO()
-            encoded.save(buf, format="PNG")
-            data = buf.getvalue()
 
-            st.markdown(
-                f"""
-                <div class="result-list-panel">
-                    <h4 style="margin-bottom:20px !important; margin-top:0 !important;">OUTPUT DETAILS</h4>
-                    <div class="result-item">
-                        <span class="result-key">Filename</span>
-                        <span class="result-val">encoded_image.png</span>
-                    </div>
-                    <div class="result-item">
-                        <span class="result-key">File Size</span>
-                        <span class="result-val">{len(data) / 1024:.2f} KB</span>
-                    </div>
-                    <div class="result-item">
-                        <span class="result-key">Verification</span>
-                        <span class="result-val" style="color:#30D158">Confirmed</span>
-                    </div>
-                </div>
-                """,
-                unsafe_allow_html=True,
-            )
+def encode_still(handle, payload, bits: int, scatter_key, compress: bool, output: str):
+    """Encoded stego file of a still carrier, with the run's and the output encode's seconds.
 
-            st.write("")
-            st.download_button(
-                label="Download Encoded Image",
-                data=data,
-                file_name="encoded_image.png",
-                mime="image/png",
-                use_container_width=True,
-            )
+    ``payload`` is the message text or a binary file to stream in.
+    """
+    t0 = time.perf_counter()
+    carrier = handle.carrier()
+    if isinstance(payload, str):
+        embed_message_inplace(carrier, payload, bits, scatter_key, compress)
+    else:
+        embed_stream_inplace(carrier, payload, bits=bits, key=scatter_key, compress=compress)
+    encoded = Image.fromarray(carrier)
+    del carrier
+    t1 = time.perf_counter()
+    data = encode_output(encoded, output)
+    t2 = time.perf_counter()
+    return data, t2 - t0, t2 - t1
+
+
+def render_encode(job) -> None:
+    (data, elapsed, encode_seconds), hit = job.result
+    bits, payload_size = job.meta["bits"], job.meta["payload_size"]
+    fmt = OUTPUT_FORMATS[job.meta["output"]]
+
+    st.write("")
+    st.markdown(
+        f"<div style='color:#30D158; font-family:\"JetBrains Mono\", monospace; font-size:0.85rem;'>"
+        f"✔ Encoding complete — {elapsed:.4f}s · {payload_size / 1e6 / max(elapsed, 1e-9):.1f} MB/s "
+        f"at {bits} bit(s) per channel</div>",
+        unsafe_allow_html=True,
+    )
+
+    st.markdown(
+        f"""
+        <div class="result-list-panel">
+            <h4 style="margin-bottom:20px !important; margin-top:0 !important;">OUTPUT DETAILS</h4>
+            <div class="result-item">
+                <span class="result-key">Filename</span>
+                <span class="result-val">encoded_image.{fmt.extension}</span>
+            </div>
+            <div class="result-item">
+                <span class="result-key">Output Format</span>
+                <span class="result-val">{fmt.label} · {encode_seconds * 1e3:.0f} ms</span>
+            </div>
+            <div class="result-item">
+                <span class="result-key">File Size</span>
+                <span class="result-val">{len(data) / 1024:.2f} KB</span>
+            </div>
+            <div class="result-item">
+                <span class="result-key">Verification</span>
+                <span class="result-val" style="color:#30D158">Confirmed</span>
+            </div>
+        </div>
+        """,
+        unsafe_allow_html=True,
+    )
+
+    st.write("")
+    st.download_button(
+        label="Download Encoded Image",
+        data=data,
+        file_name=f"encoded_image.{fmt.extension}",
+        mime=fmt.mime,
+        use_container_width=True,
+    )
+    render_stages(job, hit)
+
+
+def render_stages(job, cache_hit=None) -> None:
+    """Per-stage breakdown of a job's recording, which the queue appended to the spans file."""
+    rec = job.recorder
+    stages = rec.stages()
+    traced = any(stage.peak_bytes is not None for stage in stages)
+    rows = [
+        (f"{stage.name} · {stage.calls}×", stage.seconds, stage.peak_bytes) for stage in stages
+    ]
+    rows.append(("other", rec.untracked, None))
+    cache_html = ""
+    if cache_hit is not None:
+        stats = result_cache().stats()
+        cache_html = f"""
+            <div class="result-item">
+                <span class="result-key">Result Cache · {"hit" if cache_hit else "miss"}</span>
+                <span class="result-val">{stats.hits} hits · {stats.misses} misses · {
+                    stats.size / 2**20:.1f} / {stats.max_bytes / 2**20:.0f} MB</span>
+            </div>"""
+    rows_html = "".join(
+        f"""
+        <div class="result-item">
+            <span class="result-key">{html.escape(name)}</span>
+            <span class="result-val">{seconds * 1e3:.1f} ms · {seconds / max(rec.seconds, 1e-9):.0%}{
+                f" · {peak / 2**20:.1f} MB peak" if traced and peak is not None else ""}</span>
+        </div>"""
+        for name, seconds, peak in rows
+    )
+    path = job.spans_path
+    st.write("")
+    st.markdown(
+        f"""
+        <div class="result-list-panel">
+            <h4 style="margin-bottom:20px !important; margin-top:0 !important;">STAGE BREAKDOWN</h4>
+            {rows_html}
+            <div class="result-item">
+                <span class="result-key">Total{" · logged" if path else ""}</span>
+                <span class="result-val">{rec.seconds * 1e3:.1f} ms</span>
+            </div>{cache_html}
+        </div>
+        """,
+        unsafe_allow_html=True,
+    )
+
+
+def encode_shard_set(carriers, names, payload, bits: int, scatter_key, compress: bool, workers: int):
+    """Zip of the shard PNGs, named after their carriers, and every shard's length."""
+    shards = embed_shards(carriers, payload, bits, scatter_key, compress, workers=workers)
+    with span("archive"):
+        buf = io.BytesIO()
+        with zipfile.ZipFile(buf, "w", zipfile.ZIP_STORED) as bundle:
+            for name, shard in zip(names, shards):
+                bundle.writestr(f"shard_{shard.index:03d}_{Path(name).stem}.png", shard.png)
+    return buf.getvalue(), [shard.length for shard in shards]
 
-        except ValueError as exc:
-            st.error(f"Error: {exc}")
+
+def render_shard_encode(job) -> None:
+    data, lengths = job.result
+    elapsed, bits = job.recorder.seconds, job.meta["bits"]
+
+    st.write("")
+    st.markdown(
+        f"<div style='color:#30D158; font-family:\"JetBrains Mono\", monospace; font-size:0.85rem;'>"
+        f"✔ {len(lengths)} shards embedded — {elapsed:.4f}s at {bits} bit(s) per channel</div>",
+        unsafe_allow_html=True,
+    )
+    st.markdown(
+        f"""
+        <div class="result-list-panel">
+            <h4 style="margin-bottom:20px !important; margin-top:0 !important;">OUTPUT DETAILS</h4>
+            <div class="result-item">
+                <span class="result-key">Filename</span>
+                <span class="result-val">encoded_shards.zip</span>
+            </div>
+            <div class="result-item">
+                <span class="result-key">Shards</span>
+                <span class="result-val">{len(lengths)} · {max(lengths):,} bytes max</span>
+            </div>
+            <div class="result-item">
+                <span class="result-key">File Size</span>
+                <span class="result-val">{len(data) / 1024:.2f} KB</span>
+            </div>
+        </div>
+        """,
+        unsafe_allow_html=True,
+    )
+    st.write("")
+    st.download_button(
+        label="Download Shard Set",
+        data=data,
+        file_name="encoded_shards.zip",
+        mime="application/zip",
+        use_container_width=True,
+    )
+    render_stages(job)
 
 
 def render_decode_tab() -> None:
@@ -431,13 +781,28 @@ def render_decode_tab() -> None:
 
     with col_input:
         st.markdown("#### Input Image")
-        uploaded_artifact = st.file_uploader(
-            "Upload Image", type=["png"], key="dec_u", label_visibility="collapsed"
-        )
+        shard_artifacts = []
+        uploaded_artifact = None
+        if st.checkbox("Shard set", key="dec_shard"):
+            shard_artifacts = st.file_uploader(
+                "Upload Images",
+                type=["png"],
+                accept_multiple_files=True,
+                key="dec_us",
+                label_visibility="collapsed",
+            )
+        else:
+            uploaded_artifact = st.file_uploader(
+                "Upload Image",
+                type=["png", "webp", "tif", "tiff"],
+                key="dec_u",
+                label_visibility="collapsed",
+            )
+        has_artifact = uploaded_artifact is not None or bool(shard_artifacts)
 
     with col_monitor:
         st.markdown("#### Status Monitor")
-        if uploaded_artifact:
+        if has_artifact:
             st.markdown(
                 """
                 <div class="telemetry-row">
@@ -458,51 +823,273 @@ def render_decode_tab() -> None:
                 unsafe_allow_html=True,
             )
 
+        scatter_key = st.text_input(
+            "Scatter Key", type="password", placeholder="Key used at encode time, if any", key="dec_key"
+        ) or None
+
         st.write("")
         run_decode = st.button(
-            "Decode Message", disabled=uploaded_artifact is None, key="btn_dec", use_container_width=True
+            "Decode Message", disabled=not has_artifact, key="btn_dec", use_container_width=True
+        )
+
+    if run_decode and shard_artifacts:
+        submit_job(
+            "decode",
+            "decode_shards",
+            "Reassembling shards...",
+            decode_shard_set,
+            result_cache(),
+            [upload.getvalue() for upload in shard_artifacts],
+            scatter_key,
+            pool_workers(),
+            names=[upload.name for upload in shard_artifacts],
+        )
+    elif run_decode and uploaded_artifact is not None:
+        handle = ingest(uploaded_artifact)
+        if handle.animated:
+            key = content_key(handle.key, "decode_frames", scatter_key)
+            workers = pool_workers()
+            submit_job(
+                "decode",
+                "decode_frames",
+                "Extracting frames...",
+                cached,
+                result_cache(),
+                key,
+                lambda: extract_frames(handle.data, scatter_key, workers=workers),
+            )
+        else:
+            key = content_key(handle.key, "decode", scatter_key)
+            submit_job(
+                "decode",
+                "decode",
+                "Extracting data...",
+                cached,
+                result_cache(),
+                key,
+                lambda: decode_artifact(handle, scatter_key),
+            )
+    render_job(
+        "decode",
+        {
+            "decode": render_decode,
+            "decode_frames": render_frames_decode,
+            "decode_shards": render_shard_decode,
+        },
+        "Extraction failed",
+    )
+
+
+def render_decode(job) -> None:
+    (header, result), hit = job.result
+    is_shard = header is not None and header.format == FORMAT_SHARD
+
+    if is_shard:
+        st.error("This image holds one shard of a set. Tick Shard set and upload every shard.")
+    elif header is not None and header.format != FORMAT_TEXT:
+        st.markdown(
+            f"""
+            <div class="result-list-panel">
+                <h4 style="margin-bottom:20px !important; margin-top:0 !important;">RECOVERED FILE</h4>
+                <div class="result-item">
+                    <span class="result-key">Payload Size</span>
+                    <span class="result-val">{len(result) / 1024:.2f} KB</span>
+                </div>
+                <div class="result-item">
+                    <span class="result-key">Stored As</span>
+                    <span class="result-val">{header.length / 1024:.2f} KB · {CODEC_NAMES[header.codec]}</span>
+                </div>
+            </div>
+            """,
+            unsafe_allow_html=True,
+        )
+        st.write("")
+        st.download_button(
+            label="Download Recovered File",
+            data=result,
+            file_name="recovered_payload.bin",
+            mime="application/octet-stream",
+            use_container_width=True,
+        )
+    elif header is not None:
+        st.markdown(
+            f"""
+            <div class="terminal-window">
+                <div class="terminal-header">
+                    <div class="term-dot red"></div>
+                    <div class="term-dot yellow"></div>
+                    <div class="term-dot green"></div>
+                    <span style="color:#8E8E93; font-family:-apple-system, BlinkMacSystemFont, sans-serif;
+                                 font-size:0.8rem; margin-left:8px;">decoded_message.txt</span>
+                </div>
+                <div class="terminal-body">{html.escape(result)}</div>
+            </div>
+            """,
+            unsafe_allow_html=True,
+        )
+    else:
+        st.error("Verification failed. No valid payload found.")
+    render_stages(job, hit)
+
+
+def decode_artifact(handle, scatter_key):
+    """Header and payload of an uploaded image: text, recovered bytes, or None."""
+    artifact = handle.open()
+    located = locate(artifact, scatter_key)
+    if located is None:
+        return None, None
+    header = located.header
+    if header.format == FORMAT_SHARD:
+        return header, None
+    if header.format == FORMAT_TEXT:
+        return header, extract_message(artifact, scatter_key, located)
+    recovered = io.BytesIO()
+    extract_stream(artifact, recovered, key=scatter_key, located=located)
+    return header, recovered.getvalue()
+
+
+def encode_animation(data: bytes, payload, bits: int, scatter_key, compress: bool, workers: int):
+    """APNG with the payload spread over the frames of ``data``, and the frame count."""
+    buf = io.BytesIO()
+    shards = embed_frames(data, payload, buf, bits, scatter_key, compress, workers=workers)
+    return buf.getvalue(), len(shards)
+
+
+def render_frames_encode(job) -> None:
+    data, frames = job.result
+    elapsed, bits = job.recorder.seconds, job.meta["bits"]
+
+    st.write("")
+    st.markdown(
+        f"<div style='color:#30D158; font-family:\"JetBrains Mono\", monospace; font-size:0.85rem;'>"
+        f"✔ {frames} frames embedded — {elapsed:.4f}s at {bits} bit(s) per channel</div>",
+        unsafe_allow_html=True,
+    )
+    st.markdown(
+        f"""
+        <div class="result-list-panel">
+            <h4 style="margin-bottom:20px !important; margin-top:0 !important;">OUTPUT DETAILS</h4>
+            <div class="result-item">
+                <span class="result-key">Filename</span>
+                <span class="result-val">encoded_animation.png</span>
+            </div>
+            <div class="result-item">
+                <span class="result-key">Frames</span>
+                <span class="result-val">{frames} · APNG</span>
+            </div>
+            <div class="result-item">
+                <span class="result-key">File Size</span>
+                <span class="result-val">{len(data) / 1024:.2f} KB</span>
+            </div>
+        </div>
+        """,
+        unsafe_allow_html=True,
+    )
+    st.write("")
+    st.download_button(
+        label="Download Encoded Animation",
+        data=data,
+        file_name="encoded_animation.png",
+        mime="image/png",
+        use_container_width=True,
+    )
+    render_stages(job)
+
+
+def decode_shard_set(cache: ResultCache, sources, scatter_key, workers: int):
+    # Positions in the result refer to upload order, so the order is part of the key.
+    with span("hash"):
+        key = content_key("decode_shards", scatter_key, *(content_key(source) for source in sources))
+    return cached(cache, key, lambda: extract_shards(sources, scatter_key, workers=workers))
+
+
+def render_shard_decode(job) -> None:
+    result, hit = job.result
+    names = job.meta["names"]
+    render_shard_set(result, "SHARD SET", lambda pos: names[pos])
+    render_stages(job, hit)
+
+
+def render_frames_decode(job) -> None:
+    result, hit = job.result
+    render_shard_set(result, "ANIMATION FRAMES", lambda pos: f"Frame {pos}")
+    render_stages(job, hit)
+
+
+def render_shard_set(result, title: str, label) -> None:
+    corrupt = "".join(
+        f"""
+            <div class="result-item">
+                <span class="result-key">{html.escape(label(pos)) if pos >= 0 else "Payload"}</span>
+                <span class="result-val" style="color:#FF453A">{html.escape(reason)}</span>
+            </div>"""
+        for pos, reason in result.corrupt
+    )
+    missing = ", ".join(str(i) for i in result.missing) or "none"
+    st.markdown(
+        f"""
+        <div class="result-list-panel">
+            <h4 style="margin-bottom:20px !important; margin-top:0 !important;">{title}</h4>
+            <div class="result-item">
+                <span class="result-key">Shards Found</span>
+                <span class="result-val">{len(result.found)} of {result.count}</span>
+            </div>
+            <div class="result-item">
+                <span class="result-key">Missing</span>
+                <span class="result-val">{missing}</span>
+            </div>{corrupt}
+        </div>
+        """,
+        unsafe_allow_html=True,
+    )
+    payload = result.payload
+    st.write("")
+    if payload is None:
+        st.error("Reassembly failed. The shard set is incomplete or corrupt.")
+    elif payload.format == FORMAT_TEXT:
+        st.markdown(
+            f"""
+            <div class="terminal-window">
+                <div class="terminal-header">
+                    <div class="term-dot red"></div>
+                    <div class="term-dot yellow"></div>
+                    <div class="term-dot green"></div>
+                    <span style="color:#8E8E93; font-family:-apple-system, BlinkMacSystemFont, sans-serif;
+                                 font-size:0.8rem; margin-left:8px;">decoded_message.txt</span>
+                </div>
+                <div class="terminal-body">{html.escape(payload.data.decode("utf-8", errors="replace"))}</div>
+            </div>
+            """,
+            unsafe_allow_html=True,
         )
+    else:
+        st.download_button(
+            label="Download Recovered File",
+            data=payload.data,
+            file_name="recovered_payload.bin",
+            mime="application/octet-stream",
+            use_container_width=True,
+        )
+
 
-    if run_decode and uploaded_artifact is not None:
-        try:
-            with st.spinner("Extracting data..."):
-                result = extract_message(Image.open(uploaded_artifact).convert("RGB"))
-
-            if result != "No valid hidden message detected.":
-                st.markdown(
-                    f"""
-                    <div class="terminal-window">
-                        <div class="terminal-header">
-                            <div class="term-dot red"></div>
-                            <div class="term-dot yellow"></div>
-                            <div class="term-dot green"></div>
-                            <span style="color:#8E8E93; font-family:-apple-system, BlinkMacSystemFont, sans-serif;
-                                         font-size:0.8rem; margin-left:8px;">decoded_message.txt</span>
-                        </div>
-                        <div class="terminal-body">{html.escape(result)}</div>
-                    </div>
-                    """,
-                    unsafe_allow_html=True,
-                )
-            else:
-                st.error("Verification failed. No valid payload found.")
-        except Exception as exc:
-            st.error(f"Extraction failed: {exc}")
-
-
-def render_analysis_tab(model: RandomForestClassifier) -> None:
+def render_analysis_tab() -> None:
     col_input, col_metrics = st.columns([1, 1], gap="medium")
 
     with col_input:
         st.markdown("#### Analysis Input")
         scan_file = st.file_uploader(
-            "Select Image", type=["png", "jpg"], key="ai_u", label_visibility="collapsed"
+            "Select Image",
+            type=["png", "jpg", "gif", "webp", "tif", "tiff"],
+            key="ai_u",
+            label_visibility="collapsed",
         )
 
     with col_metrics:
         st.markdown("#### Model Information")
+        # The model is loaded by the first analysis (or a warm-up), not at startup.
+        loaded = model_loaded()
         st.markdown(
-            """
+            f"""
             <div class="telemetry-row">
                 <span class="telemetry-key">Architecture</span>
                 <span class="telemetry-val">RandomForest v1.0</span>
@@ -513,59 +1100,204 @@ def render_analysis_tab(model: RandomForestClassifier) -> None:
             </div>
             <div class="telemetry-row">
                 <span class="telemetry-key">Status</span>
-                <span class="telemetry-val" style="color:#30D158">ONLINE</span>
+                <span class="telemetry-val" style="color:{"#30D158" if loaded else "#8E8E93"}">{
+                    "ONLINE" if loaded else "LOADS ON FIRST RUN"}</span>
             </div>
             """,
             unsafe_allow_html=True,
         )
 
+        st.write("")
+        localize_tiles = st.checkbox("Tile localization", key="ai_loc")
+        grid_size = st.select_slider(
+            "Grid", options=[4, 6, 8, 12, 16], value=8, key="ai_grid", disabled=not localize_tiles
+        )
+
         st.write("")
         run_analysis = st.button(
             "Analyze Image", disabled=scan_file is None, key="btn_ai", use_container_width=True
         )
 
     if run_analysis and scan_file is not None:
-        img = Image.open(scan_file).convert("RGB")
-        with st.spinner("Calculating probability..."):
-            prob = stego_probability(img, model)
-            feats = extract_features(img)[0]
+        handle = ingest(scan_file)
+        submit_job(
+            "analysis",
+            "analysis_frames" if handle.animated else "analysis",
+            "Scoring frames..." if handle.animated else "Calculating probability...",
+            analyze_image,
+            result_cache(),
+            handle,
+            grid_size if localize_tiles else None,
+            pool_workers(),
+            grid_size=grid_size,
+        )
+    render_job(
+        "analysis",
+        {"analysis": render_analysis, "analysis_frames": render_analysis},
+        "Analysis failed",
+    )
+
+
+def analyze_image(cache: ResultCache, handle, grid_size, workers: int):
+    """Cached verdict of an upload, per frame for an animation, and its tile scores on a grid."""
+    model_tag = (MODEL_VERSION, feature_schema_hash())
+    if handle.animated:
+        key = content_key(handle.key, "analyze_frames", model_tag)
+        scored = cached(
+            cache, key, lambda: analyze_frames(handle.data, load_steganalysis_model(), workers=workers)
+        )
+    else:
+        key = content_key(handle.key, "analyze", model_tag)
+        scored = cached(cache, key, lambda: analyze_upload(handle, load_steganalysis_model()))
+    tiles = None
+    if grid_size is not None:
+        key = content_key(handle.key, "localize", model_tag, grid_size)
+        tiles = cached(
+            cache, key, lambda: localize_upload(handle, load_steganalysis_model(), grid_size)
+        )
+    return scored, tiles
+
+
+def render_analysis(job) -> None:
+    (scored, hit), tiles = job.result
+    frame_result = None
+    if job.label == "analysis_frames":
+        frame_result = scored
+        probs = frame_result.probabilities
+        # The verdict follows the most suspicious frame; failed frames are NaN.
+        ranked = sorted(
+            (i for i in range(len(probs)) if probs[i] == probs[i]), key=lambda i: -probs[i]
+        )
+        worst = ranked[0] if ranked else 0
+        prob, feats = probs[worst], frame_result.features[worst]
+    else:
+        prob, feats = scored
+
+    score = prob * 100
+    color = "#FF453A" if score > 50 else "#30D158"
+    verdict = "DETECTED" if score > 50 else "CLEAN"
+
+    st.write("")
+    st.markdown(
+        f"""
+        <div class="result-card">
+            <div class="result-value" style="color:{color}">{score:.0f}%</div>
+            <div style="color:#86868B; letter-spacing:0.1em; text-transform:uppercase; font-size:0.8rem;">{verdict}</div>
+        </div>
+        """,
+        unsafe_allow_html=True,
+    )
+
+    st.write("")
+    st.markdown(
+        f"""
+        <div style="display:grid; grid-template-columns:1fr 1fr 1fr; gap:16px;">
+            <div class="result-card" style="padding:16px; margin:0;">
+                <div style="font-size:1.2rem; font-weight:600; color:#F5F5F7;">{feats[1]:.2f}</div>
+                <div style="font-size:0.65rem; color:#86868B; text-transform:uppercase;">Pixel Var</div>
+            </div>
+            <div class="result-card" style="padding:16px; margin:0;">
+                <div style="font-size:1.2rem; font-weight:600; color:#F5F5F7;">{feats[2]:.2f}</div>
+                <div style="font-size:0.65rem; color:#86868B; text-transform:uppercase;">Entropy</div>
+            </div>
+            <div class="result-card" style="padding:16px; margin:0;">
+                <div style="font-size:1.2rem; font-weight:600; color:#F5F5F7;">{feats[3]:.2f}</div>
+                <div style="font-size:0.65rem; color:#86868B; text-transform:uppercase;">LSB Var</div>
+            </div>
+        </div>
+        """,
+        unsafe_allow_html=True,
+    )
 
-        score = prob * 100
-        color = "#FF453A" if score > 50 else "#30D158"
-        verdict = "DETECTED" if score > 50 else "CLEAN"
+    st.write("")
+    st.markdown(
+        f"""
+        <div style="display:grid; grid-template-columns:1fr 1fr 1fr; gap:16px;">
+            <div class="result-card" style="padding:16px; margin:0;">
+                <div style="font-size:1.2rem; font-weight:600; color:#F5F5F7;">{feats[5]:.2f}</div>
+                <div style="font-size:0.65rem; color:#86868B; text-transform:uppercase;">Chi-Square p</div>
+            </div>
+            <div class="result-card" style="padding:16px; margin:0;">
+                <div style="font-size:1.2rem; font-weight:600; color:#F5F5F7;">{feats[6]:.2f}</div>
+                <div style="font-size:0.65rem; color:#86868B; text-transform:uppercase;">RS Rate</div>
+            </div>
+            <div class="result-card" style="padding:16px; margin:0;">
+                <div style="font-size:1.2rem; font-weight:600; color:#F5F5F7;">{feats[7]:.2f}</div>
+                <div style="font-size:0.65rem; color:#86868B; text-transform:uppercase;">SPA Rate</div>
+            </div>
+        </div>
+        """,
+        unsafe_allow_html=True,
+    )
 
+    if frame_result is not None:
+        rows_html = "".join(
+            f"""
+            <div class="result-item">
+                <span class="result-key">Frame {i}</span>
+                <span class="result-val">{probs[i] * 100:.0f}%</span>
+            </div>
+            """
+            for i in ranked[:10]
+        )
         st.write("")
         st.markdown(
             f"""
-            <div class="result-card">
-                <div class="result-value" style="color:{color}">{score:.0f}%</div>
-                <div style="color:#86868B; letter-spacing:0.1em; text-transform:uppercase; font-size:0.8rem;">{verdict}</div>
+            <div class="result-list-panel">
+                <h4 style="margin-bottom:20px !important; margin-top:0 !important;">MOST SUSPICIOUS FRAMES</h4>
+                {rows_html}
+                <div class="result-item">
+                    <span class="result-key">Frames · Latency</span>
+                    <span class="result-val">{len(probs)} · {frame_result.seconds:.3f}s</span>
+                </div>
             </div>
             """,
             unsafe_allow_html=True,
         )
 
+    if tiles is not None:
+        (located, overlay), _ = tiles
+        grid_size = job.meta["grid_size"]
         st.write("")
+        st.image(overlay, use_container_width=True)
+        rows_html = "".join(
+            f"""
+            <div class="result-item">
+                <span class="result-key">Tile r{region.row} c{region.col} · {region.box[0]},{region.box[1]}–{region.box[2]},{region.box[3]}</span>
+                <span class="result-val">{region.probability * 100:.0f}%</span>
+            </div>
+            """
+            for region in located.regions
+        )
         st.markdown(
             f"""
-            <div style="display:grid; grid-template-columns:1fr 1fr 1fr; gap:16px;">
-                <div class="result-card" style="padding:16px; margin:0;">
-                    <div style="font-size:1.2rem; font-weight:600; color:#F5F5F7;">{feats[1]:.2f}</div>
-                    <div style="font-size:0.65rem; color:#86868B; text-transform:uppercase;">Pixel Var</div>
-                </div>
-                <div class="result-card" style="padding:16px; margin:0;">
-                    <div style="font-size:1.2rem; font-weight:600; color:#F5F5F7;">{feats[2]:.2f}</div>
-                    <div style="font-size:0.65rem; color:#86868B; text-transform:uppercase;">Entropy</div>
-                </div>
-                <div class="result-card" style="padding:16px; margin:0;">
-                    <div style="font-size:1.2rem; font-weight:600; color:#F5F5F7;">{feats[3]:.2f}</div>
-                    <div style="font-size:0.65rem; color:#86868B; text-transform:uppercase;">LSB Var</div>
+            <div class="result-list-panel">
+                <h4 style="margin-bottom:20px !important; margin-top:0 !important;">MOST SUSPICIOUS REGIONS</h4>
+                {rows_html}
+                <div class="result-item">
+                    <span class="result-key">Grid · Latency</span>
+                    <span class="result-val">{grid_size}x{grid_size} · {located.seconds:.3f}s</span>
                 </div>
             </div>
             """,
             unsafe_allow_html=True,
         )
 
+    render_stages(job, hit)
+
+
+def analyze_upload(handle, model: "RandomForestClassifier"):
+    """Probability and feature vector of an uploaded still image."""
+    result = analyze_batch([handle.rgb()], model)
+    return result.probabilities[0], result.features[0]
+
+
+def localize_upload(handle, model: "RandomForestClassifier", grid_size: int):
+    """Tile scores of an upload's first frame and their heatmap preview."""
+    img = handle.rgb()
+    located = localize(img, model, grid=(grid_size, grid_size))
+    return located, heatmap_overlay(img, located)
+
 
 def main() -> None:
     inject_styles()
@@ -581,7 +1313,6 @@ def main() -> None:
         unsafe_allow_html=True,
     )
 
-    model = load_steganalysis_model()
     tab_encode, tab_decode, tab_analysis = st.tabs(["Encode Vessel", "Decode Artifact", "AI Analysis"])
 
     with tab_encode:
@@ -591,7 +1322,11 @@ def main() -> None:
         render_decode_tab()
 
     with tab_analysis:
-        render_analysis_tab(model)
+        render_analysis_tab()
+
+    # Everything above has been sent to the browser by now.
+    if warm_up_enabled():
+        model_warm_up()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,257 @@
+"""Headless Cipher Engine core: LSB steganography and RF-based steganalysis."""
+
+from .analysis import (
+    ANALYSIS_RESOLUTION,
+    FEATURE_NAMES,
+    RANDOM_SEED,
+    BatchAnalysis,
+    analyze_batch,
+    extract_features,
+    extract_features_batch,
+    load_analysis_batch,
+    stego_probability,
+)
+from .cache import (
+    CACHE_SIZE_ENV,
+    CacheStats,
+    ResultCache,
+    cache_budget,
+    content_key,
+    estimate_size,
+)
+from .compression import (
+    CODEC_BZ2,
+    CODEC_LZMA,
+    CODEC_NAMES,
+    CODEC_NONE,
+    CODEC_ZLIB,
+    choose_codec,
+    compress_payload,
+    decompress_payload,
+)
+from .detectors import (
+    DETECTOR_NAMES,
+    chi_square_attack,
+    detector_scores,
+    batch_detector_scores,
+    rs_analysis,
+    sample_pair_analysis,
+    window_detector_scores,
+)
+from .frames import (
+    Animation,
+    analyze_frames,
+    embed_frames,
+    extract_frames,
+    frame_capacities,
+    is_animated,
+    probe_frames,
+    write_apng,
+)
+from .ingest import ImageHandle, ImageInfo
+from .instrument import (
+    SPANS_PATH_ENV,
+    TRACE_MEMORY_ENV,
+    Progress,
+    Recorder,
+    Stage,
+    progress,
+    recording,
+    span,
+    span_records,
+    write_spans,
+)
+from .jobs import JOB_WORKERS_ENV, Job, JobQueue, JobStats, job_workers
+from .localization import Localization, Region, heatmap_overlay, localize
+from .model import (
+    FEATURE_SCHEMA_VERSION,
+    MODEL_VERSION,
+    WARM_UP_ENV,
+    feature_schema_hash,
+    load_steganalysis_model,
+    model_loaded,
+    train_steganalysis_model,
+    warm_up,
+    warm_up_enabled,
+)
+from .output import (
+    DEFAULT_OUTPUT,
+    OUTPUT_FORMATS,
+    OutputFormat,
+    available_outputs,
+    encode_output,
+    output_format,
+    save_output,
+)
+from .scatter import ScatterKey
+from .server import ApiServer, serve
+from .shards import (
+    MAX_SHARDS,
+    SHARD_HEADER_SIZE,
+    EmbeddedShard,
+    ShardHeader,
+    ShardSet,
+    embed_shards,
+    extract_shards,
+    plan_shards,
+    shard_capacity,
+)
+from .stego import (
+    FORMAT_BINARY,
+    FORMAT_SHARD,
+    FORMAT_TEXT,
+    HEADER_SIZE,
+    HEADER_VERSION,
+    Header,
+    Located,
+    MAX_BITS,
+    MEMORY_BUDGET_ENV,
+    NO_MESSAGE,
+    MemoryBudgetError,
+    Payload,
+    binary_to_text,
+    check_memory_budget,
+    embed_file,
+    embed_message,
+    embed_message_inplace,
+    embed_stream,
+    embed_stream_inplace,
+    embed_working_set,
+    extract_file,
+    extract_message,
+    extract_payload,
+    extract_stream,
+    load_carrier,
+    locate,
+    memory_budget,
+    payload_capacity,
+    payload_to_bits,
+    read_header,
+    text_to_binary,
+)
+from .training import TrainingReport, extend_forest, fit_forest, train_model
+
+__all__ = [
+    "ANALYSIS_RESOLUTION",
+    "Animation",
+    "ApiServer",
+    "BatchAnalysis",
+    "CACHE_SIZE_ENV",
+    "CODEC_BZ2",
+    "CODEC_LZMA",
+    "CODEC_NAMES",
+    "CODEC_NONE",
+    "CODEC_ZLIB",
+    "CacheStats",
+    "DEFAULT_OUTPUT",
+    "DETECTOR_NAMES",
+    "EmbeddedShard",
+    "FEATURE_NAMES",
+    "FEATURE_SCHEMA_VERSION",
+    "FORMAT_BINARY",
+    "FORMAT_SHARD",
+    "FORMAT_TEXT",
+    "HEADER_SIZE",
+    "HEADER_VERSION",
+    "Header",
+    "ImageHandle",
+    "ImageInfo",
+    "JOB_WORKERS_ENV",
+    "Job",
+    "JobQueue",
+    "JobStats",
+    "Localization",
+    "Located",
+    "MAX_BITS",
+    "MAX_SHARDS",
+    "MEMORY_BUDGET_ENV",
+    "MODEL_VERSION",
+    "MemoryBudgetError",
+    "NO_MESSAGE",
+    "OUTPUT_FORMATS",
+    "OutputFormat",
+    "Payload",
+    "Progress",
+    "RANDOM_SEED",
+    "Recorder",
+    "Region",
+    "ResultCache",
+    "SHARD_HEADER_SIZE",
+    "SPANS_PATH_ENV",
+    "ScatterKey",
+    "ShardHeader",
+    "ShardSet",
+    "Stage",
+    "TRACE_MEMORY_ENV",
+    "TrainingReport",
+    "WARM_UP_ENV",
+    "analyze_batch",
+    "analyze_frames",
+    "available_outputs",
+    "batch_detector_scores",
+    "binary_to_text",
+    "cache_budget",
+    "check_memory_budget",
+    "chi_square_attack",
+    "choose_codec",
+    "compress_payload",
+    "content_key",
+    "decompress_payload",
+    "detector_scores",
+    "embed_file",
+    "embed_frames",
+    "embed_message",
+    "embed_message_inplace",
+    "embed_shards",
+    "embed_stream",
+    "embed_stream_inplace",
+    "embed_working_set",
+    "encode_output",
+    "estimate_size",
+    "extend_forest",
+    "extract_features",
+    "extract_features_batch",
+    "extract_file",
+    "extract_frames",
+    "extract_message",
+    "extract_payload",
+    "extract_shards",
+    "extract_stream",
+    "feature_schema_hash",
+    "fit_forest",
+    "frame_capacities",
+    "heatmap_overlay",
+    "is_animated",
+    "job_workers",
+    "load_analysis_batch",
+    "load_carrier",
+    "load_steganalysis_model",
+    "localize",
+    "locate",
+    "memory_budget",
+    "model_loaded",
+    "output_format",
+    "payload_capacity",
+    "payload_to_bits",
+    "plan_shards",
+    "probe_frames",
+    "progress",
+    "read_header",
+    "recording",
+    "rs_analysis",
+    "sample_pair_analysis",
+    "save_output",
+    "serve",
+    "shard_capacity",
+    "span",
+    "span_records",
+    "stego_probability",
+    "text_to_binary",
+    "train_model",
+    "train_steganalysis_model",
+    "warm_up",
+    "warm_up_enabled",
+    "window_detector_scores",
+    "write_apng",
+    "write_spans",
+]
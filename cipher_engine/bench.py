@@ -0,0 +1,326 @@
+"""Reproducible performance benchmarks: ``python -m cipher_engine bench``.
+
+Cases cover the encode, decode, feature and inference paths over a grid of
+carrier sizes and payload sizes. Carriers and payloads are synthetic and
+seeded, so two runs time the same work. Every case runs in a fresh process
+that builds its inputs and times ``repeats`` calls after one warm-up call, so
+the peak RSS it reports is that case's own. The cold-start cases instead time
+a new interpreter per call: ``import_cipher_engine`` imports the package and
+``first_render`` runs ``app.py`` once headless through Streamlit's AppTest,
+which is the time to first render without the server and browser. Reports
+are JSON keyed by case name and are compared metric by metric against a
+baseline report.
+"""
+
+import math
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+import PIL
+from PIL import Image
+
+from .analysis import extract_features, stego_probability
+from .model import load_steganalysis_model
+from .stego import (
+    NO_MESSAGE,
+    embed_message,
+    embed_message_inplace,
+    extract_message,
+    payload_capacity,
+    text_to_binary,
+)
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+BENCH_VERSION = 1
+SEED = 0
+OPERATIONS = (
+    "text_to_binary",
+    "embed_message",
+    "extract_message",
+    "extract_features",
+    "stego_probability",
+    "load_steganalysis_model",
+    "import_cipher_engine",
+    "first_render",
+)
+DEFAULT_SIZES = (0.3, 1.0, 12.0)
+DEFAULT_PAYLOADS = ("10", "1K", "1M", "full")
+FULL_PAYLOAD = "full"
+GATED_METRICS = ("p50_ms", "peak_rss_mb")
+DEFAULT_THRESHOLD = 0.25
+
+_PAYLOAD_OPS = ("text_to_binary", "embed_message", "extract_message")
+_IMAGE_OPS = ("extract_features", "stego_probability")
+_COLD_START = {
+    "import_cipher_engine": "import cipher_engine",
+    "first_render": (
+        "from streamlit.testing.v1 import AppTest\n"
+        "at = AppTest.from_file({app!r}, default_timeout=300).run()\n"
+        "assert not at.exception, at.exception[0].message"
+    ),
+}
+_UNITS = {"K": 1 << 10, "M": 1 << 20}
+
+
+class Case(NamedTuple):
+    op: str
+    megapixels: Optional[float]
+    payload: Optional[str]
+    payload_bytes: Optional[int]
+
+    @property
+    def name(self) -> str:
+        parts = [self.op]
+        if self.megapixels is not None:
+            parts.append(f"{self.megapixels:g}MP")
+        if self.payload is not None:
+            parts.append(self.payload if self.payload == FULL_PAYLOAD else f"{self.payload}B")
+        return "/".join(parts)
+
+
+class Regression(NamedTuple):
+    case: str
+    metric: str
+    baseline: float
+    current: float
+
+    @property
+    def change(self) -> float:
+        return self.current / self.baseline - 1 if self.baseline else math.inf
+
+
+def parse_payload(spec: str) -> Optional[int]:
+    """Bytes for a payload spec such as ``10``, ``1K`` or ``4M``; None for ``full``."""
+    spec = spec.strip()
+    if spec.lower() == FULL_PAYLOAD:
+        return None
+    unit = _UNITS.get(spec[-1:].upper(), 1)
+    return int(spec[:-1] if unit > 1 else spec) * unit
+
+
+def carrier_size(megapixels: float) -> tuple:
+    """(width, height) of a 4:3 carrier with about ``megapixels`` million pixels."""
+    width = max(round(math.sqrt(megapixels * 1e6 * 4 / 3)), 1)
+    return width, max(round(width * 3 / 4), 1)
+
+
+def synthetic_carrier(megapixels: float, seed: int = SEED) -> np.ndarray:
+    """A seeded gradient-plus-noise RGB carrier, built a band of rows at a time."""
+    width, height = carrier_size(megapixels)
+    rng = np.random.default_rng(seed)
+    arr = np.empty((height, width, 3), dtype=np.uint8)
+    x = (np.arange(width) * 127 // max(width - 1, 1)).astype(np.uint8)
+    for top in range(0, height, 256):
+        rows = min(256, height - top)
+        y = (np.arange(top, top + rows) * 127 // max(height - 1, 1)).astype(np.uint8)
+        base = x[None, :, None] + y[:, None, None]
+        arr[top : top + rows] = base + rng.integers(0, 2, (rows, width, 3), dtype=np.uint8)
+    return arr
+
+
+def synthetic_text(length: int, seed: int = SEED) -> str:
+    rng = np.random.default_rng(seed)
+    return rng.integers(ord("a"), ord("z") + 1, length, dtype=np.uint8).tobytes().decode("ascii")
+
+
+def plan_cases(
+    sizes: Sequence[float] = DEFAULT_SIZES,
+    payloads: Sequence[str] = DEFAULT_PAYLOADS,
+    ops: Sequence[str] = OPERATIONS,
+) -> List[Case]:
+    """Cases for every op over the grid; payloads larger than a carrier's capacity are skipped."""
+    cases = []
+    for op in ops:
+        if op not in OPERATIONS:
+            raise ValueError(f"Unknown benchmark operation {op!r}.")
+        if op == "text_to_binary":
+            sized = [(p, parse_payload(p)) for p in payloads]
+            cases += [Case(op, None, p, n) for p, n in sized if n is not None]
+        elif op in _PAYLOAD_OPS:
+            for mp in sizes:
+                capacity = payload_capacity(carrier_size(mp))
+                for p in payloads:
+                    n = parse_payload(p)
+                    if n is None or n <= capacity:
+                        cases.append(Case(op, mp, p, capacity if n is None else n))
+        elif op in _IMAGE_OPS:
+            cases += [Case(op, mp, None, None) for mp in sizes]
+        else:
+            cases.append(Case(op, None, None, None))
+    return cases
+
+
+def peak_rss_mb(children: bool = False) -> Optional[float]:
+    """Peak resident set size of this process, or of its largest finished child, in MB.
+
+    None where ``resource`` is unavailable.
+    """
+    if resource is None:
+        return None
+    who = resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+    peak = resource.getrusage(who).ru_maxrss
+    return peak / 1e6 if sys.platform == "darwin" else peak / 1e3
+
+
+def _write_stego(path: str, megapixels: float, length: int) -> None:
+    carrier = synthetic_carrier(megapixels)
+    # Compression is off in every case so timings track the LSB path, not the codecs.
+    embed_message_inplace(carrier, synthetic_text(length), compress=False)
+    Image.fromarray(carrier).save(path, format="PNG", compress_level=1)
+
+
+def _cold_start(op: str) -> None:
+    root = Path(__file__).resolve().parent.parent
+    path = os.pathsep.join(p for p in (str(root), os.environ.get("PYTHONPATH")) if p)
+    code = _COLD_START[op].format(app=str(root / "app.py"))
+    done = subprocess.run(
+        [sys.executable, "-c", code], env=dict(os.environ, PYTHONPATH=path), capture_output=True
+    )
+    if done.returncode:
+        lines = done.stderr.decode("utf-8", "replace").strip().splitlines() or ["no output"]
+        raise RuntimeError(f"{op} exited with {done.returncode}: {lines[-1]}")
+
+
+def _prepare(case: Case, stego_path: Optional[str]) -> Callable[[], object]:
+    if case.op in _COLD_START:
+        return lambda: _cold_start(case.op)
+    if case.op == "text_to_binary":
+        text = synthetic_text(case.payload_bytes)
+        return lambda: text_to_binary(text)
+    if case.op == "embed_message":
+        image = Image.fromarray(synthetic_carrier(case.megapixels))
+        text = synthetic_text(case.payload_bytes)
+        return lambda: embed_message(image, text, compress=False)
+    if case.op == "extract_message":
+
+        def extract():
+            with Image.open(stego_path) as img:
+                message = extract_message(img)
+            if message == NO_MESSAGE:
+                raise ValueError(f"No payload found in {stego_path}.")
+            return message
+
+        return extract
+    if case.op == "load_steganalysis_model":
+
+        def load():
+            load_steganalysis_model.cache_clear()
+            return load_steganalysis_model()
+
+        return load
+    image = Image.fromarray(synthetic_carrier(case.megapixels))
+    if case.op == "extract_features":
+        return lambda: extract_features(image)
+    model = load_steganalysis_model()
+    return lambda: stego_probability(image, model)
+
+
+def run_case(case: Case, repeats: int, stego_path: Optional[str] = None) -> Dict:
+    """Time ``repeats`` calls of one case after a warm-up call; meant for a fresh process."""
+    # The 50-100 MP carriers are the suite's own and trip Pillow's bomb check.
+    warnings.simplefilter("ignore", Image.DecompressionBombWarning)
+    call = _prepare(case, stego_path)
+    call()
+    times = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        call()
+        times.append(time.perf_counter() - t0)
+    p50 = float(np.percentile(times, 50))
+    if case.payload_bytes is not None:
+        throughput, unit = case.payload_bytes / 1e6 / p50, "MB/s"
+    elif case.megapixels is not None:
+        throughput, unit = case.megapixels / p50, "MP/s"
+    else:
+        throughput, unit = 1 / p50, "calls/s"
+    rss = peak_rss_mb(children=case.op in _COLD_START)
+    return {
+        "op": case.op,
+        "megapixels": case.megapixels,
+        "payload_bytes": case.payload_bytes,
+        "repeats": repeats,
+        "p50_ms": round(p50 * 1e3, 3),
+        "p99_ms": round(float(np.percentile(times, 99)) * 1e3, 3),
+        "mean_ms": round(float(np.mean(times)) * 1e3, 3),
+        "throughput": round(throughput, 3),
+        "unit": unit,
+        "peak_rss_mb": None if rss is None else round(rss, 1),
+    }
+
+
+def _in_fresh_process(fn: Callable, *args):
+    # Spawned rather than forked, so the child starts without the parent's pages.
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        return pool.submit(fn, *args).result()
+
+
+def iter_benchmarks(cases: Sequence[Case], repeats: int = 5) -> Iterator[Dict]:
+    """Run ``cases`` one after another, each in its own process, yielding one record per case."""
+    if any(c.op in ("stego_probability", "load_steganalysis_model") for c in cases):
+        load_steganalysis_model()  # train and save the artifact up front if it is missing
+    with tempfile.TemporaryDirectory(prefix="cipher-engine-bench-") as tmp:
+        for case in cases:
+            record = {"case": case.name, "ok": True}
+            try:
+                stego_path = None
+                if case.op == "extract_message":
+                    stego_path = os.path.join(tmp, "stego.png")
+                    _in_fresh_process(_write_stego, stego_path, case.megapixels, case.payload_bytes)
+                record.update(_in_fresh_process(run_case, case, repeats, stego_path))
+            except Exception as exc:
+                record.update(ok=False, error=f"{type(exc).__name__}: {exc}")
+            yield record
+
+
+def environment() -> Dict:
+    import sklearn
+
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pillow": PIL.__version__,
+        "scikit-learn": sklearn.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def build_report(records: Sequence[Dict], repeats: int) -> Dict:
+    return {
+        "version": BENCH_VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "environment": environment(),
+        "repeats": repeats,
+        "cases": {r["case"]: {k: v for k, v in r.items() if k != "case"} for r in records},
+    }
+
+
+def compare(
+    report: Dict, baseline: Dict, threshold: float = DEFAULT_THRESHOLD
+) -> List[Regression]:
+    """Gated metrics of cases in both reports that grew by more than ``threshold`` (0.25 = 25%)."""
+    regressions = []
+    for name, current in report["cases"].items():
+        before = baseline.get("cases", {}).get(name)
+        if not before or not before.get("ok") or not current.get("ok"):
+            continue
+        for metric in GATED_METRICS:
+            old, new = before.get(metric), current.get(metric)
+            if old is not None and new is not None and new > old * (1 + threshold):
+                regressions.append(Regression(name, metric, old, new))
+    return regressions
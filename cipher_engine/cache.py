@@ -0,0 +1,142 @@
+"""Content-addressed, memory-bounded LRU cache for decode and analysis results.
+
+Results are keyed by a BLAKE2b digest of the input bytes together with
+everything else they depend on (scatter key, model version, grid, ...), so the
+same upload hits whatever its file name or session. Entries are evicted least
+recently used first once their estimated sizes add up to more than the bound;
+a value larger than the whole bound is returned but never stored.
+"""
+
+import hashlib
+import os
+import struct
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, NamedTuple, Optional, TypeVar
+
+import numpy as np
+from PIL import Image
+
+from .instrument import span
+
+CACHE_SIZE_ENV = "CIPHER_ENGINE_CACHE_MB"
+DEFAULT_CACHE_SIZE = 256 << 20
+
+T = TypeVar("T")
+_MISSING = object()
+
+
+class CacheStats(NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+    entries: int
+    size: int
+    max_bytes: int
+
+
+def cache_budget() -> int:
+    value = os.environ.get(CACHE_SIZE_ENV)
+    return int(float(value) * (1 << 20)) if value else DEFAULT_CACHE_SIZE
+
+
+def content_key(*parts: Any) -> str:
+    """Digest of ``parts``: bytes-like parts are hashed raw, anything else by ``repr``."""
+    digest = hashlib.blake2b(digest_size=20)
+    for part in parts:
+        if isinstance(part, (bytes, bytearray, memoryview)):
+            view = memoryview(part)
+            digest.update(struct.pack(">BQ", 0, view.nbytes))
+            digest.update(view)
+        else:
+            raw = repr(part).encode("utf-8")
+            digest.update(struct.pack(">BQ", 1, len(raw)))
+            digest.update(raw)
+    return digest.hexdigest()
+
+
+def estimate_size(value: Any) -> int:
+    """Approximate bytes held by ``value``, counting arrays, buffers and images by content."""
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, Image.Image):
+        return value.width * value.height * len(value.getbands())
+    if isinstance(value, dict):
+        return sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class ResultCache:
+    """Thread-safe LRU mapping bounded by the estimated size of its values."""
+
+    def __init__(self, max_bytes: Optional[int] = None) -> None:
+        self.max_bytes = cache_budget() if max_bytes is None else max_bytes
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._size = 0
+        self._hits = self._misses = self._evictions = 0
+        self._lock = threading.Lock()
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return default
+            self._hits += 1
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key: Hashable, value: Any, size: Optional[int] = None) -> bool:
+        """Store ``value``; returns False if it alone exceeds the bound."""
+        size = estimate_size(value) if size is None else size
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= old[1]
+            if size > self.max_bytes:
+                return False
+            self._entries[key] = (value, size)
+            self._size += size
+            while self._size > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._size -= evicted
+                self._evictions += 1
+        return True
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], T]) -> T:
+        """Cached value for ``key``, computing and storing it on a miss.
+
+        ``compute`` runs outside the lock, so concurrent misses on one key
+        may both compute it.
+        """
+        with span("cache"):
+            value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            with span("cache"):
+                self.put(key, value)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(
+                self._hits, self._misses, self._evictions, len(self._entries), self._size, self.max_bytes
+            )
@@ -0,0 +1,524 @@
+"""Batch command-line front end: ``python -m cipher_engine encode|decode|analyze <dir>``.
+
+``bench`` runs the :mod:`.bench` suite, ``train`` builds the model artifact and
+``serve`` runs the :mod:`.server` HTTP API.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from PIL import Image
+
+from .analysis import FEATURE_NAMES, analyze_batch
+from .bench import (
+    DEFAULT_PAYLOADS,
+    DEFAULT_SIZES,
+    DEFAULT_THRESHOLD,
+    OPERATIONS,
+    build_report,
+    compare,
+    iter_benchmarks,
+    plan_cases,
+)
+from .compression import CODEC_NAMES
+from .detectors import DETECTOR_NAMES
+from .files import iter_images
+from .frames import analyze_frames, embed_frames, extract_frames, is_animated
+from .model import (
+    MODEL_VERSION,
+    default_model_path,
+    feature_schema_hash,
+    load_steganalysis_model,
+    read_model,
+    save_model,
+)
+from .output import DEFAULT_OUTPUT, OUTPUT_FORMATS, available_outputs, save_output
+from .server import DEFAULT_HOST, DEFAULT_MAX_BODY, DEFAULT_PORT, serve
+from .shards import embed_shards, extract_shards
+from .stego import (
+    FORMAT_TEXT,
+    MAX_BITS,
+    embed_message_inplace,
+    embed_stream_inplace,
+    extract_file,
+    extract_message,
+    load_carrier,
+    locate,
+)
+from .training import DEFAULT_RATES, train_model
+
+ANALYZE_DECODE_THREADS = 2
+KEY_ENV = "CIPHER_ENGINE_KEY"
+
+_worker_model = None
+
+
+def _encode_file(
+    path: str,
+    message: Optional[str],
+    payload_file: Optional[str],
+    output_dir: str,
+    bits: int,
+    key: Optional[str],
+    compress: bool,
+    output: str = DEFAULT_OUTPUT,
+    frame_workers: int = 1,
+) -> Dict:
+    if is_animated(path):
+        return _encode_frames(
+            path, message, payload_file, output_dir, bits, key, compress, frame_workers
+        )
+    carrier = load_carrier(path)
+    t0 = time.perf_counter()
+    if payload_file is None:
+        header = embed_message_inplace(carrier, message, bits, key, compress)
+    else:
+        with open(payload_file, "rb") as source:
+            header = embed_stream_inplace(carrier, source, bits=bits, key=key, compress=compress)
+    elapsed = time.perf_counter() - t0
+    out = Path(output_dir) / f"{Path(path).stem}.{OUTPUT_FORMATS[output].extension}"
+    encoded = Image.fromarray(carrier)
+    del carrier
+    t0 = time.perf_counter()
+    save_output(encoded, out, output)
+    encode_seconds = time.perf_counter() - t0
+    payload_mb = header.raw_length / 1e6
+    return {
+        "output": str(out),
+        "bits": bits,
+        "codec": CODEC_NAMES[header.codec],
+        "stored_bytes": header.length,
+        "embed_mb_s": round(payload_mb / elapsed, 3) if elapsed else None,
+        "encode_ms": round(encode_seconds * 1e3, 1),
+        "output_bytes": out.stat().st_size,
+    }
+
+
+def _encode_frames(
+    path: str,
+    message: Optional[str],
+    payload_file: Optional[str],
+    output_dir: str,
+    bits: int,
+    key: Optional[str],
+    compress: bool,
+    workers: int = 1,
+) -> Dict:
+    payload = message if payload_file is None else Path(payload_file).read_bytes()
+    out = Path(output_dir) / f"{Path(path).stem}.png"
+    shards = embed_frames(path, payload, out, bits, key, compress, workers)
+    return {
+        "output": str(out),
+        "bits": bits,
+        "frames": len(shards),
+        "stored_bytes": sum(shard.length for shard in shards),
+    }
+
+
+def _decode_frames(path: str, output_dir: Optional[str], key: Optional[str], workers: int = 1) -> Dict:
+    result = extract_frames(path, key, workers)
+    payload = result.payload
+    record = {
+        "found": payload is not None,
+        "message": None,
+        "frames": result.count,
+        "missing": result.missing,
+        "corrupt": [{"frame": pos, "error": why} for pos, why in result.corrupt],
+    }
+    if payload is not None and payload.format == FORMAT_TEXT:
+        record["message"] = payload.data.decode("utf-8", errors="replace")
+    elif payload is not None:
+        record["bytes"] = len(payload.data)
+        if output_dir is not None:
+            out = Path(output_dir) / f"{Path(path).stem}.bin"
+            out.write_bytes(payload.data)
+            record["output"] = str(out)
+    return record
+
+
+def _decode_file(
+    path: str, output_dir: Optional[str], key: Optional[str], frame_workers: int = 1
+) -> Dict:
+    if is_animated(path):
+        return _decode_frames(path, output_dir, key, frame_workers)
+    with Image.open(path) as img:
+        located = locate(img, key)
+        if located is None:
+            return {"found": False, "message": None}
+        header = located.header
+        codec = CODEC_NAMES[header.codec]
+        record = {"found": True, "message": None, "bits": header.bits, "codec": codec}
+        if header.format == FORMAT_TEXT:
+            record["message"] = extract_message(img, key, located)
+            return record
+        record["stored_bytes"] = header.length
+        if output_dir is not None:
+            out = Path(output_dir) / f"{Path(path).stem}.bin"
+            record["bytes"] = extract_file(img, out, key=key, located=located)
+            record["output"] = str(out)
+    return record
+
+
+def _analyze_batch(paths: List[str], frame_workers: int = 1) -> List[Dict]:
+    result = analyze_batch(paths, _worker_model, workers=ANALYZE_DECODE_THREADS)
+    rate = round(result.images_per_second, 3)
+    records = []
+    detector_cols = [FEATURE_NAMES.index(name) for name in DETECTOR_NAMES]
+    for path, prob, feats, error in zip(paths, result.probabilities, result.features, result.errors):
+        if error is None:
+            records.append({
+                "file": path,
+                "ok": True,
+                "probability": round(float(prob), 6),
+                "detectors": {
+                    name: round(float(feats[col]), 6) for name, col in zip(DETECTOR_NAMES, detector_cols)
+                },
+                "batch_images_per_s": rate,
+            })
+        else:
+            records.append({"file": path, "ok": False, "error": error})
+    for record in records:
+        if record["ok"] and is_animated(record["file"]):
+            frames = analyze_frames(record["file"], _worker_model, frame_workers)
+            record["frame_probabilities"] = [round(float(p), 6) for p in frames.probabilities]
+    return records
+
+
+def _frame_workers(workers: int, tasks: int) -> int:
+    # Tasks already run ``workers`` at a time; an animation's frames share the rest.
+    return max(1, workers // max(1, min(tasks, workers)))
+
+
+def _init_worker(model) -> None:
+    global _worker_model
+    _worker_model = model
+
+
+def _run(task: Callable[..., Dict], path: str, *args) -> Dict:
+    t0 = time.perf_counter()
+    try:
+        record = {"file": path, "ok": True, **task(path, *args)}
+    except Exception as exc:
+        record = {"file": path, "ok": False, "error": f"{type(exc).__name__}: {exc}"}
+    record["seconds"] = round(time.perf_counter() - t0, 6)
+    return record
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="cipher-engine",
+        description="Batch LSB encode/decode and steganalysis. Emits one JSON object per file.",
+    )
+    parser.add_argument(
+        "-j", "--workers", type=int, default=os.cpu_count() or 1,
+        help="worker processes (default: CPU count)",
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    enc = sub.add_parser("encode", help="embed a message into every image in a directory")
+    enc.add_argument("directory", type=Path)
+    payload = enc.add_mutually_exclusive_group(required=True)
+    payload.add_argument("-m", "--message")
+    payload.add_argument(
+        "-f", "--file", type=Path, help="embed this file as a binary payload, streamed in chunks"
+    )
+    enc.add_argument("-o", "--output-dir", type=Path, required=True)
+    enc.add_argument(
+        "-k", "--bits", type=int, choices=range(1, MAX_BITS + 1), default=1,
+        help="low bits per channel to embed into (default: 1)",
+    )
+    enc.add_argument(
+        "--key", default=os.environ.get(KEY_ENV),
+        help=f"scatter the payload over pixels chosen by this shared secret (default: ${KEY_ENV})",
+    )
+    enc.add_argument(
+        "--no-compress", dest="compress", action="store_false",
+        help="store the payload as-is instead of with the smallest codec",
+    )
+    enc.add_argument(
+        "--shard", action="store_true",
+        help="split one payload across all images in the directory instead of embedding it in each",
+    )
+    enc.add_argument(
+        "--format", dest="output_format", choices=available_outputs(), default=DEFAULT_OUTPUT,
+        help=f"encoding of still outputs; shards and animations stay PNG (default: {DEFAULT_OUTPUT})",
+    )
+
+    dec = sub.add_parser("decode", help="extract hidden messages from every image in a directory")
+    dec.add_argument("directory", type=Path)
+    dec.add_argument(
+        "-o", "--output-dir", type=Path, default=None,
+        help="write binary payloads here as <image>.bin (default: report their size only)",
+    )
+    dec.add_argument(
+        "--key", default=os.environ.get(KEY_ENV),
+        help=f"shared secret the payloads were scattered with (default: ${KEY_ENV})",
+    )
+    dec.add_argument(
+        "--shards", action="store_true",
+        help="reassemble the directory as one shard set (binary payloads go to -o as payload.bin)",
+    )
+
+    ana = sub.add_parser("analyze", help="score every image in a directory for hidden payloads")
+    ana.add_argument("directory", type=Path)
+    ana.add_argument(
+        "--batch-size", type=int, default=64,
+        help="images per worker task, scored with one model call (default: 64)",
+    )
+
+    trn = sub.add_parser("train", help="train and persist the steganalysis model artifact")
+    trn.add_argument("--path", type=Path, default=None, help="artifact path (default: user cache)")
+    trn.add_argument("--samples", type=int, default=100, help="synthetic samples (default: 100)")
+    trn.add_argument("--carriers", type=Path, default=None, help="directory of real carrier images")
+    trn.add_argument(
+        "--rates", default=",".join(str(r) for r in DEFAULT_RATES),
+        help="comma-separated payload rates for carrier images",
+    )
+    trn.add_argument("--trees", type=int, default=50, help="trees to fit, or to add with --update")
+    trn.add_argument("--max-depth", type=int, default=5, help="tree depth limit, 0 for unlimited")
+    trn.add_argument(
+        "--update", action="store_true",
+        help="add trees fitted on the new samples to the existing artifact instead of refitting",
+    )
+
+    bch = sub.add_parser("bench", help="time the core operations over carrier and payload sizes")
+    bch.add_argument(
+        "--sizes", default=",".join(f"{mp:g}" for mp in DEFAULT_SIZES),
+        help="comma-separated carrier sizes in megapixels (default: %(default)s)",
+    )
+    bch.add_argument(
+        "--payloads", default=",".join(DEFAULT_PAYLOADS),
+        help="comma-separated payload sizes: bytes, with K/M suffixes, or 'full' (default: %(default)s)",
+    )
+    bch.add_argument(
+        "--ops", default=",".join(OPERATIONS),
+        help="comma-separated operations to time (default: all)",
+    )
+    bch.add_argument("--repeats", type=int, default=5, help="timed calls per case (default: 5)")
+    bch.add_argument("-o", "--output", type=Path, default=None, help="write the JSON report here")
+    bch.add_argument(
+        "--baseline", type=Path, default=None,
+        help="earlier report to compare against; exit non-zero on regressions",
+    )
+    bch.add_argument(
+        "--threshold", type=float, default=DEFAULT_THRESHOLD,
+        help="relative growth in p50 latency or peak RSS that counts as a regression "
+        "(default: %(default)s)",
+    )
+
+    srv = sub.add_parser("serve", help="run a local HTTP API: POST /encode, /decode and /analyze")
+    srv.add_argument("--host", default=DEFAULT_HOST, help="address to bind (default: %(default)s)")
+    srv.add_argument("--port", type=int, default=DEFAULT_PORT, help="port (default: %(default)s)")
+    srv.add_argument(
+        "--max-body-mb", type=float, default=DEFAULT_MAX_BODY / (1 << 20),
+        help="largest request body accepted, in MB (default: %(default)g)",
+    )
+    srv.add_argument(
+        "--max-pending", type=int, default=None,
+        help="requests running or queued before new ones get 429 (default: 2 x workers)",
+    )
+    return parser
+
+
+def _bench(args: argparse.Namespace) -> int:
+    baseline = None
+    if args.baseline is not None:
+        try:
+            baseline = json.loads(args.baseline.read_text())
+        except (OSError, ValueError) as exc:
+            print(f"cipher-engine: cannot read baseline {args.baseline}: {exc}", file=sys.stderr)
+            return 2
+    try:
+        cases = plan_cases(
+            [float(mp) for mp in args.sizes.split(",")],
+            args.payloads.split(","),
+            [op.strip() for op in args.ops.split(",")],
+        )
+    except ValueError as exc:
+        print(f"cipher-engine: {exc}", file=sys.stderr)
+        return 2
+    if args.repeats < 1:
+        print("cipher-engine: --repeats must be at least 1", file=sys.stderr)
+        return 2
+
+    records = []
+    for record in iter_benchmarks(cases, args.repeats):
+        records.append(record)
+        sys.stdout.write(json.dumps(record) + "\n")
+        sys.stdout.flush()
+    report = build_report(records, args.repeats)
+    if args.output is not None:
+        args.output.write_text(json.dumps(report, indent=2, sort_keys=True) + "\n")
+
+    failures = sum(not record["ok"] for record in records)
+    regressions = compare(report, baseline, args.threshold) if baseline is not None else []
+    for reg in regressions:
+        print(
+            f"cipher-engine: regression in {reg.case}: {reg.metric} "
+            f"{reg.baseline:g} -> {reg.current:g} (+{reg.change:.0%})",
+            file=sys.stderr,
+        )
+    return 1 if failures or regressions else 0
+
+
+def _serve(args: argparse.Namespace) -> int:
+    if args.max_pending is not None and args.max_pending < 1:
+        print("cipher-engine: --max-pending must be at least 1", file=sys.stderr)
+        return 2
+    serve(args.host, args.port, args.workers, int(args.max_body_mb * (1 << 20)), args.max_pending)
+    return 0
+
+
+def _train(args: argparse.Namespace) -> int:
+    path = args.path or default_model_path()
+    base = None
+    if args.update:
+        base = read_model(path)
+        if base is None:
+            print(f"cipher-engine: no current model artifact at {path}", file=sys.stderr)
+            return 2
+    carriers = iter_images(args.carriers) if args.carriers else []
+    model, report = train_model(
+        n_synthetic=args.samples,
+        carriers=carriers,
+        rates=[float(r) for r in args.rates.split(",")],
+        n_estimators=args.trees,
+        max_depth=args.max_depth or None,
+        workers=args.workers,
+        base=base,
+    )
+    save_model(model, path)
+    record = {
+        "path": str(path),
+        "version": MODEL_VERSION,
+        "schema": feature_schema_hash(),
+        "trees": len(model.estimators_),
+        **{k: round(v, 6) if isinstance(v, float) else v for k, v in report._asdict().items()},
+    }
+    sys.stdout.write(json.dumps(record) + "\n")
+    return 0
+
+
+def _encode_shards(args: argparse.Namespace, paths: List[str]) -> int:
+    message = args.message if args.file is None else args.file.read_bytes()
+    outputs = [args.output_dir / f"{Path(path).stem}.png" for path in paths]
+    t0 = time.perf_counter()
+    try:
+        shards = embed_shards(paths, message, args.bits, args.key, args.compress, args.workers, outputs)
+    except Exception as exc:
+        print(f"cipher-engine: {type(exc).__name__}: {exc}", file=sys.stderr)
+        return 1
+    seconds = round(time.perf_counter() - t0, 6)
+    for path, out, shard in zip(paths, outputs, shards):
+        record = {
+            "file": path,
+            "ok": True,
+            "output": str(out),
+            "shard": shard.index,
+            "count": len(shards),
+            "stored_bytes": shard.length,
+            "seconds": seconds,
+        }
+        sys.stdout.write(json.dumps(record) + "\n")
+    return 0
+
+
+def _decode_shards(args: argparse.Namespace, paths: List[str]) -> int:
+    t0 = time.perf_counter()
+    result = extract_shards(paths, args.key, args.workers)
+    record = {
+        "directory": str(args.directory),
+        "ok": result.payload is not None,
+        "count": result.count,
+        "found": result.found,
+        "missing": result.missing,
+        "corrupt": [
+            {"file": paths[pos] if pos >= 0 else None, "error": why} for pos, why in result.corrupt
+        ],
+        "message": None,
+    }
+    payload = result.payload
+    if payload is not None and payload.format == FORMAT_TEXT:
+        record["message"] = payload.data.decode("utf-8", errors="replace")
+    elif payload is not None:
+        record["bytes"] = len(payload.data)
+        if args.output_dir is not None:
+            out = args.output_dir / "payload.bin"
+            out.write_bytes(payload.data)
+            record["output"] = str(out)
+    record["seconds"] = round(time.perf_counter() - t0, 6)
+    sys.stdout.write(json.dumps(record) + "\n")
+    return 0 if record["ok"] else 1
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.workers < 1:
+        print("cipher-engine: --workers must be at least 1", file=sys.stderr)
+        return 2
+    if args.command == "train":
+        return _train(args)
+    if args.command == "bench":
+        return _bench(args)
+    if args.command == "serve":
+        return _serve(args)
+    if not args.directory.is_dir():
+        print(f"cipher-engine: not a directory: {args.directory}", file=sys.stderr)
+        return 2
+
+    paths = [str(p) for p in iter_images(args.directory)]
+    initargs = (None,)
+    frame_workers = _frame_workers(args.workers, len(paths))
+    if args.command == "encode":
+        if args.file is not None and not args.file.is_file():
+            print(f"cipher-engine: not a file: {args.file}", file=sys.stderr)
+            return 2
+        args.output_dir.mkdir(parents=True, exist_ok=True)
+        if args.shard:
+            return _encode_shards(args, paths)
+        payload_file = None if args.file is None else str(args.file)
+        options = (
+            args.message,
+            payload_file,
+            str(args.output_dir),
+            args.bits,
+            args.key,
+            args.compress,
+            args.output_format,
+            frame_workers,
+        )
+        jobs = [(_run, _encode_file, path, *options) for path in paths]
+    elif args.command == "decode":
+        output_dir = None
+        if args.output_dir is not None:
+            args.output_dir.mkdir(parents=True, exist_ok=True)
+            output_dir = str(args.output_dir)
+        if args.shards:
+            return _decode_shards(args, paths)
+        jobs = [(_run, _decode_file, path, output_dir, args.key, frame_workers) for path in paths]
+    else:
+        size = max(args.batch_size, 1)
+        batches = [paths[i : i + size] for i in range(0, len(paths), size)]
+        frame_workers = _frame_workers(args.workers, len(batches))
+        jobs = [(_analyze_batch, batch, frame_workers) for batch in batches]
+        initargs = (load_steganalysis_model(),)
+
+    failures = 0
+    with ProcessPoolExecutor(
+        max_workers=args.workers, initializer=_init_worker, initargs=initargs
+    ) as pool:
+        futures = [pool.submit(*job) for job in jobs]
+        for future in as_completed(futures):
+            result = future.result()
+            for record in result if isinstance(result, list) else [result]:
+                failures += not record["ok"]
+                sys.stdout.write(json.dumps(record) + "\n")
+            sys.stdout.flush()
+
+    return 1 if failures else 0
@@ -0,0 +1,126 @@
+"""Payload compression with automatic codec selection.
+
+Every stdlib codec is tried and the smallest result wins; payloads nothing
+shrinks are stored raw. Payloads larger than ``SAMPLE_SIZE`` are ranked on
+their leading sample and only the winner is run over the whole payload.
+Streams are compressed and decompressed chunk by chunk, and decompression
+stops with an error as soon as the output passes a given length, so a few
+hundred crafted bytes cannot expand into all of memory.
+"""
+
+import bz2
+import lzma
+import zlib
+from typing import BinaryIO, Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+CODEC_NONE = 0
+CODEC_ZLIB = 1
+CODEC_LZMA = 2
+CODEC_BZ2 = 3
+CODEC_NAMES = {CODEC_NONE: "none", CODEC_ZLIB: "zlib", CODEC_LZMA: "lzma", CODEC_BZ2: "bz2"}
+SAMPLE_SIZE = 256 << 10
+
+_COMPRESSORS: Dict[int, Callable] = {
+    CODEC_ZLIB: lambda: zlib.compressobj(9),
+    CODEC_LZMA: lambda: lzma.LZMACompressor(lzma.FORMAT_ALONE),
+    CODEC_BZ2: lambda: bz2.BZ2Compressor(9),
+}
+
+
+def _compress(codec: int, data: bytes) -> bytes:
+    compressor = _COMPRESSORS[codec]()
+    return compressor.compress(data) + compressor.flush()
+
+
+def choose_codec(sample: bytes) -> Tuple[int, float]:
+    """Best codec for ``sample`` and its compressed-to-raw ratio; ``(CODEC_NONE, 1.0)`` if none helps."""
+    best, best_size = CODEC_NONE, len(sample)
+    for codec in _COMPRESSORS:
+        size = len(_compress(codec, sample))
+        if size < best_size:
+            best, best_size = codec, size
+    return best, best_size / len(sample) if sample else 1.0
+
+
+def compress_payload(data: bytes) -> Tuple[int, bytes]:
+    if len(data) <= SAMPLE_SIZE:
+        candidates = list(_COMPRESSORS)
+    else:
+        candidates = [choose_codec(data[:SAMPLE_SIZE])[0]]
+    best, best_data = CODEC_NONE, data
+    for codec in candidates:
+        if codec == CODEC_NONE:
+            continue
+        packed = _compress(codec, data)
+        if len(packed) < len(best_data):
+            best, best_data = codec, packed
+    return best, best_data
+
+
+def compress_stream(codec: int, source: BinaryIO, length: int, dest: BinaryIO, chunk_size: int) -> int:
+    """Compress ``length`` bytes of ``source`` into ``dest``; returns the compressed size."""
+    compressor = _COMPRESSORS[codec]()
+    written = 0
+    remaining = length
+    while remaining:
+        chunk = source.read(min(chunk_size, remaining))
+        if not chunk:
+            raise ValueError(f"Payload source ended {remaining} bytes short of {length}.")
+        remaining -= len(chunk)
+        written += dest.write(compressor.compress(chunk))
+    written += dest.write(compressor.flush())
+    return written
+
+
+def iter_decompressed(
+    codec: int, chunks: Iterable[bytes], out_size: int, max_length: Optional[int] = None
+) -> Iterator[bytes]:
+    """Decompress ``chunks``, yielding at most ``out_size`` bytes at a time.
+
+    Raises ValueError once the output passes ``max_length`` bytes.
+    """
+    total = 0
+    for piece in _decompressed(codec, chunks, out_size):
+        total += len(piece)
+        if max_length is not None and total > max_length:
+            raise ValueError(f"Payload decompresses to more than {max_length} bytes.")
+        yield piece
+
+
+def _decompressed(codec: int, chunks: Iterable[bytes], out_size: int) -> Iterator[bytes]:
+    if codec == CODEC_NONE:
+        yield from chunks
+        return
+    if codec not in _COMPRESSORS:
+        raise ValueError(f"Unknown payload codec {codec}.")
+    try:
+        if codec == CODEC_ZLIB:
+            d = zlib.decompressobj()
+            for chunk in chunks:
+                while chunk:
+                    yield d.decompress(chunk, out_size)
+                    chunk = d.unconsumed_tail
+            yield d.flush()
+            complete = d.eof
+        else:
+            if codec == CODEC_LZMA:
+                d = lzma.LZMADecompressor(lzma.FORMAT_ALONE)
+            else:
+                d = bz2.BZ2Decompressor()
+            for chunk in chunks:
+                yield d.decompress(chunk, out_size)
+                while not d.eof and not d.needs_input:
+                    yield d.decompress(b"", out_size)
+            complete = d.eof
+    except (zlib.error, lzma.LZMAError, OSError) as exc:
+        raise ValueError(f"Corrupt {CODEC_NAMES[codec]} payload: {exc}") from exc
+    if not complete:
+        raise ValueError(f"Truncated {CODEC_NAMES[codec]} payload.")
+
+
+def decompress_payload(codec: int, data: bytes, max_length: Optional[int] = None) -> bytes:
+    if codec == CODEC_NONE:
+        if max_length is not None and len(data) > max_length:
+            raise ValueError(f"Payload decompresses to more than {max_length} bytes.")
+        return data
+    return b"".join(iter_decompressed(codec, [data], 1 << 20, max_length))
@@ -0,0 +1,218 @@
+"""Full-resolution statistical LSB detectors.
+
+Chi-square pairs-of-values, RS analysis and sample-pair analysis are all built
+from counts that add up across regions, so the image is walked in fixed-size
+tiles and only the per-tile counts are kept. Peak temporary memory is bounded
+by ``TILE_SIZE`` regardless of the carrier's resolution, and nothing is
+resampled before measuring.
+"""
+
+from typing import Callable, Iterator, List, Sequence, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from PIL import Image
+
+from .instrument import progress
+
+TILE_SIZE = 512
+DETECTOR_NAMES = ("chi_square", "rs", "spa")
+RS_GROUP = 4
+
+_BATCH_CHUNK = 8
+
+
+def as_rgb_array(image) -> np.ndarray:
+    if isinstance(image, Image.Image):
+        return np.asarray(image.convert("RGB"))
+    return np.asarray(image)
+
+
+def iter_tiles(arr: np.ndarray, tile: int = TILE_SIZE) -> Iterator[np.ndarray]:
+    h, w = arr.shape[:2]
+    for y in range(0, h, tile):
+        for x in range(0, w, tile):
+            yield arr[y : y + tile, x : x + tile]
+
+
+# Counters take a stack of equally sized windows laid out as (n, h, w, c) and
+# return one row of additive counts per window, shape (n, k).
+Counter = Callable[[np.ndarray], np.ndarray]
+
+
+def _accumulate(arr: np.ndarray, counters: Sequence[Counter]) -> List[np.ndarray]:
+    h, w = arr.shape[:2]
+    tiles = -(-h // TILE_SIZE) * -(-w // TILE_SIZE)
+    totals = [0] * len(counters)
+    for done, tile in enumerate(iter_tiles(arr), 1):
+        signed = tile.astype(np.int16)[None]
+        for i, counter in enumerate(counters):
+            totals[i] = totals[i] + counter(signed)[0]
+        progress(done, tiles, "tiles")
+    return totals
+
+
+def _histogram_counts(windows: np.ndarray) -> np.ndarray:
+    n = windows.shape[0]
+    offsets = (np.arange(n) * 256)[:, None]
+    indices = windows.reshape(n, -1) + offsets
+    return np.bincount(indices.ravel(), minlength=256 * n).reshape(n, 256)
+
+
+def _chi_square_score(hist: np.ndarray) -> float:
+    pairs = hist.reshape(128, 2)
+    expected = pairs.sum(axis=1) / 2
+    used = expected > 0
+    dof = int(used.sum()) - 1
+    if dof < 1:
+        return 0.0
+    chi2 = np.sum((pairs[used, 0] - expected[used]) ** 2 / expected[used])
+    # Deferred: scipy.special takes about 0.35 s to import.
+    from scipy.special import gammaincc
+
+    return float(gammaincc(dof / 2, chi2 / 2))
+
+
+def _rs_counts(windows: np.ndarray) -> np.ndarray:
+    # Groups are 4 horizontally adjacent samples of one channel, flipped with
+    # the mask [0, 1, 1, 0]. F1 moves a sample by s = 1 - 2*lsb and F-1 by -s,
+    # so both flips are expressed on the neighbour differences directly.
+    # Counts are taken for the window and for the window with every LSB
+    # inverted, as RS analysis requires.
+    n, h, w, channels = windows.shape
+    w -= w % RS_GROUP
+    if w == 0:
+        return np.zeros((n, 9))
+    groups = windows[:, :, :w].reshape(n, h, w // RS_GROUP, RS_GROUP, channels)
+    c = np.ascontiguousarray(groups.transpose(3, 0, 1, 2, 4)).reshape(RS_GROUP, n, -1)
+    s = 1 - 2 * (c & 1)
+    d0, d1, d2 = c[1] - c[0], c[2] - c[1], c[3] - c[2]
+
+    counts = []
+    for inverted in (False, True):
+        if inverted:
+            d0, d1, d2 = d0 + s[1] - s[0], d1 + s[2] - s[1], d2 + s[3] - s[2]
+            s = -s
+        f0 = np.abs(d0) + np.abs(d1) + np.abs(d2)
+        s1, s2 = s[1], s[2]
+        for sign in (1, -1):
+            f = np.abs(d0 + sign * s1) + np.abs(d1 + sign * (s2 - s1)) + np.abs(d2 - sign * s2)
+            counts += [np.count_nonzero(f > f0, axis=1), np.count_nonzero(f < f0, axis=1)]
+    counts.append(np.full(n, c.shape[2]))
+    return np.stack(counts, axis=1).astype(np.float64)
+
+
+def _rs_score(counts: np.ndarray) -> float:
+    n = counts[-1]
+    if n == 0:
+        return 0.0
+    rm, sm, rnm, snm, rm1, sm1, rnm1, snm1 = counts[:-1] / n
+    d0, d1 = rm - sm, rm1 - sm1
+    n0, n1 = rnm - snm, rnm1 - snm1
+    a = 2 * (d1 + d0)
+    b = n0 - n1 - d1 - 3 * d0
+    c = d0 - n0
+    if abs(a) < 1e-12:
+        if abs(b) < 1e-12:
+            return 0.0
+        z = -c / b
+    else:
+        # A negative discriminant means the estimate saturated near full
+        # embedding; the parabola's vertex is then the closest real answer.
+        disc = max(b * b - 4 * a * c, 0.0)
+        roots = ((-b + np.sqrt(disc)) / (2 * a), (-b - np.sqrt(disc)) / (2 * a))
+        z = min(roots, key=abs)
+    if abs(z - 0.5) < 1e-12:
+        return 1.0
+    return float(np.clip(z / (z - 0.5), 0.0, 1.0))
+
+
+def _spa_counts(windows: np.ndarray) -> np.ndarray:
+    u, v = windows[:, :, :-1], windows[:, :, 1:]
+    even = (v & 1) == 0
+    axes = (1, 2, 3)
+    x = np.count_nonzero((even & (u < v)) | (~even & (u > v)), axis=axes)
+    y = np.count_nonzero((even & (u > v)) | (~even & (u < v)), axis=axes)
+    k = np.count_nonzero((u >> 1) == (v >> 1), axis=axes)
+    pairs = np.full(windows.shape[0], u[0].size)
+    return np.stack([x, y, k, pairs], axis=1).astype(np.float64)
+
+
+def _spa_score(counts: np.ndarray) -> float:
+    x, y, k, pairs = counts
+    if k == 0:
+        return 0.0
+    a = k / 2
+    b = 2 * x - pairs
+    c = y - x
+    disc = max(b * b - 4 * a * c, 0.0)
+    roots = ((-b + np.sqrt(disc)) / (2 * a), (-b - np.sqrt(disc)) / (2 * a))
+    return float(np.clip(min(roots), 0.0, 1.0))
+
+
+def chi_square_attack(image) -> float:
+    (hist,) = _accumulate(as_rgb_array(image), [_histogram_counts])
+    return _chi_square_score(hist)
+
+
+def rs_analysis(image) -> float:
+    (counts,) = _accumulate(as_rgb_array(image), [_rs_counts])
+    return _rs_score(counts)
+
+
+def sample_pair_analysis(image) -> float:
+    (counts,) = _accumulate(as_rgb_array(image), [_spa_counts])
+    return _spa_score(counts)
+
+
+def _scores(hist: np.ndarray, rs: np.ndarray, spa: np.ndarray) -> np.ndarray:
+    return np.array([_chi_square_score(hist), _rs_score(rs), _spa_score(spa)])
+
+
+def detector_scores(image) -> np.ndarray:
+    return _scores(*_accumulate(as_rgb_array(image), [_histogram_counts, _rs_counts, _spa_counts]))
+
+
+def batch_detector_scores(batch: np.ndarray) -> np.ndarray:
+    """Score a stack of equally sized images ``(N, h, w, 3)``; returns ``(N, 3)``.
+
+    Intended for small images such as training samples. Images are counted
+    a few at a time so the int16 temporaries stay cache-sized.
+    """
+    scores = np.empty((batch.shape[0], len(DETECTOR_NAMES)))
+    for start in range(0, batch.shape[0], _BATCH_CHUNK):
+        windows = batch[start : start + _BATCH_CHUNK].astype(np.int16)
+        totals = [counter(windows) for counter in (_histogram_counts, _rs_counts, _spa_counts)]
+        for i in range(windows.shape[0]):
+            scores[start + i] = _scores(*(t[i] for t in totals))
+    return scores
+
+
+def window_detector_scores(image, grid: Tuple[int, int]) -> np.ndarray:
+    """Score every cell of a ``rows x cols`` grid; returns ``(rows, cols, 3)``.
+
+    Cells are strided views into the image. Each grid row is processed in
+    bands of at most ``TILE_SIZE**2`` pixels with every cell of the row
+    vectorized together, so memory stays bounded for any resolution.
+    """
+    arr = as_rgb_array(image)
+    rows, cols = grid
+    h, w = arr.shape[:2]
+    th, tw = h // rows, w // cols
+    if th == 0 or tw == 0:
+        raise ValueError(f"Image {w}x{h} is too small for a {rows}x{cols} grid.")
+    cells = sliding_window_view(arr, (th, tw, arr.shape[2]))[::th, ::tw, 0][:rows, :cols]
+    step = max(1, TILE_SIZE * TILE_SIZE // (cols * tw))
+    counters = [_histogram_counts, _rs_counts, _spa_counts]
+
+    scores = np.empty((rows, cols, len(DETECTOR_NAMES)))
+    for r in range(rows):
+        totals = [0] * len(counters)
+        for y in range(0, th, step):
+            signed = cells[r, :, y : y + step].astype(np.int16)
+            for i, counter in enumerate(counters):
+                totals[i] = totals[i] + counter(signed)
+        for c in range(cols):
+            scores[r, c] = _scores(*(t[c] for t in totals))
+        progress(r + 1, rows, "grid rows")
+    return scores
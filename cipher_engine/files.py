@@ -0,0 +1,10 @@
+"""Filesystem helpers shared by the batch front ends."""
+
+from pathlib import Path
+from typing import List
+
+IMAGE_SUFFIXES = {".png", ".apng", ".jpg", ".jpeg", ".gif", ".webp", ".tif", ".tiff"}
+
+
+def iter_images(directory: Path) -> List[Path]:
+    return sorted(p for p in directory.iterdir() if p.is_file() and p.suffix.lower() in IMAGE_SUFFIXES)
@@ -0,0 +1,314 @@
+"""Multi-frame carriers: animated PNG/GIF files and directories of frames.
+
+Every frame is one carrier of a :mod:`.shards` set, so the payload is spread
+over the frames with per-frame checksums and reassembled in any order. Frames
+are produced lazily and embedded, extracted or scored in worker processes
+with a bounded number in flight, so the whole animation is never decoded at
+once.
+
+Animations are written as APNG with full-canvas frames, streamed chunk by
+chunk from the frames' PNG encodings. Frames of such an APNG decode
+independently and are handed to the workers as standalone PNGs; GIF frames
+and APNG frames that blend or offset are composited in order first. GIF
+carriers are palette images, and re-quantising an embedded frame to 256
+colours would destroy its low bits, so they are written as APNG too.
+"""
+
+import io
+import os
+import struct
+import time
+import zlib
+from pathlib import Path
+from typing import (
+    TYPE_CHECKING,
+    BinaryIO,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union,
+)
+
+import numpy as np
+from PIL import Image
+
+from .analysis import FEATURE_NAMES, BatchAnalysis, _analysis_inputs, extract_features_batch
+from .files import iter_images
+from .instrument import span
+from .scatter import Key
+from .shards import (
+    SHARD_HEADER_SIZE,
+    EmbeddedShard,
+    ShardSet,
+    Source,
+    _embed_shard,
+    _imap,
+    _open,
+    _shard_jobs,
+    extract_shards,
+    shard_capacity,
+)
+from .stego import payload_capacity
+
+if TYPE_CHECKING:
+    from sklearn.ensemble import RandomForestClassifier
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+DEFAULT_DURATION = 100
+
+FrameSource = Union[str, os.PathLike, bytes]
+
+_FCTL = struct.Struct(">IIIIIHHBB")
+_CHUNK_HEAD = struct.Struct(">I4s")
+
+
+class Animation(NamedTuple):
+    """Frame layout of a multi-frame carrier; ``size`` is None for a directory."""
+
+    frames: int
+    size: Optional[Tuple[int, int]]
+    loop: int
+
+
+def _is_dir(source: FrameSource) -> bool:
+    return not isinstance(source, bytes) and os.path.isdir(source)
+
+
+def _open_bytes(source: FrameSource) -> BinaryIO:
+    return io.BytesIO(source) if isinstance(source, bytes) else open(source, "rb")
+
+
+def is_animated(source: Source) -> bool:
+    """True for a file with more than one frame; reads headers only.
+
+    A file object is left at the position it was passed in at.
+    """
+    start = source.tell() if hasattr(source, "seek") else None
+    try:
+        with _open(source) as img:
+            return getattr(img, "n_frames", 1) > 1
+    except Exception:
+        return False
+    finally:
+        if start is not None:
+            source.seek(start)
+
+
+def probe_frames(source: FrameSource) -> Animation:
+    if _is_dir(source):
+        return Animation(len(iter_images(Path(source))), None, 0)
+    with Image.open(_open_bytes(source)) as img:
+        return Animation(getattr(img, "n_frames", 1), img.size, int(img.info.get("loop", 0)))
+
+
+def frame_capacities(source: FrameSource, bits: int = 1) -> List[int]:
+    """Shard capacity of every frame, from image headers only."""
+    if _is_dir(source):
+        return [shard_capacity(path, bits) for path in iter_images(Path(source))]
+    info = probe_frames(source)
+    per_frame = max(payload_capacity(info.size, bits) - SHARD_HEADER_SIZE, 0)
+    return [per_frame] * info.frames
+
+
+def _chunks(f: BinaryIO) -> Iterator[Tuple[bytes, int, int]]:
+    # (type, data offset, data length) for each chunk, without reading data.
+    if f.read(8) != PNG_SIGNATURE:
+        return
+    while True:
+        head = f.read(_CHUNK_HEAD.size)
+        if len(head) < _CHUNK_HEAD.size:
+            return
+        length, ctype = _CHUNK_HEAD.unpack(head)
+        offset = f.tell()
+        yield ctype, offset, length
+        if ctype == b"IEND":
+            return
+        f.seek(offset + length + 4)
+
+
+def _chunk(ctype: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + ctype + data + struct.pack(">I", zlib.crc32(ctype + data))
+
+
+def _independent_apng(f: BinaryIO) -> Optional[Tuple[bytes, List[Tuple[int, list]]]]:
+    # For an APNG whose frames all cover the whole canvas and replace it,
+    # return the chunks every standalone frame needs (IHDR, palette, ...)
+    # and each frame's duration with its (offset, length, is_fdat) data runs.
+    # None for anything that has to be composited.
+    head, frames = b"", []
+    width = height = 0
+    for ctype, offset, length in _chunks(f):
+        if ctype in (b"IDAT", b"fdAT"):
+            if frames:
+                frames[-1][1].append((offset, length, ctype == b"fdAT"))
+        elif ctype == b"fcTL":
+            f.seek(offset)
+            _, w, h, x, y, num, den, _, blend = _FCTL.unpack(f.read(_FCTL.size))
+            if (w, h, x, y) != (width, height, 0, 0) or (frames and blend != 0):
+                return None
+            frames.append((round(num * 1000 / (den or 100)), []))
+        elif ctype not in (b"acTL", b"IEND") and not frames:
+            f.seek(offset)
+            data = f.read(length)
+            if ctype == b"IHDR":
+                width, height = struct.unpack(">II", data[:8])
+            head += _chunk(ctype, data)
+    return (head, frames) if frames else None
+
+
+def _iter_frames(source: FrameSource) -> Iterator[Tuple[Source, int]]:
+    """Yield each frame as a worker-ready source with its duration in ms."""
+    if _is_dir(source):
+        for path in iter_images(Path(source)):
+            yield str(path), DEFAULT_DURATION
+        return
+    with _open_bytes(source) as f:
+        layout = _independent_apng(f)
+        if layout is not None:
+            head, frames = layout
+            for duration, runs in frames:
+                parts = [PNG_SIGNATURE, head]
+                for offset, length, is_fdat in runs:
+                    f.seek(offset)
+                    data = f.read(length)
+                    parts.append(_chunk(b"IDAT", data[4:] if is_fdat else data))
+                parts.append(_chunk(b"IEND", b""))
+                yield b"".join(parts), duration
+            return
+        f.seek(0)
+        with Image.open(f) as img:
+            for index in range(getattr(img, "n_frames", 1)):
+                img.seek(index)
+                duration = int(img.info.get("duration") or DEFAULT_DURATION)
+                yield np.array(img.convert("RGB")), duration
+
+
+def _split_png(png: bytes) -> Tuple[bytes, bytes, List[bytes]]:
+    # IHDR data, the other chunks ahead of the image data, and the IDAT payloads.
+    f = io.BytesIO(png)
+    ihdr, head, idats = b"", b"", []
+    for ctype, offset, length in _chunks(f):
+        data = png[offset : offset + length]
+        if ctype == b"IHDR":
+            ihdr = data
+        elif ctype == b"IDAT":
+            idats.append(data)
+        elif ctype != b"IEND" and not idats:
+            head += _chunk(ctype, data)
+    return ihdr, head, idats
+
+
+def write_apng(
+    dest: BinaryIO, pngs: Iterable[bytes], durations: List[int], frames: int, loop: int = 0
+) -> None:
+    """Stream same-sized PNG frames into an APNG, one frame in memory at a time.
+
+    ``durations[i]`` must be set by the time frame ``i`` is written.
+    """
+    seq = 0
+    first_ihdr = None
+    for index, png in enumerate(pngs):
+        ihdr, head, idats = _split_png(png)
+        if first_ihdr is None:
+            first_ihdr = ihdr
+            dest.write(PNG_SIGNATURE + _chunk(b"IHDR", ihdr) + head)
+            dest.write(_chunk(b"acTL", struct.pack(">II", frames, loop)))
+        elif ihdr != first_ihdr:
+            raise ValueError(f"Frame {index} does not match the first frame's size and mode.")
+        width, height = struct.unpack(">II", ihdr[:8])
+        delay = min(int(durations[index]), 0xFFFF)
+        dest.write(_chunk(b"fcTL", _FCTL.pack(seq, width, height, 0, 0, delay, 1000, 0, 0)))
+        seq += 1
+        for data in idats:
+            if index == 0:
+                dest.write(_chunk(b"IDAT", data))
+            else:
+                dest.write(_chunk(b"fdAT", struct.pack(">I", seq) + data))
+                seq += 1
+    dest.write(_chunk(b"IEND", b""))
+
+
+def embed_frames(
+    source: FrameSource,
+    message: Union[str, bytes],
+    output: Union[str, os.PathLike, BinaryIO],
+    bits: int = 1,
+    key: Optional[Key] = None,
+    compress: bool = True,
+    workers: int = 1,
+) -> List[EmbeddedShard]:
+    """Spread ``message`` over every frame of ``source``.
+
+    An animation is written to ``output`` (a path or binary file) as an
+    APNG; a directory of frames is written to the ``output`` directory as
+    ``<frame>.png`` files.
+    """
+    capacities = frame_capacities(source, bits)
+    if _is_dir(source):
+        os.makedirs(output, exist_ok=True)
+        paths = iter_images(Path(source))
+        outputs = [Path(output) / f"{path.stem}.png" for path in paths]
+        sizes, jobs = _shard_jobs(
+            (str(p) for p in paths), capacities, message, bits, key, compress, outputs
+        )
+        results = list(_imap(_embed_shard, jobs, workers, len(sizes), "frames"))
+        return [EmbeddedShard(i, size, png) for i, (size, png) in enumerate(zip(sizes, results))]
+
+    durations: List[int] = []
+
+    def frames():
+        for frame, duration in _iter_frames(source):
+            durations.append(duration)
+            yield frame
+
+    sizes, jobs = _shard_jobs(frames(), capacities, message, bits, key, compress)
+    pngs = _imap(_embed_shard, jobs, workers, len(sizes), "frames")
+    loop = probe_frames(source).loop
+    if isinstance(output, (str, os.PathLike)):
+        with open(output, "wb") as dest:
+            write_apng(dest, pngs, durations, len(sizes), loop)
+    else:
+        write_apng(output, pngs, durations, len(sizes), loop)
+    return [EmbeddedShard(i, size, None) for i, size in enumerate(sizes)]
+
+
+def extract_frames(source: FrameSource, key: Optional[Key] = None, workers: int = 1) -> ShardSet:
+    """Reassemble a payload spread over the frames of ``source``."""
+    frames = (frame for frame, _ in _iter_frames(source))
+    return extract_shards(frames, key, workers, probe_frames(source).frames)
+
+
+def _frame_inputs(frame: Source) -> Tuple[Optional[Tuple[np.ndarray, np.ndarray]], Optional[str]]:
+    try:
+        with _open(frame) as img:
+            return _analysis_inputs(img), None
+    except Exception as exc:
+        return None, f"{type(exc).__name__}: {exc}"
+
+
+def analyze_frames(
+    source: FrameSource, model: "RandomForestClassifier", workers: int = 1
+) -> BatchAnalysis:
+    """Score every frame of ``source``.
+
+    Features are computed frame by frame in ``workers`` processes and all
+    frames are scored with one ``predict_proba`` call.
+    """
+    t0 = time.perf_counter()
+    jobs = ((frame,) for frame, _ in _iter_frames(source))
+    loaded = list(_imap(_frame_inputs, jobs, workers, probe_frames(source).frames, "frames"))
+    errors = [err for _, err in loaded]
+    features = np.full((len(loaded), len(FEATURE_NAMES)), np.nan)
+    probabilities = np.full(len(loaded), np.nan)
+    inputs = [pair for pair, _ in loaded if pair is not None]
+    if inputs:
+        ok = np.array([err is None for err in errors], dtype=bool)
+        batch = np.stack([thumb for thumb, _ in inputs])
+        with span("features"):
+            features[ok] = extract_features_batch(batch, np.stack([scores for _, scores in inputs]))
+        with span("inference"):
+            probabilities[ok] = model.predict_proba(features[ok])[:, 1]
+    return BatchAnalysis(probabilities, features, errors, time.perf_counter() - t0)
@@ -0,0 +1,163 @@
+"""Lazy image ingestion: header metadata first, pixels decoded at most once.
+
+An :class:`ImageHandle` wraps the encoded bytes of one image. Size, mode,
+frame count, capacity and the embed working set come from the image header
+without decoding pixels. The RGB pixels are decoded the first time an action
+needs them and kept, read-only, so later embeds, extractions and analyses of
+the same image reuse them. Handles are shared by jobs on several threads, so
+the handle tracks who holds its buffer: ``rgb`` reads it under a reader
+count, and ``take`` hands it over to an embed only while no reader is inside
+and it has never been lent out through ``pixels``. Otherwise the embed gets
+a copy, so an encode keeps a single copy of the pixels whenever it can.
+"""
+
+import io
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, NamedTuple, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from .cache import content_key
+from .frames import frame_capacities
+from .instrument import span
+from .stego import MemoryBudgetError, embed_working_set, load_carrier, memory_budget, payload_capacity
+
+
+class ImageInfo(NamedTuple):
+    size: Tuple[int, int]
+    mode: str
+    format: Optional[str]
+    frames: int
+    working_set: int
+
+
+class ImageHandle:
+    """Encoded image bytes with lazily read metadata and once-decoded pixels."""
+
+    def __init__(self, data: bytes, key: Optional[str] = None) -> None:
+        self.data = data
+        self.key = key or content_key(data)
+        self._info: Optional[ImageInfo] = None
+        self._capacities: Dict[int, int] = {}
+        self._pixels: Optional[np.ndarray] = None
+        self._readers = 0
+        self._lent = False
+        self._lock = threading.Lock()
+
+    @property
+    def info(self) -> ImageInfo:
+        """Header metadata; the first access parses the header only."""
+        if self._info is None:
+            with span("read"), Image.open(io.BytesIO(self.data)) as img:
+                self._info = ImageInfo(
+                    img.size,
+                    img.mode,
+                    img.format,
+                    getattr(img, "n_frames", 1),
+                    embed_working_set(img),
+                )
+        return self._info
+
+    @property
+    def animated(self) -> bool:
+        return self.info.frames > 1
+
+    @property
+    def decoded(self) -> bool:
+        return self._pixels is not None
+
+    def capacity(self, bits: int = 1) -> int:
+        """Payload bytes at ``bits`` per channel, summed over frames for an animation."""
+        if bits not in self._capacities:
+            if self.animated:
+                self._capacities[bits] = sum(frame_capacities(self.data, bits))
+            else:
+                self._capacities[bits] = payload_capacity(self.info.size, bits)
+        return self._capacities[bits]
+
+    def _decode(self) -> np.ndarray:
+        # Called with the lock held, so concurrent first uses decode once.
+        if self._pixels is None:
+            pixels = load_carrier(io.BytesIO(self.data))
+            pixels.flags.writeable = False
+            self._pixels = pixels
+        return self._pixels
+
+    @contextmanager
+    def _reading(self) -> Iterator[np.ndarray]:
+        with self._lock:
+            pixels = self._decode()
+            self._readers += 1
+        try:
+            yield pixels
+        finally:
+            with self._lock:
+                self._readers -= 1
+
+    def pixels(self) -> np.ndarray:
+        """Read-only ``(h, w, 3)`` RGB pixels of the first frame, decoded on first use.
+
+        The buffer stays shared: once it has been handed out here, embeds
+        copy it instead of taking it over. Raises ValueError, like
+        :func:`.load_carrier`, if the image is over the memory budget.
+        """
+        with self._lock:
+            self._lent = True
+            return self._decode()
+
+    def take(self) -> Optional[np.ndarray]:
+        """The decoded pixels, writable and owned by the caller, or None if they are in use.
+
+        The handle forgets them, so the next action decodes again.
+        """
+        with self._lock:
+            if self._pixels is None or self._readers or self._lent:
+                return None
+            pixels, self._pixels = self._pixels, None
+        pixels.flags.writeable = True
+        return pixels
+
+    def carrier(self) -> np.ndarray:
+        """Writable pixels to embed into.
+
+        Decoded pixels nobody is using are taken over without a copy and
+        undecoded ones are decoded for the caller alone. Pixels in use are
+        copied, which raises ValueError if the copy takes the encode over the
+        memory budget.
+        """
+        pixels = self.take()
+        if pixels is not None:
+            return pixels
+        if not self.decoded:
+            return load_carrier(io.BytesIO(self.data))
+        w, h = self.info.size
+        needed, budget = self.info.working_set + w * h * 3, memory_budget()
+        if needed > budget:
+            raise MemoryBudgetError(
+                f"Image {w}x{h} needs about {needed / 2**20:.1f} MB to encode while it is "
+                f"in use elsewhere, over the {budget / 2**20:.1f} MB budget."
+            )
+        with self._reading() as shared, span("copy"):
+            return shared.copy()
+
+    def rgb(self) -> Image.Image:
+        """The decoded pixels as an RGB image; Pillow copies them into its own layout."""
+        with self._reading() as pixels:
+            return Image.fromarray(pixels)
+
+    def open(self) -> Image.Image:
+        """The decoded image if the pixels are already in memory, else a lazily opened one.
+
+        Extraction from a lazy PNG only decompresses the rows it needs.
+        """
+        if self.decoded:
+            return self.rgb()
+        with span("read"):
+            return Image.open(io.BytesIO(self.data))
+
+    def release(self) -> None:
+        with self._lock:
+            self._pixels = None
+            self._lent = False
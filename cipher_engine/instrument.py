@@ -0,0 +1,210 @@
+"""Per-stage timing and memory spans.
+
+Core functions wrap their stages (decode, convert, pack, embed, extract,
+features, inference, PNG encode, ...) in :func:`span`. Spans cost one context
+variable lookup unless a :func:`recording` is active in the calling context,
+in which case each stage's ``perf_counter`` time and call count are added to
+the recorder. Time is self time: a span nested in another is subtracted from
+its parent, so stage totals add up to at most the recording's wall time.
+
+With ``trace_memory`` (or ``CIPHER_ENGINE_TRACE_MEMORY=1``) the recording runs
+under :mod:`tracemalloc` and each stage also reports the peak memory traced
+above its starting point. NumPy buffers are traced, Pillow's internal image
+memory is not, and tracing slows Python-level allocation noticeably. Peaks of
+spans running concurrently on several threads overlap.
+
+Long loops also call :func:`progress` with how far they have got (rows
+converted, bytes embedded, frames scored, ...); the latest report is kept on
+the active recorder for a caller on another thread to poll.
+
+``write_spans`` appends one JSON line per stage to a local file, by default
+the path in ``CIPHER_ENGINE_SPANS_PATH``.
+"""
+
+import json
+import os
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Union
+
+SPANS_PATH_ENV = "CIPHER_ENGINE_SPANS_PATH"
+TRACE_MEMORY_ENV = "CIPHER_ENGINE_TRACE_MEMORY"
+
+
+class Stage(NamedTuple):
+    name: str
+    seconds: float
+    calls: int
+    peak_bytes: Optional[int]
+
+
+class Progress(NamedTuple):
+    done: int
+    total: Optional[int]
+    unit: str
+
+    @property
+    def fraction(self) -> Optional[float]:
+        return min(self.done / self.total, 1.0) if self.total else None
+
+
+class _Open:
+    __slots__ = ("start", "children", "base", "peak")
+
+    def __init__(self, start: float, base: int) -> None:
+        self.start, self.children, self.base, self.peak = start, 0.0, base, base
+
+
+class Recorder:
+    """Stage totals of one recording, in first-seen order."""
+
+    def __init__(self, label: str, trace_memory: bool = False) -> None:
+        self.label = label
+        self.trace_memory = trace_memory
+        self.run_id = uuid.uuid4().hex
+        self.started = time.time()
+        self.seconds = 0.0
+        self.progress: Optional[Progress] = None
+        self._totals: Dict[str, list] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _stack(self) -> List[_Open]:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _fold_peak(self, stack: List[_Open]) -> int:
+        # Carry the traced peak so far into every open span before it is reset.
+        current, peak = tracemalloc.get_traced_memory()
+        for entry in stack:
+            entry.peak = max(entry.peak, peak)
+        tracemalloc.reset_peak()
+        return current
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        stack = self._stack()
+        base = self._fold_peak(stack) if self.trace_memory else 0
+        entry = _Open(time.perf_counter(), base)
+        stack.append(entry)
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - entry.start
+            stack.pop()
+            if self.trace_memory:
+                self._fold_peak(stack + [entry])
+            if stack:
+                stack[-1].children += elapsed
+            peak = entry.peak - entry.base if self.trace_memory else None
+            with self._lock:
+                total = self._totals.setdefault(name, [0.0, 0, peak])
+                total[0] += elapsed - entry.children
+                total[1] += 1
+                if peak is not None:
+                    total[2] = max(total[2], peak)
+
+    def stages(self) -> List[Stage]:
+        with self._lock:
+            return [Stage(name, *total) for name, total in self._totals.items()]
+
+    @property
+    def untracked(self) -> float:
+        """Wall time of the recording outside every span."""
+        return max(self.seconds - sum(stage.seconds for stage in self.stages()), 0.0)
+
+
+_active: ContextVar[Optional[Recorder]] = ContextVar("cipher_engine_recorder", default=None)
+
+
+def trace_memory_enabled() -> bool:
+    return os.environ.get(TRACE_MEMORY_ENV, "").lower() in ("1", "true", "yes", "on")
+
+
+@contextmanager
+def recording(label: str, trace_memory: Optional[bool] = None) -> Iterator[Recorder]:
+    """Record the spans of the enclosed calls; memory tracing defaults to the env setting."""
+    if trace_memory is None:
+        trace_memory = trace_memory_enabled()
+    # reset_peak is Python 3.9+; older interpreters record time only.
+    trace_memory = trace_memory and hasattr(tracemalloc, "reset_peak")
+    started_tracing = trace_memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    recorder = Recorder(label, trace_memory)
+    token = _active.set(recorder)
+    t0 = time.perf_counter()
+    try:
+        yield recorder
+    finally:
+        recorder.seconds = time.perf_counter() - t0
+        _active.reset(token)
+        if started_tracing:
+            tracemalloc.stop()
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Time the enclosed block as stage ``name`` of the active recording, if any."""
+    recorder = _active.get()
+    if recorder is None:
+        yield
+        return
+    with recorder.span(name):
+        yield
+
+
+def progress(done: int, total: Optional[int] = None, unit: str = "") -> None:
+    """Report the current loop's position to the active recording, if any."""
+    recorder = _active.get()
+    if recorder is not None:
+        recorder.progress = Progress(done, total, unit)
+
+
+def propagate(fn: Callable) -> Callable:
+    """Bind ``fn`` to the caller's recording so spans on pool threads are recorded too."""
+    recorder = _active.get()
+    if recorder is None:
+        return fn
+
+    def run(*args, **kwargs):
+        token = _active.set(recorder)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _active.reset(token)
+
+    return run
+
+
+def span_records(recorder: Recorder) -> List[Dict]:
+    return [
+        {
+            "run": recorder.run_id,
+            "label": recorder.label,
+            "started": round(recorder.started, 6),
+            "wall_seconds": round(recorder.seconds, 6),
+            "stage": stage.name,
+            "seconds": round(stage.seconds, 6),
+            "calls": stage.calls,
+            "peak_bytes": stage.peak_bytes,
+        }
+        for stage in recorder.stages()
+    ]
+
+
+def write_spans(recorder: Recorder, path: Union[str, os.PathLike, None] = None) -> Optional[str]:
+    """Append the recording's stages as JSON lines; returns the path, or None when unset."""
+    path = path or os.environ.get(SPANS_PATH_ENV)
+    if not path:
+        return None
+    lines = "".join(json.dumps(record) + "\n" for record in span_records(recorder))
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(lines)
+    return os.fspath(path)
@@ -0,0 +1,148 @@
+"""Background jobs: a bounded thread pool with pollable progress and results.
+
+A :class:`JobQueue` runs submitted calls on at most ``workers`` threads, by
+default ``CIPHER_ENGINE_JOB_WORKERS`` or the number of cores; later jobs wait
+in submission order, so any number of callers share a fixed amount of CPU.
+The heavy stages (decoding, embedding, extraction, the detectors) run in
+NumPy, zlib and Pillow with the GIL released, so threads overlap on several
+cores without copying images between processes.
+
+Every job runs under its own :func:`.recording`, which is appended to the
+spans file when one is set. Callers on other threads poll :attr:`Job.progress`
+for the latest report of the job's loops. Finished jobs are kept for later
+lookups while there are at most ``keep`` of them and their results' estimated
+sizes add up to at most ``max_bytes``; the oldest are evicted first, but the
+most recently finished job is always kept.
+"""
+
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from .cache import cache_budget, estimate_size
+from .instrument import Progress, Recorder, recording, write_spans
+
+JOB_WORKERS_ENV = "CIPHER_ENGINE_JOB_WORKERS"
+DEFAULT_KEEP = 32
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class JobStats(NamedTuple):
+    workers: int
+    queued: int
+    running: int
+    finished: int
+
+
+def job_workers() -> int:
+    value = os.environ.get(JOB_WORKERS_ENV)
+    return max(1, int(value)) if value else os.cpu_count() or 1
+
+
+class Job:
+    """One submitted call: its state, latest progress and, once finished, result or error."""
+
+    def __init__(self, label: str, meta: Dict[str, Any]) -> None:
+        self.id = uuid.uuid4().hex
+        self.label = label
+        self.meta = meta
+        self.submitted = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.recorder: Optional[Recorder] = None
+        self.spans_path: Optional[str] = None
+        self.result: Any = None
+        self.error: Optional[Exception] = None
+
+    @property
+    def state(self) -> str:
+        if self.finished is not None:
+            return FAILED if self.error is not None else DONE
+        return RUNNING if self.started is not None else QUEUED
+
+    @property
+    def done(self) -> bool:
+        return self.finished is not None
+
+    @property
+    def progress(self) -> Optional[Progress]:
+        return None if self.recorder is None else self.recorder.progress
+
+
+class JobQueue:
+    """Thread pool running at most ``workers`` jobs at once, with lookups by job id."""
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        keep: int = DEFAULT_KEEP,
+        max_bytes: Optional[int] = None,
+    ) -> None:
+        self.workers = job_workers() if workers is None else max(1, workers)
+        self.keep = keep
+        self.max_bytes = cache_budget() if max_bytes is None else max_bytes
+        self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix="cipher-engine-job")
+        self._jobs: Dict[str, Job] = {}
+        self._finished: "OrderedDict[str, int]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def submit(self, label: str, fn: Callable, *args, meta: Optional[Dict] = None, **kwargs) -> Job:
+        """Queue ``fn(*args, **kwargs)``; ``meta`` is kept on the job for whoever renders it."""
+        job = Job(label, dict(meta or {}))
+        with self._lock:
+            self._jobs[job.id] = job
+        self._pool.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def _run(self, job: Job, fn: Callable, args: tuple, kwargs: dict) -> None:
+        job.started = time.time()
+        try:
+            with recording(job.label) as job.recorder:
+                job.result = fn(*args, **kwargs)
+        except Exception as exc:
+            job.error = exc
+        finally:
+            try:
+                if job.recorder is not None:
+                    job.spans_path = write_spans(job.recorder)
+            except Exception:
+                # An unwritable spans file costs the log line, not the job.
+                job.spans_path = None
+            job.finished = time.time()
+            self._retire(job)
+
+    def _retire(self, job: Job) -> None:
+        size = estimate_size(job.result)
+        with self._lock:
+            self._finished[job.id] = size
+            self._size += size
+            while len(self._finished) > 1 and (
+                len(self._finished) > self.keep or self._size > self.max_bytes
+            ):
+                evicted, evicted_size = self._finished.popitem(last=False)
+                self._size -= evicted_size
+                del self._jobs[evicted]
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """The job, or None once it has been evicted."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self) -> List[Job]:
+        with self._lock:
+            return list(self._jobs.values())
+
+    def stats(self) -> JobStats:
+        states = [job.state for job in self.jobs()]
+        return JobStats(
+            self.workers, states.count(QUEUED), states.count(RUNNING), len(self._finished)
+        )
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._pool.shutdown(wait=wait)
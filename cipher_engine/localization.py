@@ -0,0 +1,98 @@
+"""Per-tile stego localization.
+
+The image is split into a ``rows x cols`` grid. Every cell gets the same
+feature vector as a whole image -- thumbnail statistics plus full-resolution
+detector scores -- and all cells are scored with one ``predict_proba`` call.
+"""
+
+import time
+from typing import TYPE_CHECKING, List, NamedTuple, Tuple
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from .analysis import ANALYSIS_RESOLUTION, extract_features_batch
+from .detectors import window_detector_scores
+from .instrument import span
+
+if TYPE_CHECKING:
+    from sklearn.ensemble import RandomForestClassifier
+
+DEFAULT_GRID = (8, 8)
+HEAT_COLOR = (255, 69, 58)
+REGION_COLOR = (197, 160, 89)
+
+
+class Region(NamedTuple):
+    row: int
+    col: int
+    box: Tuple[int, int, int, int]
+    probability: float
+
+
+class Localization(NamedTuple):
+    probabilities: np.ndarray
+    regions: List[Region]
+    cell_size: Tuple[int, int]
+    seconds: float
+
+
+def cell_thumbnails(image: Image.Image, grid: Tuple[int, int]) -> np.ndarray:
+    # One resize of the covered area to (cols*128, rows*128) followed by a
+    # reshape yields every cell's thumbnail without a per-cell resize call.
+    rows, cols = grid
+    w, h = image.size
+    tw, th = ANALYSIS_RESOLUTION
+    covered = image.crop((0, 0, cols * (w // cols), rows * (h // rows)))
+    small = np.asarray(covered.resize((cols * tw, rows * th)))
+    return small.reshape(rows, th, cols, tw, 3).transpose(0, 2, 1, 3, 4).reshape(-1, th, tw, 3)
+
+
+def localize(
+    image: Image.Image,
+    model: "RandomForestClassifier",
+    grid: Tuple[int, int] = DEFAULT_GRID,
+    top_k: int = 5,
+) -> Localization:
+    t0 = time.perf_counter()
+    rows, cols = grid
+    with span("convert"):
+        rgb = image.convert("RGB")
+    w, h = rgb.size
+    cw, ch = w // cols, h // rows
+
+    with span("features"):
+        scores = window_detector_scores(np.asarray(rgb), grid).reshape(rows * cols, -1)
+        features = extract_features_batch(cell_thumbnails(rgb, grid), scores)
+    with span("inference"):
+        probabilities = model.predict_proba(features)[:, 1].reshape(rows, cols)
+
+    order = np.argsort(probabilities, axis=None)[::-1][:top_k]
+    regions = []
+    for idx in order:
+        r, c = divmod(int(idx), cols)
+        box = (c * cw, r * ch, (c + 1) * cw, (r + 1) * ch)
+        regions.append(Region(r, c, box, float(probabilities[r, c])))
+    return Localization(probabilities, regions, (cw, ch), time.perf_counter() - t0)
+
+
+def heatmap_overlay(
+    image: Image.Image, result: Localization, max_side: int = 800, alpha: float = 0.55
+) -> Image.Image:
+    preview = image.convert("RGB")
+    preview.thumbnail((max_side, max_side))
+    scale = preview.width / image.width
+    rows, cols = result.probabilities.shape
+    cw, ch = result.cell_size
+    covered = (round(cols * cw * scale), round(rows * ch * scale))
+
+    heat = Image.fromarray(np.uint8(np.clip(result.probabilities, 0, 1) * 255 * alpha), "L")
+    mask = Image.new("L", preview.size, 0)
+    mask.paste(heat.resize(covered, Image.NEAREST), (0, 0))
+    overlay = Image.composite(Image.new("RGB", preview.size, HEAT_COLOR), preview, mask)
+
+    draw = ImageDraw.Draw(overlay)
+    for region in result.regions:
+        x0, y0, x1, y1 = (round(v * scale) for v in region.box)
+        draw.rectangle((x0, y0, x1 - 1, y1 - 1), outline=REGION_COLOR, width=2)
+    return overlay
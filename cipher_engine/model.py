@@ -0,0 +1,130 @@
+"""On-disk persistence of the steganalysis classifier.
+
+The fitted forest is stored as an uncompressed joblib artifact together with
+``MODEL_VERSION`` and a hash of the feature schema. The schema is declared in
+``FEATURE_SCHEMA``: the feature names, the thumbnail resolution, the
+detectors and their parameters, and ``FEATURE_SCHEMA_VERSION``. Bump the
+version whenever the feature or detector code changes what a feature
+measures. Processes memory-map the artifact on first use and only retrain
+when it is missing or stale.
+
+scikit-learn and joblib are imported on first use too, so importing the
+package stays cheap for callers that never analyze; ``warm_up`` loads the
+model on a background thread ahead of the first analysis.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional
+
+from . import detectors
+from .analysis import ANALYSIS_RESOLUTION, FEATURE_NAMES
+from .instrument import span
+from .training import train_model
+
+if TYPE_CHECKING:
+    from sklearn.ensemble import RandomForestClassifier
+
+MODEL_VERSION = 1
+MODEL_DIR_ENV = "CIPHER_ENGINE_MODEL_DIR"
+WARM_UP_ENV = "CIPHER_ENGINE_WARM_MODEL"
+FEATURE_SCHEMA_VERSION = 1
+FEATURE_SCHEMA = {
+    "version": FEATURE_SCHEMA_VERSION,
+    "features": FEATURE_NAMES,
+    "resolution": ANALYSIS_RESOLUTION,
+    "detectors": detectors.DETECTOR_NAMES,
+    "tile_size": detectors.TILE_SIZE,
+    "rs_group": detectors.RS_GROUP,
+}
+
+_load_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def feature_schema_hash() -> str:
+    encoded = json.dumps(FEATURE_SCHEMA, sort_keys=True).encode("ascii")
+    return hashlib.sha256(encoded).hexdigest()[:16]
+
+
+def default_model_path() -> Path:
+    base = os.environ.get(MODEL_DIR_ENV) or Path.home() / ".cache" / "cipher_engine"
+    return Path(base) / f"steganalysis-v{MODEL_VERSION}.joblib"
+
+
+def train_steganalysis_model(**kwargs) -> "RandomForestClassifier":
+    model, _ = train_model(**kwargs)
+    return model
+
+
+def save_model(model: "RandomForestClassifier", path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    artifact = {"version": MODEL_VERSION, "schema": feature_schema_hash(), "model": model}
+    import joblib
+
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    os.close(fd)
+    try:
+        joblib.dump(artifact, tmp)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def read_model(path: Path) -> Optional["RandomForestClassifier"]:
+    import joblib
+
+    try:
+        artifact = joblib.load(path, mmap_mode="r")
+    except Exception:
+        return None
+    if (
+        not isinstance(artifact, dict)
+        or artifact.get("version") != MODEL_VERSION
+        or artifact.get("schema") != feature_schema_hash()
+    ):
+        return None
+    return artifact["model"]
+
+
+@lru_cache(maxsize=None)
+def load_steganalysis_model(path: Optional[Path] = None) -> "RandomForestClassifier":
+    path = Path(path) if path is not None else default_model_path()
+    # A caller arriving while a warm-up trains waits, then reads the saved artifact.
+    with _load_lock, span("load_model"):
+        model = read_model(path)
+        if model is None:
+            model = train_steganalysis_model()
+            try:
+                save_model(model, path)
+            except OSError:
+                pass
+    return model
+
+
+def model_loaded() -> bool:
+    """True once this process has a model loaded."""
+    return load_steganalysis_model.cache_info().currsize > 0
+
+
+def warm_up_enabled() -> bool:
+    return os.environ.get(WARM_UP_ENV, "").lower() in ("1", "true", "yes", "on")
+
+
+def warm_up(path: Optional[Path] = None) -> threading.Thread:
+    """Start loading the model on a daemon thread; a later load returns it from cache."""
+    thread = threading.Thread(
+        target=load_steganalysis_model,
+        args=() if path is None else (path,),
+        name="cipher-engine-warm-up",
+        daemon=True,
+    )
+    thread.start()
+    return thread
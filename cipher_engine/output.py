@@ -0,0 +1,68 @@
+"""Output encodings for stego images: the file size / encode time trade-off.
+
+Every format here is lossless, so the embedded low bits survive the round
+trip. PNG levels trade zlib effort for size: ``none`` stores the pixels
+uncompressed and is the fastest to write, ``smallest`` can take ten times
+longer than ``balanced`` (Pillow's default) for a few percent. WebP lossless
+is usually the smallest file; TIFF with Deflate is quick to write but large.
+WebP and TIFF are only offered when Pillow was built with their codecs.
+"""
+
+import io
+import os
+from typing import BinaryIO, Dict, List, NamedTuple, Union
+
+from PIL import Image, features
+
+from .instrument import span
+
+
+class OutputFormat(NamedTuple):
+    label: str
+    format: str
+    extension: str
+    mime: str
+    params: Dict
+
+
+OUTPUT_FORMATS = {
+    "none": OutputFormat("PNG · uncompressed", "PNG", "png", "image/png", {"compress_level": 0}),
+    "fast": OutputFormat("PNG · fast", "PNG", "png", "image/png", {"compress_level": 1}),
+    "balanced": OutputFormat("PNG · balanced", "PNG", "png", "image/png", {"compress_level": 6}),
+    "smallest": OutputFormat("PNG · smallest", "PNG", "png", "image/png", {"compress_level": 9}),
+    "webp": OutputFormat(
+        "WebP · lossless", "WEBP", "webp", "image/webp", {"lossless": True, "quality": 50, "method": 4}
+    ),
+    "tiff": OutputFormat(
+        "TIFF · Deflate", "TIFF", "tiff", "image/tiff", {"compression": "tiff_adobe_deflate"}
+    ),
+}
+DEFAULT_OUTPUT = "balanced"
+
+_CODECS = {"webp": "webp", "tiff": "libtiff"}
+
+
+def available_outputs() -> List[str]:
+    """Names of the output formats this Pillow build can write, in preference order."""
+    return [name for name in OUTPUT_FORMATS if name not in _CODECS or features.check(_CODECS[name])]
+
+
+def output_format(name: str) -> OutputFormat:
+    if name not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format {name!r}; choose from {', '.join(OUTPUT_FORMATS)}.")
+    return OUTPUT_FORMATS[name]
+
+
+def save_output(
+    image: Image.Image, dest: Union[str, os.PathLike, BinaryIO], output: str = DEFAULT_OUTPUT
+) -> None:
+    """Write ``image`` to a path or binary file in the ``output`` format."""
+    fmt = output_format(output)
+    with span(f"encode_{fmt.extension}"):
+        image.save(dest, format=fmt.format, **fmt.params)
+
+
+def encode_output(image: Image.Image, output: str = DEFAULT_OUTPUT) -> bytes:
+    buf = io.BytesIO()
+    save_output(image, buf, output)
+    return buf.getvalue()
@@ -0,0 +1,432 @@
+"""Local HTTP API: ``python -m cipher_engine serve``.
+
+``POST /encode``, ``/decode`` and ``/analyze`` take a JSON object with the
+image base64-encoded in ``image`` and answer with a JSON object; ``GET
+/health`` reports the queue. Requests are read by an asyncio front end and
+run in a bounded pool of worker processes, each of which loads the model
+once when it starts, so a large image occupies one worker and the event loop
+stays free for everyone else. Request bodies, including JSON parsing and
+base64 decoding, are handled in the workers.
+
+Admission is bounded: a request that arrives while ``max_pending`` requests
+are already running or queued is refused with 429, and one whose
+Content-Length is over ``max_body`` with 413; either way its body is
+discarded as it arrives rather than buffered. An image that would decode
+over the memory budget is also refused with 413, before its pixels are
+decoded. Every response closes its
+connection. The server binds to localhost by default and has no
+authentication; do not expose it.
+"""
+
+import asyncio
+import base64
+import io
+import json
+import multiprocessing
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import numpy as np
+from PIL import Image
+
+from .analysis import FEATURE_NAMES, analyze_batch
+from .compression import CODEC_NAMES
+from .detectors import DETECTOR_NAMES
+from .frames import analyze_frames, embed_frames, extract_frames
+from .model import load_steganalysis_model
+from .output import DEFAULT_OUTPUT, encode_output, output_format
+from .stego import (
+    FORMAT_BINARY,
+    FORMAT_SHARD,
+    FORMAT_TEXT,
+    MemoryBudgetError,
+    check_memory_budget,
+    embed_message_inplace,
+    extract_payload,
+    load_carrier,
+)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_MAX_BODY = 64 << 20
+MAX_HEADER_BYTES = 16 << 10
+READ_TIMEOUT = 30.0
+LINGER_SECONDS = 10.0
+
+ROUTES = ("encode", "decode", "analyze")
+FORMAT_NAMES = {FORMAT_TEXT: "text", FORMAT_BINARY: "binary", FORMAT_SHARD: "shard"}
+
+_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    408: "Request Timeout",
+    411: "Length Required",
+    413: "Content Too Large",
+    429: "Too Many Requests",
+    431: "Request Header Fields Too Large",
+    500: "Internal Server Error",
+}
+
+_worker_model = None
+
+
+def _init_worker(model_path) -> None:
+    global _worker_model
+    _worker_model = load_steganalysis_model(model_path)
+
+
+def _field(request: Dict, name: str):
+    if name not in request:
+        raise ValueError(f"Missing field {name!r}.")
+    return request[name]
+
+
+def _b64(request: Dict, name: str) -> bytes:
+    value = _field(request, name)
+    if not isinstance(value, str):
+        raise ValueError(f"Field {name!r} must be a base64 string.")
+    try:
+        return base64.b64decode(value, validate=True)
+    except ValueError:
+        raise ValueError(f"Field {name!r} is not valid base64.") from None
+
+
+def _frames(data: bytes) -> int:
+    with Image.open(io.BytesIO(data)) as img:
+        return getattr(img, "n_frames", 1)
+
+
+def _encode(request: Dict) -> Dict:
+    image = _b64(request, "image")
+    if ("message" in request) == ("data" in request):
+        raise ValueError("Give exactly one of 'message' (text) or 'data' (base64 bytes).")
+    payload = _field(request, "message") if "message" in request else _b64(request, "data")
+    if not isinstance(payload, (str, bytes)):
+        raise ValueError("Field 'message' must be a string.")
+    bits = int(request.get("bits", 1))
+    key = request.get("key")
+    compress = bool(request.get("compress", True))
+    output = request.get("format", DEFAULT_OUTPUT)
+    fmt = output_format(output)
+    t0 = time.perf_counter()
+    if _frames(image) > 1:
+        # Animations are always written as APNG, whatever ``format`` asks for.
+        buf = io.BytesIO()
+        shards = embed_frames(image, payload, buf, bits, key, compress)
+        data = buf.getvalue()
+        return {
+            "image": base64.b64encode(data).decode("ascii"),
+            "format": "apng",
+            "mime": "image/png",
+            "bytes": len(data),
+            "bits": bits,
+            "frames": len(shards),
+            "stored_bytes": sum(shard.length for shard in shards),
+            "encode_ms": round((time.perf_counter() - t0) * 1e3, 1),
+        }
+    carrier = load_carrier(io.BytesIO(image))
+    header = embed_message_inplace(carrier, payload, bits, key, compress)
+    encoded = Image.fromarray(carrier)
+    del carrier
+    data = encode_output(encoded, output)
+    return {
+        "image": base64.b64encode(data).decode("ascii"),
+        "format": output,
+        "mime": fmt.mime,
+        "bytes": len(data),
+        "bits": bits,
+        "codec": CODEC_NAMES[header.codec],
+        "stored_bytes": header.length,
+        "encode_ms": round((time.perf_counter() - t0) * 1e3, 1),
+    }
+
+
+def _decode(request: Dict) -> Dict:
+    image = _b64(request, "image")
+    key = request.get("key")
+    record = {}
+    if _frames(image) > 1:
+        result = extract_frames(image, key)
+        payload = result.payload
+        record.update(frames=result.count, missing=result.missing)
+    else:
+        with Image.open(io.BytesIO(image)) as img:
+            payload = extract_payload(img, key)
+    record["found"] = payload is not None
+    if payload is None:
+        return record
+    record["format"] = FORMAT_NAMES[payload.format]
+    if payload.format == FORMAT_TEXT:
+        record["message"] = payload.data.decode("utf-8", errors="replace")
+    else:
+        record["data"] = base64.b64encode(payload.data).decode("ascii")
+    record["bytes"] = len(payload.data)
+    return record
+
+
+def _analyze(request: Dict) -> Dict:
+    image = _b64(request, "image")
+    with Image.open(io.BytesIO(image)) as img:
+        # The analyses report failures per image, so check up front to answer 413.
+        check_memory_budget(img)
+    if _frames(image) > 1:
+        result = analyze_frames(image, _worker_model)
+    else:
+        with Image.open(io.BytesIO(image)) as img:
+            result = analyze_batch([img], _worker_model, workers=1)
+    scored = [i for i, err in enumerate(result.errors) if err is None]
+    if not scored:
+        raise ValueError(result.errors[0] if result.errors else "No frames to analyze.")
+    # Like the app, the verdict follows the most suspicious frame.
+    worst = max(scored, key=lambda i: result.probabilities[i])
+    cols = [FEATURE_NAMES.index(name) for name in DETECTOR_NAMES]
+    record = {
+        "probability": round(float(result.probabilities[worst]), 6),
+        "detectors": {
+            name: round(float(result.features[worst, col]), 6) for name, col in zip(DETECTOR_NAMES, cols)
+        },
+    }
+    if len(result.errors) > 1:
+        record["frame_probabilities"] = [
+            None if np.isnan(p) else round(float(p), 6) for p in result.probabilities
+        ]
+    return record
+
+
+_HANDLERS: Dict[str, Callable[[Dict], Dict]] = {
+    "encode": _encode,
+    "decode": _decode,
+    "analyze": _analyze,
+}
+
+
+def _run(route: str, body: bytes) -> Tuple[int, bytes]:
+    """Parse, run and serialize one request in a worker; returns (status, JSON body)."""
+    t0 = time.perf_counter()
+    try:
+        request = json.loads(body)
+        if not isinstance(request, dict):
+            raise ValueError("The request body must be a JSON object.")
+        status, record = 200, _HANDLERS[route](request)
+    except MemoryBudgetError as exc:
+        # Checked before any full decode, so an oversized image costs only its header.
+        status, record = 413, {"error": f"{type(exc).__name__}: {exc}"}
+    except (ValueError, TypeError, OSError, Image.DecompressionBombError) as exc:
+        # Bad JSON, base64, parameters or images.
+        status, record = 400, {"error": f"{type(exc).__name__}: {exc}"}
+    except Exception as exc:
+        status, record = 500, {"error": f"{type(exc).__name__}: {exc}"}
+    record["seconds"] = round(time.perf_counter() - t0, 6)
+    return status, json.dumps(record).encode("utf-8")
+
+
+def _ping() -> bool:
+    return _worker_model is not None
+
+
+class _HttpError(Exception):
+    def __init__(
+        self,
+        status: int,
+        message: str,
+        headers: Optional[Dict[str, str]] = None,
+        unread: int = 0,
+    ) -> None:
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+        self.unread = unread
+
+
+async def _discard(reader: asyncio.StreamReader, length: int) -> None:
+    while length > 0:
+        chunk = await reader.read(min(length, 1 << 20))
+        if not chunk:
+            return
+        length -= len(chunk)
+
+
+class ApiServer:
+    """Asyncio HTTP front end over a bounded process pool."""
+
+    def __init__(
+        self,
+        workers: int = 1,
+        max_body: int = DEFAULT_MAX_BODY,
+        max_pending: Optional[int] = None,
+        model_path=None,
+    ) -> None:
+        self.workers = workers
+        self.max_body = max_body
+        self.max_pending = 2 * workers if max_pending is None else max_pending
+        self.model_path = model_path
+        self.pending = self.served = self.rejected = 0
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        # Spawned, not forked: the parent runs an event loop and the pool's threads.
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.model_path,),
+        )
+
+    async def start(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> asyncio.AbstractServer:
+        """Start the workers, wait until each has its model loaded, then listen."""
+        # Train and save the artifact once here, so the workers only read it.
+        load_steganalysis_model(self.model_path)
+        self._pool = self._new_pool()
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self._pool, _ping) for _ in range(self.workers)))
+        self._server = await asyncio.start_server(self._handle, host, port, limit=MAX_HEADER_BYTES)
+        return self._server
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+
+    def health(self) -> Dict:
+        return {
+            "status": "ok",
+            "workers": self.workers,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "served": self.served,
+            "rejected": self.rejected,
+        }
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        headers: Dict[str, str] = {}
+        unread = 0
+        try:
+            status, body = await self._respond(reader)
+        except _HttpError as exc:
+            status, headers, unread = exc.status, exc.headers, exc.unread
+            body = json.dumps({"error": str(exc)}).encode("utf-8")
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+            return
+        head = [f"HTTP/1.1 {status} {_REASONS.get(status, '')}"]
+        headers = {
+            "Content-Type": "application/json",
+            "Content-Length": str(len(body)),
+            "Connection": "close",
+            **headers,
+        }
+        head += [f"{name}: {value}" for name, value in headers.items()]
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+        try:
+            await writer.drain()
+            if unread:
+                # Closing with the body still arriving would reset the connection
+                # before the client reads the refusal, so let the body drain first.
+                await asyncio.wait_for(_discard(reader, unread), LINGER_SECONDS)
+        except (ConnectionError, asyncio.TimeoutError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, reader: asyncio.StreamReader) -> Tuple[int, bytes]:
+        try:
+            raw = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), READ_TIMEOUT)
+        except asyncio.LimitOverrunError:
+            raise _HttpError(431, "Request headers are too large.")
+        except asyncio.TimeoutError:
+            raise _HttpError(408, "Timed out reading the request.")
+        lines = raw.decode("latin-1").split("\r\n")
+        try:
+            method, target, _ = lines[0].split(" ", 2)
+        except ValueError:
+            raise _HttpError(400, "Malformed request line.")
+        fields = {}
+        for line in lines[1:]:
+            name, sep, value = line.partition(":")
+            if sep:
+                fields[name.strip().lower()] = value.strip()
+
+        route = urlsplit(target).path.strip("/")
+        if route == "health":
+            if method != "GET":
+                raise _HttpError(405, "Use GET.", {"Allow": "GET"})
+            return 200, json.dumps(self.health()).encode("utf-8")
+        if route not in ROUTES:
+            raise _HttpError(404, f"No such endpoint; use /{', /'.join(ROUTES)} or /health.")
+        if method != "POST":
+            raise _HttpError(405, "Use POST.", {"Allow": "POST"})
+        if "content-length" not in fields:
+            raise _HttpError(411, "Content-Length is required.")
+        try:
+            length = int(fields["content-length"])
+        except ValueError:
+            raise _HttpError(400, "Invalid Content-Length.")
+        if length < 0:
+            raise _HttpError(400, "Invalid Content-Length.")
+        if length > self.max_body:
+            raise _HttpError(413, f"The body is over the {self.max_body} byte limit.", unread=length)
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise _HttpError(
+                429, "The server is busy; retry shortly.", {"Retry-After": "1"}, unread=length
+            )
+
+        self.pending += 1
+        try:
+            try:
+                body = await asyncio.wait_for(reader.readexactly(length), READ_TIMEOUT)
+            except asyncio.TimeoutError:
+                raise _HttpError(408, "Timed out reading the request body.")
+            loop = asyncio.get_running_loop()
+            pool = self._pool
+            try:
+                status, payload = await loop.run_in_executor(pool, _run, route, body)
+            except BrokenProcessPool:
+                # A worker died (out of memory, say); replace the pool for later requests.
+                if self._pool is pool:
+                    pool.shutdown(wait=False)
+                    self._pool = self._new_pool()
+                raise _HttpError(500, "A worker process died; the request was not completed.")
+            self.served += 1
+            return status, payload
+        finally:
+            self.pending -= 1
+
+
+async def _serve_forever(server: ApiServer, host: str, port: int) -> None:
+    listener = await server.start(host, port)
+    address = listener.sockets[0].getsockname()
+    print(
+        f"cipher-engine: serving on http://{address[0]}:{address[1]} with {server.workers} "
+        f"worker(s), at most {server.max_pending} pending",
+        file=sys.stderr,
+    )
+    try:
+        await listener.serve_forever()
+    finally:
+        await server.close()
+
+
+def serve(
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+    workers: int = 1,
+    max_body: int = DEFAULT_MAX_BODY,
+    max_pending: Optional[int] = None,
+    model_path=None,
+) -> None:
+    """Run the API until interrupted."""
+    server = ApiServer(workers, max_body, max_pending, model_path)
+    try:
+        asyncio.run(_serve_forever(server, host, port))
+    except KeyboardInterrupt:
+        pass
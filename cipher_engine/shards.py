@@ -0,0 +1,294 @@
+"""Payloads split across several carrier images.
+
+The payload is compressed once and cut into one shard per carrier, sized in
+proportion to each carrier's capacity so the parallel work stays balanced.
+Every shard is embedded as its own ``FORMAT_SHARD`` payload behind a shard
+header: the set digest (a BLAKE2b hash of the whole stored payload), shard
+index and count, the payload's format and codec, its stored and uncompressed
+lengths and a CRC-32 of the shard. Reassembled payloads decompress to no
+more than the declared length. Shards are embedded and extracted in worker processes
+with a bounded number in flight, so carriers can be produced lazily; decoding
+accepts them in any order and reports missing, corrupt and foreign shards
+instead of failing on the first one.
+"""
+
+import hashlib
+import io
+import multiprocessing
+import os
+import struct
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import (
+    BinaryIO,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Sized,
+    Tuple,
+    Union,
+)
+
+import numpy as np
+from PIL import Image
+
+from .compression import CODEC_NONE, compress_payload, decompress_payload
+from .instrument import progress, span
+from .scatter import Key
+from .stego import (
+    FORMAT_BINARY,
+    FORMAT_SHARD,
+    FORMAT_TEXT,
+    Payload,
+    _as_bytes,
+    _check_output,
+    _embed_bytes,
+    _output_limit,
+    extract_payload,
+    load_carrier,
+    payload_capacity,
+)
+
+SHARD_HEADER = struct.Struct(">16sHHBBQQI")
+SHARD_HEADER_SIZE = SHARD_HEADER.size
+MAX_SHARDS = 0xFFFF
+
+# Carriers are paths, encoded image bytes or file objects, or decoded RGB arrays.
+Source = Union[str, os.PathLike, bytes, BinaryIO, np.ndarray]
+
+
+class ShardHeader(NamedTuple):
+    digest: bytes
+    index: int
+    count: int
+    format: int
+    codec: int
+    length: int
+    raw_length: int
+    crc: int
+
+
+class EmbeddedShard(NamedTuple):
+    index: int
+    length: int
+    png: Optional[bytes]
+
+
+class ShardSet(NamedTuple):
+    """Outcome of reassembling a set; ``payload`` is None unless every shard checked out."""
+
+    payload: Optional[Payload]
+    count: int
+    found: List[int]
+    missing: List[int]
+    corrupt: List[Tuple[int, str]]
+
+
+def _open(source: Source) -> Image.Image:
+    if isinstance(source, np.ndarray):
+        return Image.fromarray(source)
+    return Image.open(io.BytesIO(source) if isinstance(source, bytes) else source)
+
+
+def _carrier(source: Source) -> np.ndarray:
+    if isinstance(source, np.ndarray):
+        return source
+    return load_carrier(io.BytesIO(source) if isinstance(source, bytes) else source)
+
+
+def shard_capacity(source: Source, bits: int = 1) -> int:
+    """Payload bytes one carrier holds as a shard; read from the image header only."""
+    with _open(source) as img:
+        return max(payload_capacity(img.size, bits) - SHARD_HEADER_SIZE, 0)
+
+
+def plan_shards(capacities: Sequence[int], length: int) -> List[int]:
+    """Shard sizes for ``length`` bytes, proportional to ``capacities`` and never above them."""
+    total = sum(capacities)
+    if length > total:
+        raise ValueError(f"Payload ({length} bytes) exceeds the carriers' capacity ({total} bytes).")
+    if not 0 < len(capacities) <= MAX_SHARDS:
+        raise ValueError(f"A shard set needs 1 to {MAX_SHARDS} carriers, got {len(capacities)}.")
+    # Cumulative ceilings keep every size within its carrier and sum to ``length``.
+    sizes, done, acc = [], 0, 0
+    for capacity in capacities:
+        acc += capacity
+        end = -(-length * acc // total) if total else 0
+        sizes.append(end - done)
+        done = end
+    return sizes
+
+
+def _embed_shard(
+    source: Source, shard: bytes, bits: int, key: Optional[Key], output: Optional[str]
+) -> Optional[bytes]:
+    carrier = _carrier(source)
+    _embed_bytes(carrier, FORMAT_SHARD, shard, bits, key)
+    encoded = Image.fromarray(carrier)
+    del carrier
+    with span("encode_png"):
+        if output is not None:
+            encoded.save(output, format="PNG")
+            return None
+        buf = io.BytesIO()
+        encoded.save(buf, format="PNG")
+        return buf.getvalue()
+
+
+def _imap(
+    fn: Callable, jobs: Iterable[tuple], workers: int, total: Optional[int] = None, unit: str = ""
+) -> Iterator:
+    # Ordered map over a lazy job stream, reporting each result as progress.
+    for done, result in enumerate(_ordered_map(fn, jobs, workers), 1):
+        progress(done, total, unit)
+        yield result
+
+
+def _ordered_map(fn: Callable, jobs: Iterable[tuple], workers: int) -> Iterator:
+    # At most 2 * workers jobs are in flight.
+    if workers <= 1:
+        for job in jobs:
+            yield fn(*job)
+        return
+    # Spawned, not forked: callers may be threads of a multithreaded process
+    # (the app's job queue), and forking one can deadlock the child.
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        pending = deque()
+        for job in jobs:
+            pending.append(pool.submit(fn, *job))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _shard_jobs(
+    carriers: Iterable[Source],
+    capacities: Sequence[int],
+    message: Union[str, bytes],
+    bits: int,
+    key: Optional[Key],
+    compress: bool,
+    outputs: Optional[Sequence[Union[str, os.PathLike]]] = None,
+) -> Tuple[List[int], Iterator[tuple]]:
+    # Plans the split and returns the shard sizes with a lazy stream of
+    # ``_embed_shard`` jobs, pairing shard ``i`` with the ``i``-th carrier.
+    fmt = FORMAT_TEXT if isinstance(message, str) else FORMAT_BINARY
+    data = _as_bytes(message)
+    with span("compress"):
+        codec, stored = compress_payload(data) if compress else (CODEC_NONE, data)
+    sizes = plan_shards(capacities, len(stored))
+    digest = hashlib.blake2b(stored, digest_size=16).digest()
+
+    def jobs():
+        offset = 0
+        for index, (carrier, size) in enumerate(zip(carriers, sizes)):
+            chunk = stored[offset : offset + size]
+            offset += size
+            header = SHARD_HEADER.pack(
+                digest, index, len(sizes), fmt, codec, len(stored), len(data), zlib.crc32(chunk)
+            )
+            output = None if outputs is None else os.fspath(outputs[index])
+            yield carrier, header + chunk, bits, key, output
+
+    return sizes, jobs()
+
+
+def embed_shards(
+    carriers: Sequence[Source],
+    message: Union[str, bytes],
+    bits: int = 1,
+    key: Optional[Key] = None,
+    compress: bool = True,
+    workers: int = 1,
+    outputs: Optional[Sequence[Union[str, os.PathLike]]] = None,
+) -> List[EmbeddedShard]:
+    """Split ``message`` across ``carriers`` and embed one shard into each.
+
+    Shard ``i`` is saved as a PNG to ``outputs[i]`` when given, otherwise
+    its PNG bytes are returned. Carriers are embedded and encoded in up to
+    ``workers`` processes.
+    """
+    capacities = [shard_capacity(c, bits) for c in carriers]
+    sizes, jobs = _shard_jobs(carriers, capacities, message, bits, key, compress, outputs)
+    pngs = _imap(_embed_shard, jobs, workers, len(sizes), "shards")
+    return [EmbeddedShard(i, size, png) for i, (size, png) in enumerate(zip(sizes, pngs))]
+
+
+def _read_shard(source: Source, key: Optional[Key]) -> Tuple[Optional[ShardHeader], Union[bytes, str]]:
+    # Returns the header and shard bytes, or None and the reason it is unusable.
+    try:
+        with _open(source) as img:
+            payload = extract_payload(img, key)
+    except Exception as exc:
+        return None, f"{type(exc).__name__}: {exc}"
+    if payload is None:
+        return None, "no payload found"
+    if payload.format != FORMAT_SHARD or len(payload.data) < SHARD_HEADER_SIZE:
+        return None, "not a shard"
+    header = ShardHeader(*SHARD_HEADER.unpack(payload.data[:SHARD_HEADER_SIZE]))
+    chunk = payload.data[SHARD_HEADER_SIZE:]
+    if zlib.crc32(chunk) != header.crc:
+        return None, f"shard {header.index} failed its checksum"
+    return header, chunk
+
+
+def extract_shards(
+    sources: Iterable[Source],
+    key: Optional[Key] = None,
+    workers: int = 1,
+    total: Optional[int] = None,
+) -> ShardSet:
+    """Reassemble a shard set from ``sources`` in any order.
+
+    Shards are extracted in up to ``workers`` processes. The set with the
+    most shards present wins; images from other sets, duplicates and shards
+    failing their checksum are listed in ``corrupt`` by position in
+    ``sources``. ``total`` is the number of sources for progress reports when
+    they are a lazy iterable.
+    """
+    if total is None and isinstance(sources, Sized):
+        total = len(sources)
+    results = list(_imap(_read_shard, ((s, key) for s in sources), workers, total, "shards"))
+    sets: Dict[tuple, Dict[int, int]] = {}
+    corrupt: List[Tuple[int, str]] = []
+    for pos, (header, chunk) in enumerate(results):
+        if header is None:
+            corrupt.append((pos, chunk))
+            continue
+        members = sets.setdefault(header._replace(index=0, crc=0), {})
+        if header.index in members or header.index >= header.count:
+            corrupt.append((pos, f"duplicate or out-of-range shard {header.index}"))
+        else:
+            members[header.index] = pos
+    if not sets:
+        return ShardSet(None, 0, [], [], corrupt)
+
+    ident, members = max(sets.items(), key=lambda item: len(item[1]))
+    for other, positions in sets.items():
+        if other is not ident:
+            corrupt += [(pos, "belongs to another shard set") for pos in positions.values()]
+    found = sorted(members)
+    missing = sorted(set(range(ident.count)) - set(members))
+    corrupt.sort()
+    if missing:
+        return ShardSet(None, ident.count, found, missing, corrupt)
+
+    stored = b"".join(results[members[i]][1] for i in found)
+    if len(stored) != ident.length or hashlib.blake2b(stored, digest_size=16).digest() != ident.digest:
+        corrupt.append((-1, "reassembled payload failed the set digest"))
+        return ShardSet(None, ident.count, found, missing, corrupt)
+    try:
+        data = decompress_payload(ident.codec, stored, _output_limit(ident.raw_length))
+        _check_output(ident.raw_length, len(data))
+    except ValueError as exc:
+        corrupt.append((-1, str(exc)))
+        return ShardSet(None, ident.count, found, missing, corrupt)
+    return ShardSet(Payload(ident.format, data), ident.count, found, missing, corrupt)
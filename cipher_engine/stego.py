@@ -0,0 +1,633 @@
+"""LSB payload embedding and extraction.
+
+Every payload is prefixed with a fixed-size header (magic, version, format,
+bits per channel, codec, stored and uncompressed length) so extraction can reject unmarked images after a
+handful of bytes and otherwise read only the pixels the payload occupies. The
+header always uses the lowest bit of each channel; the payload after it uses
+the lowest ``bits`` (1-4), written and read as whole k-bit fields with one
+mask-and-shift pass. Fields fill channels in order unless a key is given, in
+which case header and payload fields go to the keyed positions from
+:mod:`.scatter`. Payloads are compressed first with whichever
+:mod:`.compression` codec shrinks them most. File payloads are moved
+``CHUNK_SIZE`` bytes at a time in both directions, so the only buffer that
+grows with the payload is the carrier itself. Decompression stops at the
+uncompressed length the header declares, which may not exceed the memory
+budget.
+
+The carrier is a single writable ``(h, w, 3)`` array that the payload is
+written into in place through ``reshape(-1)`` views. ``load_carrier`` fills it
+from the decoded image band by band and refuses images whose estimated working
+set exceeds the memory budget before decoding them.
+"""
+
+import io
+import os
+import struct
+import tempfile
+import zlib
+from contextlib import ExitStack
+from typing import BinaryIO, NamedTuple, Optional, Tuple, Union
+
+import numpy as np
+from PIL import Image
+
+from .compression import (
+    CODEC_NAMES,
+    CODEC_NONE,
+    SAMPLE_SIZE,
+    choose_codec,
+    compress_payload,
+    compress_stream,
+    decompress_payload,
+    iter_decompressed,
+)
+from .instrument import progress, span
+from .scatter import Key, ScatterKey
+
+NO_MESSAGE = "No valid hidden message detected."
+
+MAGIC = b"CE"
+HEADER_VERSION = 4
+FORMAT_TEXT = 0
+FORMAT_BINARY = 1
+FORMAT_SHARD = 2
+_FORMATS = (FORMAT_TEXT, FORMAT_BINARY, FORMAT_SHARD)
+MAX_BITS = 4
+_HEADER = struct.Struct(">2sBBBBII")
+HEADER_SIZE = _HEADER.size
+CHUNK_SIZE = 1 << 20
+
+MEMORY_BUDGET_ENV = "CIPHER_ENGINE_MEMORY_BUDGET_MB"
+DEFAULT_MEMORY_BUDGET = 2048 << 20
+_PIL_BYTES_PER_PIXEL = 4  # Pillow keeps RGB pixels in 32-bit words
+_BAND_BYTES = 4 << 20
+
+
+class MemoryBudgetError(ValueError):
+    """An image whose decode would exceed the memory budget."""
+
+
+class Payload(NamedTuple):
+    format: int
+    data: bytes
+
+
+class Header(NamedTuple):
+    version: int
+    format: int
+    bits: int
+    length: int
+    codec: int
+    raw_length: int
+
+
+def _as_bytes(message: Union[str, bytes]) -> bytes:
+    return message.encode("utf-8") if isinstance(message, str) else bytes(message)
+
+
+def payload_to_bits(payload: bytes) -> np.ndarray:
+    return np.unpackbits(np.frombuffer(payload, dtype=np.uint8))
+
+
+def text_to_binary(text: str) -> str:
+    return (payload_to_bits(text.encode("utf-8")) + ord("0")).tobytes().decode("ascii")
+
+
+def binary_to_text(binary: str) -> str:
+    bits = np.frombuffer(binary.encode("ascii"), dtype=np.uint8) - ord("0")
+    aligned = bits[: bits.size - (bits.size % 8)]
+    return np.packbits(aligned).tobytes().decode("utf-8", errors="ignore")
+
+
+def pack_header(
+    fmt: int, length: int, bits: int = 1, codec: int = CODEC_NONE, raw_length: Optional[int] = None
+) -> bytes:
+    raw_length = length if raw_length is None else raw_length
+    return _HEADER.pack(MAGIC, HEADER_VERSION, fmt, bits, codec, length, raw_length)
+
+
+def _check_bits(bits: int) -> None:
+    if not 1 <= bits <= MAX_BITS:
+        raise ValueError(f"Bits per channel must be between 1 and {MAX_BITS}, got {bits}.")
+
+
+def _capacity(channels: int, bits: int, header_size: int = HEADER_SIZE) -> int:
+    return max((channels - header_size * 8) * bits // 8, 0)
+
+
+def payload_capacity(size: Tuple[int, int], bits: int = 1) -> int:
+    w, h = size
+    return _capacity(w * h * 3, bits)
+
+
+def _to_fields(data: bytes, bits: int) -> np.ndarray:
+    # Every ``bits`` bytes hold exactly eight k-bit fields, MSB first: read
+    # them as one big-endian word and cut it with one shift per field column.
+    # The tail is zero-padded.
+    raw = np.frombuffer(data, dtype=np.uint8)
+    if bits == 1:
+        return np.unpackbits(raw)
+    padded = np.zeros(-(-raw.size // bits) * bits, dtype=np.uint8)
+    padded[: raw.size] = raw
+    words = np.zeros((padded.size // bits, 4), dtype=np.uint8)
+    words[:, 4 - bits :] = padded.reshape(-1, bits)
+    words = words.view(">u4").reshape(-1)
+    fields = np.empty((words.size, 8), dtype=np.uint8)
+    for i in range(8):
+        fields[:, i] = (words >> (bits * (7 - i))) & ((1 << bits) - 1)
+    return fields.reshape(-1)[: -(-raw.size * 8 // bits)]
+
+
+def _from_fields(fields: np.ndarray, bits: int, n_bytes: int) -> bytes:
+    if bits == 1:
+        return np.packbits(fields[: n_bytes * 8]).tobytes()
+    grouped = np.zeros((-(-fields.size // 8), 8), dtype=np.uint8)
+    grouped.reshape(-1)[: fields.size] = fields
+    words = np.zeros(grouped.shape[0], dtype=">u4")
+    for i in range(8):
+        words |= grouped[:, i].astype(np.uint32) << (bits * (7 - i))
+    return words.view(np.uint8).reshape(-1, 4)[:, 4 - bits :].tobytes()[:n_bytes]
+
+
+def memory_budget() -> int:
+    value = os.environ.get(MEMORY_BUDGET_ENV)
+    return int(float(value) * (1 << 20)) if value else DEFAULT_MEMORY_BUDGET
+
+
+def embed_working_set(image: Image.Image) -> int:
+    """Estimated peak bytes to load ``image`` as a carrier, embed into it and re-encode it.
+
+    Only ``size`` and ``mode`` are read, so a lazily opened image is not decoded.
+    """
+    w, h = image.size
+    decoded = w * h * _PIL_BYTES_PER_PIXEL
+    converted = decoded if image.mode != "RGB" else 0
+    return decoded + converted + w * h * 3
+
+
+def check_memory_budget(image: Image.Image, budget: Optional[int] = None) -> None:
+    budget = memory_budget() if budget is None else budget
+    needed = embed_working_set(image)
+    if needed > budget:
+        w, h = image.size
+        raise MemoryBudgetError(
+            f"Image {w}x{h} needs about {needed / 2**20:.1f} MB to decode, "
+            f"over the {budget / 2**20:.1f} MB budget."
+        )
+
+
+def load_carrier(source: Union[str, os.PathLike, BinaryIO], budget: Optional[int] = None) -> np.ndarray:
+    """Decode ``source`` into a new writable RGB array, checking the budget first."""
+    with span("read"):
+        image = Image.open(source)
+    with image:
+        check_memory_budget(image, budget)
+        with span("decode"):
+            image.load()
+        with span("convert"):
+            rgb = image if image.mode == "RGB" else image.convert("RGB")
+            w, h = rgb.size
+            arr = np.empty((h, w, 3), dtype=np.uint8)
+            # np.array(image) goes through a full-size bytes copy; filling the
+            # destination in bands keeps the temporary at _BAND_BYTES.
+            step = max(1, _BAND_BYTES // (w * 3))
+            for y in range(0, h, step):
+                arr[y : y + step] = np.asarray(rgb.crop((0, y, w, min(y + step, h))))
+                progress(min(y + step, h), h, "rows")
+    return arr
+
+
+def _check_carrier(arr: np.ndarray, length: int, bits: int) -> None:
+    _check_bits(bits)
+    if arr.ndim != 3:
+        raise ValueError("Image must be RGB (3 channels).")
+    if not arr.flags.c_contiguous:
+        # reshape(-1) would copy, and the payload would be written into the copy.
+        raise ValueError("Carrier must be a C-contiguous array to embed in place.")
+    if arr.size < HEADER_SIZE * 8:
+        raise ValueError(
+            f"Image is too small for the {HEADER_SIZE}-byte header "
+            f"({arr.size} channels, {HEADER_SIZE * 8} needed)."
+        )
+    capacity = _capacity(arr.size, bits)
+    if length > capacity:
+        raise ValueError(
+            f"Payload size ({length} bytes) exceeds image capacity "
+            f"({capacity} bytes at {bits} bit(s) per channel)."
+        )
+
+
+def _scatter(key: Optional[Key], channels: int) -> Optional[ScatterKey]:
+    # Whole pixels are scattered: field i lives in channel i % 3 of pixel
+    # positions(i // 3), which needs a third of the positions and keeps each
+    # gather contiguous.
+    return None if key is None else ScatterKey(key, channels // 3)
+
+
+def _pixel_rows(scatter: ScatterKey, start: int, stop: int) -> Tuple[int, np.ndarray]:
+    first = start // 3
+    return start - first * 3, scatter.positions(first, -(-stop // 3))
+
+
+def _read_fields(flat: np.ndarray, start: int, stop: int, scatter: Optional[ScatterKey]) -> np.ndarray:
+    if scatter is None:
+        return flat[start:stop]
+    skip, rows = _pixel_rows(scatter, start, stop)
+    return np.take(flat.reshape(-1, 3), rows, axis=0).reshape(-1)[skip : skip + stop - start]
+
+
+def _write_fields(
+    flat: np.ndarray, offset: int, data: bytes, bits: int = 1, scatter: Optional[ScatterKey] = None
+) -> int:
+    with span("pack"):
+        fields = _to_fields(data, bits)
+    with span("embed"):
+        stop = offset + fields.size
+        if scatter is None:
+            window = flat[offset:stop]
+        else:
+            skip, rows = _pixel_rows(scatter, offset, stop)
+            gathered = np.take(flat.reshape(-1, 3), rows, axis=0)
+            window = gathered.reshape(-1)[skip : skip + fields.size]
+        window &= 0xFF ^ ((1 << bits) - 1)
+        window |= fields
+        if scatter is not None:
+            # Scattering 3-byte void items back is much faster than 2-D row assignment.
+            flat.view("V3")[rows] = gathered.view("V3").reshape(-1)
+    return stop
+
+
+def embed_message_inplace(
+    arr: np.ndarray,
+    message: Union[str, bytes],
+    bits: int = 1,
+    key: Optional[Key] = None,
+    compress: bool = True,
+) -> Header:
+    """Embed ``message`` into ``arr`` in place and return the header written with it."""
+    fmt = FORMAT_TEXT if isinstance(message, str) else FORMAT_BINARY
+    raw = _as_bytes(message)
+    with span("compress"):
+        codec, data = compress_payload(raw) if compress else (CODEC_NONE, raw)
+    return _embed_bytes(arr, fmt, data, bits, key, codec, len(raw))
+
+
+def _embed_bytes(
+    arr: np.ndarray,
+    fmt: int,
+    data: bytes,
+    bits: int,
+    key: Optional[Key],
+    codec: int = CODEC_NONE,
+    raw_length: Optional[int] = None,
+) -> Header:
+    _check_carrier(arr, len(data), bits)
+    flat = arr.reshape(-1)
+    scatter = _scatter(key, flat.size)
+    header = pack_header(fmt, len(data), bits, codec, raw_length)
+    offset = _write_fields(flat, 0, header, scatter=scatter)
+    _write_fields(flat, offset, data, bits, scatter)
+    return _parse_header(header, flat.size)
+
+
+def embed_message(
+    image: Image.Image,
+    message: Union[str, bytes],
+    bits: int = 1,
+    key: Optional[Key] = None,
+    compress: bool = True,
+) -> Image.Image:
+    arr = np.array(image)
+    embed_message_inplace(arr, message, bits, key, compress)
+    return Image.fromarray(arr)
+
+
+def _stream_length(source: BinaryIO) -> int:
+    try:
+        return os.fstat(source.fileno()).st_size - source.tell()
+    except (AttributeError, OSError, ValueError):
+        start = source.tell()
+        end = source.seek(0, os.SEEK_END)
+        source.seek(start)
+        return end - start
+
+
+def embed_stream_inplace(
+    arr: np.ndarray,
+    source: BinaryIO,
+    length: Optional[int] = None,
+    chunk_size: int = CHUNK_SIZE,
+    bits: int = 1,
+    key: Optional[Key] = None,
+    compress: bool = True,
+) -> Header:
+    """Embed ``length`` bytes read from ``source`` (default: the rest of it) as a binary payload.
+
+    With ``compress`` the codec is picked on a leading sample (``source`` must
+    be seekable) and the compressed stream is spooled to a temporary file that
+    is held in memory only up to ``chunk_size`` bytes. Returns the header
+    written with the payload.
+    """
+    if length is None:
+        length = _stream_length(source)
+    raw_length = length
+    with ExitStack() as stack:
+        codec = CODEC_NONE
+        with span("compress"):
+            if compress and length:
+                start = source.tell()
+                codec, _ = choose_codec(source.read(min(SAMPLE_SIZE, length)))
+                source.seek(start)
+            if codec != CODEC_NONE:
+                spool = stack.enter_context(tempfile.SpooledTemporaryFile(max_size=chunk_size))
+                stored = compress_stream(codec, source, length, spool, chunk_size)
+                if stored < length:
+                    spool.seek(0)
+                    source, length = spool, stored
+                else:
+                    codec = CODEC_NONE
+                    source.seek(start)
+
+        _check_carrier(arr, length, bits)
+        flat = arr.reshape(-1)
+        scatter = _scatter(key, flat.size)
+        header = pack_header(FORMAT_BINARY, length, bits, codec, raw_length)
+        offset = _write_fields(flat, 0, header, scatter=scatter)
+        # Chunks are a multiple of ``bits`` bytes so no k-bit field straddles two.
+        step = max(bits, chunk_size - chunk_size % bits)
+        remaining = length
+        while remaining:
+            chunk = source.read(min(step, remaining))
+            if not chunk:
+                raise ValueError(f"Payload source ended {remaining} bytes short of {length}.")
+            offset = _write_fields(flat, offset, chunk, bits, scatter)
+            remaining -= len(chunk)
+            progress(length - remaining, length, "bytes")
+    return _parse_header(header, flat.size)
+
+
+def embed_stream(
+    image: Image.Image,
+    source: BinaryIO,
+    length: Optional[int] = None,
+    chunk_size: int = CHUNK_SIZE,
+    bits: int = 1,
+    key: Optional[Key] = None,
+    compress: bool = True,
+) -> Image.Image:
+    arr = np.array(image)
+    embed_stream_inplace(arr, source, length, chunk_size, bits, key, compress)
+    return Image.fromarray(arr)
+
+
+def embed_file(
+    image: Image.Image,
+    path: Union[str, os.PathLike],
+    chunk_size: int = CHUNK_SIZE,
+    bits: int = 1,
+    key: Optional[Key] = None,
+    compress: bool = True,
+) -> Image.Image:
+    with open(path, "rb") as source:
+        return embed_stream(image, source, chunk_size=chunk_size, bits=bits, key=key, compress=compress)
+
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+_PNG_CHUNK = struct.Struct(">I4s")
+
+
+def _png_chunk(ctype: bytes, data: bytes) -> bytes:
+    return _PNG_CHUNK.pack(len(data), ctype) + data + struct.pack(">I", zlib.crc32(ctype + data))
+
+
+def _decode_png_rows(image: Image.Image, rows: int) -> Optional[np.ndarray]:
+    # Inflate only the filtered scanlines of the first ``rows`` rows from the
+    # PNG's IDAT chunks and let Pillow unfilter them as a ``rows``-high PNG of
+    # its own. The source image is left unloaded and fully loadable.
+    fp = getattr(image, "fp", None)
+    if image.format != "PNG" or image.mode != "RGB" or fp is None or fp.closed:
+        return None
+    w, _ = image.size
+    need = rows * (1 + w * 3)
+    inflate = zlib.decompressobj()
+    raw = bytearray()
+    pos = fp.tell()
+    try:
+        fp.seek(0)
+        if fp.read(8) != _PNG_SIGNATURE:
+            return None
+        while len(raw) < need:
+            head = fp.read(_PNG_CHUNK.size)
+            if len(head) < _PNG_CHUNK.size:
+                return None
+            length, ctype = _PNG_CHUNK.unpack(head)
+            if ctype == b"IHDR":
+                ihdr = fp.read(length)
+                # 8-bit truecolour, not interlaced; anything else goes the long way.
+                if len(ihdr) != 13 or ihdr[8:10] != b"\x08\x02" or ihdr[12] != 0:
+                    return None
+                fp.seek(4, os.SEEK_CUR)
+            elif ctype == b"IDAT":
+                raw += inflate.decompress(fp.read(length), need - len(raw))
+                fp.seek(4, os.SEEK_CUR)
+            elif ctype == b"IEND":
+                return None
+            else:
+                fp.seek(length + 4, os.SEEK_CUR)
+    except (OSError, zlib.error):
+        return None
+    finally:
+        fp.seek(pos)
+    ihdr = struct.pack(">IIBBBBB", w, rows, 8, 2, 0, 0, 0)
+    png = _PNG_SIGNATURE + _png_chunk(b"IHDR", ihdr) + _png_chunk(b"IDAT", zlib.compress(raw, 0))
+    with Image.open(io.BytesIO(png + _png_chunk(b"IEND", b""))) as partial:
+        return np.array(partial)
+
+
+def _leading_rows(image: Image.Image, rows: int) -> np.ndarray:
+    w, h = image.size
+    rows = min(rows, h)
+    with span("decode"):
+        arr = _decode_png_rows(image, rows)
+        if arr is None:
+            if getattr(image, "tile", None):
+                # Cropping an unloaded image decodes all of it.
+                check_memory_budget(image)
+            arr = np.asarray(image.crop((0, 0, w, rows)).convert("RGB"))
+    return arr
+
+
+def _leading_channels(image: Image.Image, channels: int) -> np.ndarray:
+    w, _ = image.size
+    return _leading_rows(image, -(-channels // (w * 3))).reshape(-1)[:channels]
+
+
+def _all_channels(image: Image.Image) -> np.ndarray:
+    check_memory_budget(image)
+    with span("decode"):
+        image.load()
+    with span("convert"):
+        return np.asarray(image if image.mode == "RGB" else image.convert("RGB")).reshape(-1)
+
+
+def _parse_header(raw: bytes, channels: int) -> Optional[Header]:
+    magic, version, fmt, bits, codec, length, raw_length = _HEADER.unpack(raw)
+    if magic != MAGIC or version != HEADER_VERSION:
+        return None
+    if fmt not in _FORMATS or not 1 <= bits <= MAX_BITS or codec not in CODEC_NAMES:
+        return None
+    if length > _capacity(channels, bits):
+        return None
+    if codec == CODEC_NONE and raw_length != length:
+        return None
+    return Header(version, fmt, bits, length, codec, raw_length)
+
+
+def _output_limit(raw_length: int) -> int:
+    # Most bytes a payload may decompress to: its declared length, which may
+    # not exceed the memory budget.
+    budget = memory_budget()
+    if raw_length > budget:
+        raise ValueError(
+            f"Payload declares {raw_length} bytes, over the {budget / 2**20:.1f} MB memory budget."
+        )
+    return raw_length
+
+
+def _check_output(raw_length: int, written: int) -> None:
+    if written != raw_length:
+        raise ValueError(
+            f"Payload decompressed to {written} bytes, not the {raw_length} its header declares."
+        )
+
+
+def _payload_span(header: Header) -> Tuple[int, int]:
+    start = HEADER_SIZE * 8
+    return start, start + -(-header.length * 8 // header.bits)
+
+
+class Located(NamedTuple):
+    header: Header
+    channels: np.ndarray
+    scatter: Optional[ScatterKey]
+
+
+def locate(image: Image.Image, key: Optional[Key] = None) -> Optional[Located]:
+    """The header and the channels holding the payload, or None when there is no payload.
+
+    Sequential payloads only need their leading rows decoded; scattered ones
+    need all. Pass the result as ``located`` to the extract functions to read
+    the header and then the payload with a single decode.
+    """
+    w, h = image.size
+    channels = w * h * 3
+    if _capacity(channels, 1) <= 0:
+        return None
+    scatter = _scatter(key, channels)
+    if scatter is None:
+        flat = _leading_channels(image, HEADER_SIZE * 8)
+    else:
+        flat = _all_channels(image)
+    raw = np.packbits(_read_fields(flat, 0, HEADER_SIZE * 8, scatter) & 1).tobytes()
+    header = _parse_header(raw, channels)
+    if header is None:
+        return None
+    if scatter is None:
+        flat = _leading_channels(image, _payload_span(header)[1])
+    return Located(header, flat, scatter)
+
+
+def read_header(image: Image.Image, key: Optional[Key] = None) -> Optional[Header]:
+    if key is None:
+        w, h = image.size
+        if _capacity(w * h * 3, 1) <= 0:
+            return None
+        raw = np.packbits(_leading_channels(image, HEADER_SIZE * 8) & 1).tobytes()
+        return _parse_header(raw, w * h * 3)
+    located = locate(image, key)
+    return None if located is None else located.header
+
+
+def extract_payload(
+    image: Image.Image, key: Optional[Key] = None, located: Optional[Located] = None
+) -> Optional[Payload]:
+    if located is None:
+        located = locate(image, key)
+    if located is None:
+        return None
+    header, flat, scatter = located
+    start, end = _payload_span(header)
+    with span("extract"):
+        fields = _read_fields(flat, start, end, scatter) & ((1 << header.bits) - 1)
+    with span("pack"):
+        data = _from_fields(fields, header.bits, header.length)
+    with span("decompress"):
+        data = decompress_payload(header.codec, data, _output_limit(header.raw_length))
+    _check_output(header.raw_length, len(data))
+    return Payload(header.format, data)
+
+
+def extract_stream(
+    image: Image.Image,
+    dest: BinaryIO,
+    chunk_size: int = CHUNK_SIZE,
+    key: Optional[Key] = None,
+    located: Optional[Located] = None,
+) -> Optional[int]:
+    """Write the payload to ``dest`` chunk by chunk; returns its decompressed length, or None."""
+    if located is None:
+        located = locate(image, key)
+    if located is None:
+        return None
+    header, flat, scatter = located
+    bits, length = header.bits, header.length
+    start, end = _payload_span(header)
+    mask = (1 << bits) - 1
+    step = max(bits, chunk_size - chunk_size % bits)
+    fields_per_step = step * 8 // bits
+
+    def stored_chunks():
+        for done in range(0, length, step):
+            pos = start + done * 8 // bits
+            with span("extract"):
+                fields = _read_fields(flat, pos, min(pos + fields_per_step, end), scatter) & mask
+            with span("pack"):
+                chunk = _from_fields(fields, bits, min(step, length - done))
+            progress(done + len(chunk), length, "bytes")
+            yield chunk
+
+    written = 0
+    limit = _output_limit(header.raw_length)
+    chunks = iter_decompressed(header.codec, stored_chunks(), chunk_size, limit)
+    while True:
+        # Self time: the extract and pack spans of the chunks pulled in are subtracted.
+        with span("decompress"):
+            chunk = next(chunks, None)
+        if chunk is None:
+            _check_output(header.raw_length, written)
+            return written
+        written += dest.write(chunk)
+
+
+def extract_file(
+    image: Image.Image,
+    path: Union[str, os.PathLike],
+    chunk_size: int = CHUNK_SIZE,
+    key: Optional[Key] = None,
+    located: Optional[Located] = None,
+) -> Optional[int]:
+    if located is None:
+        located = locate(image, key)
+    if located is None:
+        return None
+    with open(path, "wb") as dest:
+        return extract_stream(image, dest, chunk_size, key, located)
+
+
+def extract_message(
+    image: Image.Image, key: Optional[Key] = None, located: Optional[Located] = None
+) -> str:
+    payload = extract_payload(image, key, located)
+    if payload is None:
+        return NO_MESSAGE
+    return payload.data.decode("utf-8", errors="replace")
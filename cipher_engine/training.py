@@ -0,0 +1,191 @@
+"""Scalable training-set generation and forest fitting for steganalysis.
+
+Samples are produced in fixed-size chunks, each with its own child seed, so a
+dataset is identical whatever the worker count. A chunk is generated as one
+array and featurized with the batch extractors; chunks are spread over a
+process pool. Real carrier images can be mixed in: each contributes its clean
+pixels and one copy with a sequential LSB payload at a rate drawn from
+``rates``. Carriers that cannot be read are skipped and counted.
+"""
+
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+from PIL import Image
+
+from .analysis import ANALYSIS_RESOLUTION, RANDOM_SEED, _analysis_inputs, extract_features_batch
+from .detectors import batch_detector_scores
+
+if TYPE_CHECKING:
+    from sklearn.ensemble import RandomForestClassifier
+
+DEFAULT_RATES = (0.05, 0.1, 0.25, 0.5, 1.0)
+CHUNK_SIZE = 1024
+CARRIER_CHUNK_SIZE = 16
+
+
+class TrainingReport(NamedTuple):
+    samples: int
+    generate_seconds: float
+    feature_seconds: float
+    fit_seconds: float
+    total_seconds: float
+    skipped: int = 0
+
+
+Chunk = Tuple[np.ndarray, np.ndarray, float, float, int]
+
+
+def _synthetic_chunk(seed: np.random.SeedSequence, n: int) -> Chunk:
+    t0 = time.perf_counter()
+    rng = np.random.default_rng(seed)
+    w, h = ANALYSIS_RESOLUTION
+    images = rng.integers(0, 256, (n, h, w, 3), dtype=np.uint8)
+    n_clean = n // 2
+    images[:n_clean] &= 0xFE
+    labels = np.r_[np.zeros(n_clean, dtype=int), np.ones(n - n_clean, dtype=int)]
+    t1 = time.perf_counter()
+    features = extract_features_batch(images, batch_detector_scores(images))
+    return features, labels, t1 - t0, time.perf_counter() - t1, 0
+
+
+def _carrier_chunk(seed: np.random.SeedSequence, paths: List[str], rates: Sequence[float]) -> Chunk:
+    rng = np.random.default_rng(seed)
+    features, labels = [], []
+    gen_s = feat_s = 0.0
+    skipped = 0
+    for path in paths:
+        t0 = time.perf_counter()
+        try:
+            with Image.open(path) as img:
+                clean = np.array(img.convert("RGB"))
+        except Exception:
+            skipped += 1
+            continue
+        stego = clean.copy()
+        flat = stego.reshape(-1)
+        n = int(rng.choice(rates) * flat.size)
+        flat[:n] = (flat[:n] & 0xFE) | rng.integers(0, 2, n, dtype=np.uint8)
+        t1 = time.perf_counter()
+        for label, arr in ((0, clean), (1, stego)):
+            thumb, scores = _analysis_inputs(Image.fromarray(arr))
+            features.append(extract_features_batch(thumb[None], scores[None])[0])
+            labels.append(label)
+        gen_s += t1 - t0
+        feat_s += time.perf_counter() - t1
+    X = np.array(features).reshape(len(labels), -1)
+    return X, np.array(labels, dtype=int), gen_s, feat_s, skipped
+
+
+def _run_chunks(fn: Callable[..., Chunk], jobs: List[tuple], workers: int) -> Chunk:
+    if workers > 1 and len(jobs) > 1:
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            results = list(pool.map(fn, *zip(*jobs)))
+    else:
+        results = [fn(*job) for job in jobs]
+    if not results:
+        return np.empty((0, 0)), np.empty(0, dtype=int), 0.0, 0.0, 0
+    X = np.concatenate([r[0] for r in results])
+    y = np.concatenate([r[1] for r in results])
+    return X, y, sum(r[2] for r in results), sum(r[3] for r in results), sum(r[4] for r in results)
+
+
+def synthetic_samples(n_samples: int, seed: int = RANDOM_SEED, workers: int = 1) -> Chunk:
+    sizes = [min(CHUNK_SIZE, n_samples - i) for i in range(0, n_samples, CHUNK_SIZE)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    return _run_chunks(_synthetic_chunk, list(zip(seeds, sizes)), workers)
+
+
+def carrier_samples(
+    paths: Sequence[Path],
+    rates: Sequence[float] = DEFAULT_RATES,
+    seed: int = RANDOM_SEED,
+    workers: int = 1,
+) -> Chunk:
+    paths = [str(p) for p in paths]
+    groups = [paths[i : i + CARRIER_CHUNK_SIZE] for i in range(0, len(paths), CARRIER_CHUNK_SIZE)]
+    seeds = np.random.SeedSequence([seed, 1]).spawn(len(groups))
+    return _run_chunks(_carrier_chunk, [(s, g, tuple(rates)) for s, g in zip(seeds, groups)], workers)
+
+
+def fit_forest(
+    X: np.ndarray,
+    y: np.ndarray,
+    n_estimators: int = 50,
+    max_depth: Optional[int] = 5,
+    n_jobs: Optional[int] = None,
+) -> "RandomForestClassifier":
+    # scikit-learn takes about 1.5 s to import; only training and inference need it.
+    from sklearn.ensemble import RandomForestClassifier
+
+    clf = RandomForestClassifier(
+        n_estimators=n_estimators, max_depth=max_depth, random_state=RANDOM_SEED, n_jobs=n_jobs
+    )
+    clf.fit(X, y)
+    clf.set_params(n_jobs=None)
+    return clf
+
+
+def extend_forest(
+    model: "RandomForestClassifier",
+    X: np.ndarray,
+    y: np.ndarray,
+    extra_trees: int = 25,
+    n_jobs: Optional[int] = None,
+) -> "RandomForestClassifier":
+    # warm_start keeps the fitted trees and grows only the new ones, which
+    # see only the new batch.
+    model.set_params(warm_start=True, n_estimators=len(model.estimators_) + extra_trees, n_jobs=n_jobs)
+    model.fit(X, y)
+    model.set_params(warm_start=False, n_jobs=None)
+    return model
+
+
+def train_model(
+    n_synthetic: int = 100,
+    carriers: Sequence[Path] = (),
+    rates: Sequence[float] = DEFAULT_RATES,
+    n_estimators: int = 50,
+    max_depth: Optional[int] = 5,
+    workers: int = 1,
+    base: Optional["RandomForestClassifier"] = None,
+    seed: int = RANDOM_SEED,
+) -> Tuple["RandomForestClassifier", TrainingReport]:
+    """Build a dataset and fit a forest, or add ``n_estimators`` trees to ``base``.
+
+    Generation and feature seconds are summed across workers; fit and total
+    seconds are wall-clock. ``skipped`` counts carriers that could not be read.
+    """
+    t0 = time.perf_counter()
+    parts = [synthetic_samples(n_synthetic, seed, workers)] if n_synthetic else []
+    if carriers:
+        parts.append(carrier_samples(carriers, rates, seed, workers))
+    skipped = sum(p[4] for p in parts)
+    parts = [p for p in parts if p[1].size]
+    if not parts:
+        raise ValueError("Training set is empty.")
+    X = np.concatenate([p[0] for p in parts])
+    y = np.concatenate([p[1] for p in parts])
+
+    t_fit = time.perf_counter()
+    n_jobs = workers if workers > 1 else None
+    if base is None:
+        model = fit_forest(X, y, n_estimators, max_depth, n_jobs)
+    else:
+        model = extend_forest(base, X, y, n_estimators, n_jobs)
+    t_end = time.perf_counter()
+
+    report = TrainingReport(
+        samples=int(y.size),
+        generate_seconds=sum(p[2] for p in parts),
+        feature_seconds=sum(p[3] for p in parts),
+        fit_seconds=t_end - t_fit,
+        total_seconds=t_end - t0,
+        skipped=skipped,
+    )
+    return model, report
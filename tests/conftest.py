@@ -0,0 +1,90 @@
+import io
+from pathlib import Path
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from cipher_engine.stego import MEMORY_BUDGET_ENV
+
+
+def make_carrier(width: int = 96, height: int = 64, seed: int = 0) -> np.ndarray:
+    """A smooth gradient with a little noise, like a downscaled photo."""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width]
+    base = np.stack([x * 255 // width, y * 255 // height, (x + y) * 127 // (width + height)], axis=-1)
+    noise = rng.integers(-8, 9, base.shape)
+    return np.clip(base + noise, 0, 255).astype(np.uint8)
+
+
+def png_bytes(arr: np.ndarray) -> bytes:
+    buf = io.BytesIO()
+    Image.fromarray(arr).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def write_fields(flat: np.ndarray, start: int, data: bytes, bits: int) -> int:
+    """Reference writer: ``data`` as MSB-first ``bits``-bit fields in the low bits from ``start``."""
+    stream = np.unpackbits(np.frombuffer(data, dtype=np.uint8))
+    stream = np.r_[stream, np.zeros(-stream.size % bits, dtype=np.uint8)].reshape(-1, bits)
+    fields = (stream << np.arange(bits - 1, -1, -1, dtype=np.uint8)).sum(axis=1).astype(np.uint8)
+    mask = np.uint8((1 << bits) - 1)
+    end = start + fields.size
+    flat[start:end] = (flat[start:end] & ~mask) | fields
+    return end
+
+
+def forged_image(header: bytes, data: bytes, bits: int) -> Image.Image:
+    """A PNG holding ``header`` and ``data`` as given, even ones the embedders would refuse."""
+    arr = make_carrier()
+    flat = arr.reshape(-1)
+    offset = write_fields(flat, 0, header, 1)
+    write_fields(flat, offset, data, bits)
+    return Image.open(io.BytesIO(png_bytes(arr)))
+
+
+def smooth_cover(width: int = 600, height: int = 520, seed: int = 0) -> np.ndarray:
+    """Slowly varying colour with mild sensor noise, on which RS and SPA are unbiased."""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width]
+    base = np.stack([
+        128 + 60 * np.sin(x / 37) + 40 * np.cos(y / 23),
+        100 + 50 * np.sin((x + y) / 51),
+        90 + 70 * np.cos(x / 19 - y / 41),
+    ], axis=-1)
+    return np.clip(base + rng.normal(0, 3, base.shape), 0, 255).astype(np.uint8)
+
+
+def embed_at_rate(arr: np.ndarray, rate: float, seed: int = 1) -> np.ndarray:
+    """Replace the LSB of a random ``rate`` fraction of channels with random bits."""
+    rng = np.random.default_rng(seed)
+    out = arr.copy()
+    flat = out.reshape(-1)
+    chosen = rng.random(flat.size) < rate
+    flat[chosen] = (flat[chosen] & 0xFE) | rng.integers(0, 2, chosen.sum(), dtype=np.uint8)
+    return out
+
+
+@pytest.fixture
+def carrier() -> np.ndarray:
+    return make_carrier()
+
+
+@pytest.fixture(autouse=True)
+def _isolated_env(monkeypatch, tmp_path):
+    # Keep spans, models and memory limits from the developer's shell out of the tests.
+    monkeypatch.delenv(MEMORY_BUDGET_ENV, raising=False)
+    monkeypatch.delenv("CIPHER_ENGINE_SPANS_PATH", raising=False)
+    monkeypatch.setenv("CIPHER_ENGINE_MODEL_DIR", str(tmp_path / "models"))
+
+
+@pytest.fixture(scope="session")
+def model_path(tmp_path_factory) -> Path:
+    """A small forest saved once per session, for anything that loads the model."""
+    from cipher_engine.model import save_model
+    from cipher_engine.training import train_model
+
+    model, _ = train_model(n_synthetic=40, n_estimators=4)
+    path = tmp_path_factory.mktemp("model") / "steganalysis.joblib"
+    save_model(model, path)
+    return path
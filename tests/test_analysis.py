@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from cipher_engine.analysis import (
+    FEATURE_NAMES,
+    analyze_batch,
+    extract_features,
+    extract_features_batch,
+    prepare_for_analysis,
+    stego_probability,
+)
+from cipher_engine.detectors import DETECTOR_NAMES
+from cipher_engine.model import read_model
+
+from conftest import make_carrier
+
+
+def reference_features(arr: np.ndarray) -> np.ndarray:
+    """The per-image statistics as they were computed before batching."""
+    hist, _ = np.histogram(arr, bins=256, range=(0, 256))
+    probs = hist / hist.sum()
+    nonzero = probs[probs > 0]
+    return np.array([
+        np.mean(arr),
+        np.var(arr),
+        -np.sum(nonzero * np.log2(nonzero)),
+        np.var(arr & 1),
+        np.mean(np.abs(np.diff(arr.astype(float), axis=1))),
+    ])
+
+
+@pytest.fixture(scope="module")
+def model(model_path):
+    return read_model(model_path)
+
+
+@pytest.fixture
+def images():
+    return [Image.fromarray(make_carrier(80 + 8 * i, 64, seed=i)) for i in range(3)]
+
+
+def test_batch_features_match_the_per_image_statistics(images):
+    thumbs = np.stack([prepare_for_analysis(image) for image in images])
+    detectors = np.random.default_rng(0).random((len(images), len(DETECTOR_NAMES)))
+    features = extract_features_batch(thumbs, detectors)
+    assert features.shape == (len(images), len(FEATURE_NAMES))
+    for row, thumb, scores in zip(features, thumbs, detectors):
+        np.testing.assert_allclose(row[:5], reference_features(thumb), rtol=1e-9)
+        assert np.array_equal(row[5:], scores)
+
+
+def test_batch_scores_match_single_images(images, model):
+    result = analyze_batch(images, model, workers=2)
+    assert result.errors == [None] * len(images)
+    for image, features, probability in zip(images, result.features, result.probabilities):
+        np.testing.assert_allclose(features, extract_features(image)[0])
+        assert probability == pytest.approx(stego_probability(image, model))
+    assert result.images_per_second > 0
+
+
+def test_unreadable_files_are_reported_per_file(images, model, tmp_path):
+    paths = []
+    for i, image in enumerate(images):
+        paths.append(tmp_path / f"img{i}.png")
+        image.save(paths[-1])
+    (tmp_path / "img1.png").write_bytes(b"not a png")
+    result = analyze_batch(tmp_path, model)
+    assert [err is None for err in result.errors] == [True, False, True]
+    assert np.isnan(result.probabilities[1]) and np.isnan(result.features[1]).all()
+    assert not np.isnan(result.probabilities[[0, 2]]).any()
+
+
+def test_empty_batch(model):
+    result = analyze_batch([], model)
+    assert result.probabilities.shape == (0,) and result.errors == []
+    assert result.images_per_second == 0.0
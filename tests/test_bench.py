@@ -0,0 +1,79 @@
+import json
+
+import pytest
+
+from cipher_engine.bench import (
+    Case,
+    build_report,
+    carrier_size,
+    compare,
+    iter_benchmarks,
+    parse_payload,
+    plan_cases,
+)
+from cipher_engine.cli import main
+from cipher_engine.stego import payload_capacity
+
+
+def test_parse_payload():
+    assert [parse_payload(s) for s in ("10", "1K", "4m", " full ")] == [10, 1024, 4 << 20, None]
+
+
+def test_carrier_size_is_four_by_three():
+    w, h = carrier_size(12.0)
+    assert abs(w * h - 12e6) < 12e6 * 0.001
+    assert round(w / h, 2) == 1.33
+
+
+def test_plan_cases():
+    cases = plan_cases(sizes=(0.01,), payloads=("10", "1M", "full"))
+    names = [case.name for case in cases]
+    capacity = payload_capacity(carrier_size(0.01))
+    # text_to_binary has no carrier, so "full" means nothing to it; 1M does not fit 0.01 MP.
+    assert names[:3] == ["text_to_binary/10B", "text_to_binary/1MB", "embed_message/0.01MP/10B"]
+    assert "embed_message/0.01MP/1MB" not in names
+    assert Case("embed_message", 0.01, "full", capacity) in cases
+    assert "extract_features/0.01MP" in names and "import_cipher_engine" in names
+    with pytest.raises(ValueError, match="Unknown benchmark operation"):
+        plan_cases(ops=("nope",))
+
+
+def report(**cases):
+    return {"cases": {name: {"ok": True, **metrics} for name, metrics in cases.items()}}
+
+
+def test_compare_flags_growth_over_the_threshold():
+    baseline = report(a={"p50_ms": 10.0, "peak_rss_mb": 100.0}, b={"p50_ms": 10.0}, gone={"p50_ms": 1.0})
+    current = report(
+        a={"p50_ms": 13.0, "peak_rss_mb": 124.0}, b={"p50_ms": 12.0}, new={"p50_ms": 99.0}
+    )
+    (regression,) = compare(current, baseline, threshold=0.25)
+    assert (regression.case, regression.metric) == ("a", "p50_ms")
+    assert regression.change == pytest.approx(0.3)
+    assert compare(current, baseline, threshold=0.1)[-1].case == "b"
+
+
+def test_compare_skips_failed_cases():
+    baseline = report(a={"p50_ms": 10.0})
+    current = {"cases": {"a": {"ok": False, "error": "boom"}}}
+    assert compare(current, baseline) == []
+
+
+def test_cases_run_in_their_own_process():
+    cases = plan_cases(sizes=(0.01,), payloads=("10",), ops=("embed_message", "extract_message"))
+    records = list(iter_benchmarks(cases, repeats=2))
+    assert [r["case"] for r in records] == ["embed_message/0.01MP/10B", "extract_message/0.01MP/10B"]
+    assert all(r["ok"] and r["p50_ms"] > 0 and r["unit"] == "MB/s" for r in records)
+    assert set(build_report(records, 2)["cases"]) == {r["case"] for r in records}
+
+
+def test_baseline_gate_from_the_cli(tmp_path, capsys):
+    out = tmp_path / "report.json"
+    argv = ["bench", "--sizes", "0.01", "--payloads", "10", "--ops", "embed_message", "--repeats", "2"]
+    assert main([*argv, "-o", str(out)]) == 0
+    baseline = json.loads(out.read_text())
+    for record in baseline["cases"].values():
+        record["p50_ms"] /= 100
+    (tmp_path / "baseline.json").write_text(json.dumps(baseline))
+    assert main([*argv, "--baseline", str(tmp_path / "baseline.json")]) == 1
+    capsys.readouterr()
@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from cipher_engine.cache import CACHE_SIZE_ENV, ResultCache, cache_budget, content_key, estimate_size
+
+
+def test_least_recently_used_is_evicted_first():
+    cache = ResultCache(max_bytes=300)
+    for key in "abc":
+        cache.put(key, b"x" * 100)
+    assert cache.get("a") == b"x" * 100
+    cache.put("d", b"x" * 100)
+    assert "b" not in cache
+    assert [key in cache for key in "acd"] == [True, True, True]
+    assert cache.stats().evictions == 1
+
+
+def test_size_stays_within_the_bound():
+    cache = ResultCache(max_bytes=1000)
+    for i in range(20):
+        cache.put(i, np.zeros(i * 37, dtype=np.uint8))
+        assert cache.stats().size <= 1000
+    stats = cache.stats()
+    assert stats.size == sum(37 * i for i in range(20) if i in cache)
+
+
+def test_oversized_values_are_not_stored():
+    cache = ResultCache(max_bytes=100)
+    cache.put("small", b"x" * 50)
+    assert cache.put("big", b"x" * 101) is False
+    assert "big" not in cache and "small" in cache
+    assert cache.get_or_compute("big", lambda: b"y" * 200) == b"y" * 200
+    assert "big" not in cache
+
+
+def test_replacing_a_key_updates_the_size():
+    cache = ResultCache(max_bytes=100)
+    cache.put("k", b"x" * 60)
+    cache.put("k", b"x" * 30)
+    assert (len(cache), cache.stats().size) == (1, 30)
+
+
+def test_hits_and_misses_are_counted():
+    cache = ResultCache(max_bytes=1 << 20)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return "result"
+
+    assert [cache.get_or_compute("k", compute) for _ in range(3)] == ["result"] * 3
+    assert cache.get("missing") is None
+    stats = cache.stats()
+    assert (stats.hits, stats.misses, len(calls)) == (2, 2, 1)
+    cache.clear()
+    assert (len(cache), cache.stats().size) == (0, 0)
+
+
+def test_content_key():
+    assert content_key(b"data", "k", 1) == content_key(bytearray(b"data"), "k", 1)
+    assert content_key(b"data", "k") != content_key(b"data", "j")
+    # Lengths are part of the digest, so parts cannot run into each other.
+    assert content_key(b"ab", b"c") != content_key(b"a", b"bc")
+    assert content_key(b"1") != content_key(1)
+
+
+def test_estimate_size():
+    assert estimate_size(np.zeros((10, 10, 3), dtype=np.uint8)) == 300
+    assert estimate_size(Image.new("RGBA", (10, 10))) == 400
+    assert estimate_size({"a": b"x" * 1000}) > 1000
+
+
+@pytest.mark.parametrize("value, expected", [("1.5", 3 << 19), (None, 256 << 20)])
+def test_cache_budget(monkeypatch, value, expected):
+    if value is not None:
+        monkeypatch.setenv(CACHE_SIZE_ENV, value)
+    else:
+        monkeypatch.delenv(CACHE_SIZE_ENV, raising=False)
+    assert cache_budget() == expected
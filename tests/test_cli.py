@@ -0,0 +1,68 @@
+import json
+import shutil
+
+import pytest
+from PIL import Image
+
+from cipher_engine.cli import main
+from cipher_engine.model import default_model_path
+
+from conftest import make_carrier
+
+
+@pytest.fixture
+def images(tmp_path):
+    src = tmp_path / "src"
+    src.mkdir()
+    for i in range(2):
+        Image.fromarray(make_carrier(seed=i)).save(src / f"img{i}.png")
+    (src / "notes.txt").write_text("not an image")
+    return src
+
+
+def run(capsys, *argv):
+    code = main(["-j", "1", *map(str, argv)])
+    records = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    return code, sorted(records, key=lambda r: r["file"])
+
+
+def test_encode_and_decode_a_directory(images, tmp_path, capsys):
+    out = tmp_path / "out"
+    code, encoded = run(capsys, "encode", images, "-m", "batch secret", "-o", out, "--key", "k")
+    assert code == 0
+    assert [r["ok"] for r in encoded] == [True, True]
+    assert [r["output"] for r in encoded] == [str(out / "img0.png"), str(out / "img1.png")]
+    code, decoded = run(capsys, "decode", out, "--key", "k")
+    assert code == 0
+    assert [(r["found"], r["message"]) for r in decoded] == [(True, "batch secret")] * 2
+
+
+def test_binary_payloads_are_written_out(images, tmp_path, capsys):
+    payload = tmp_path / "payload.bin"
+    payload.write_bytes(bytes(range(256)) * 4)
+    run(capsys, "encode", images, "-f", payload, "-o", tmp_path / "out", "-k", 2)
+    code, decoded = run(capsys, "decode", tmp_path / "out", "-o", tmp_path / "bin")
+    assert code == 0
+    assert [r["bytes"] for r in decoded] == [1024, 1024]
+    assert (tmp_path / "bin" / "img0.bin").read_bytes() == payload.read_bytes()
+
+
+def test_analyze(images, model_path, capsys):
+    default_model_path().parent.mkdir(parents=True, exist_ok=True)
+    shutil.copy(model_path, default_model_path())
+    code, records = run(capsys, "analyze", images, "--batch-size", 1)
+    assert code == 0
+    assert len(records) == 2
+    assert all(0.0 <= r["probability"] <= 1.0 and r["detectors"] for r in records)
+
+
+def test_failures_are_reported_per_file(images, capsys):
+    (images / "broken.png").write_bytes(b"not a png")
+    code, records = run(capsys, "decode", images)
+    assert code == 1
+    assert [r["ok"] for r in records] == [False, True, True]
+    assert "error" in records[0]
+
+
+def test_missing_directory(tmp_path):
+    assert main(["decode", str(tmp_path / "nowhere")]) == 2
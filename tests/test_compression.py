@@ -0,0 +1,129 @@
+import bz2
+import io
+import os
+
+import pytest
+from PIL import Image
+
+from cipher_engine.compression import (
+    CODEC_BZ2,
+    CODEC_NAMES,
+    CODEC_NONE,
+    CODEC_ZLIB,
+    choose_codec,
+    compress_payload,
+    compress_stream,
+    decompress_payload,
+    iter_decompressed,
+)
+from cipher_engine.stego import (
+    FORMAT_BINARY,
+    MEMORY_BUDGET_ENV,
+    embed_message_inplace,
+    embed_stream_inplace,
+    extract_payload,
+    extract_stream,
+    pack_header,
+    read_header,
+)
+
+from conftest import forged_image, png_bytes
+
+
+def test_round_trip_with_the_smallest_codec():
+    data = b"the same words again and again " * 500
+    codec, packed = compress_payload(data)
+    assert codec != CODEC_NONE
+    assert len(packed) < len(data)
+    assert decompress_payload(codec, packed) == data
+
+
+def test_incompressible_data_is_stored_raw():
+    data = os.urandom(4096)
+    assert compress_payload(data) == (CODEC_NONE, data)
+    assert choose_codec(data) == (CODEC_NONE, 1.0)
+
+
+@pytest.mark.parametrize("codec", [c for c in CODEC_NAMES if c != CODEC_NONE])
+def test_stream_round_trip(codec):
+    data = os.urandom(1000) * 300
+    packed = io.BytesIO()
+    compress_stream(codec, io.BytesIO(data), len(data), packed, 1 << 14)
+    stored = packed.getvalue()
+    chunks = [stored[i : i + 997] for i in range(0, len(stored), 997)]
+    pieces = list(iter_decompressed(codec, chunks, 4096))
+    assert max(len(p) for p in pieces) <= 4096
+    assert b"".join(pieces) == data
+
+
+def test_max_length_stops_a_bomb():
+    bomb = bz2.compress(bytes(64 << 20))
+    assert len(bomb) < 100
+    with pytest.raises(ValueError, match="more than 1048576 bytes"):
+        decompress_payload(CODEC_BZ2, bomb, 1 << 20)
+    assert decompress_payload(CODEC_BZ2, bz2.compress(bytes(100)), 100) == bytes(100)
+    with pytest.raises(ValueError, match="more than 3 bytes"):
+        decompress_payload(CODEC_NONE, b"abcd", 3)
+
+
+def test_corrupt_and_truncated_payloads():
+    with pytest.raises(ValueError, match="Corrupt|Truncated"):
+        decompress_payload(CODEC_ZLIB, b"not zlib at all")
+    codec, packed = compress_payload(b"abc" * 1000)
+    with pytest.raises(ValueError, match="Truncated|Corrupt"):
+        decompress_payload(codec, packed[: len(packed) // 2])
+
+
+def reopen(arr) -> Image.Image:
+    return Image.open(io.BytesIO(png_bytes(arr)))
+
+
+def test_embedded_payloads_are_compressed(carrier):
+    text = "a compressible message " * 200
+    written = embed_message_inplace(carrier, text)
+    assert written.codec != CODEC_NONE
+    assert written.length < written.raw_length == len(text)
+    assert extract_payload(reopen(carrier)).data == text.encode("utf-8")
+
+
+def test_incompressible_payloads_are_stored_raw(carrier):
+    data = os.urandom(1000)
+    assert embed_message_inplace(carrier, data).codec == CODEC_NONE
+    assert extract_payload(reopen(carrier)).data == data
+
+
+@pytest.mark.parametrize("key", [None, "k"])
+def test_compressed_stream_round_trip(carrier, key):
+    data = b"abc" * 5000 + os.urandom(500)
+    written = embed_stream_inplace(carrier, io.BytesIO(data), key=key, chunk_size=512)
+    assert written.codec != CODEC_NONE and written.raw_length == len(data)
+    image = reopen(carrier)
+    assert read_header(image, key) == written
+    dest = io.BytesIO()
+    assert extract_stream(image, dest, chunk_size=512, key=key) == len(data)
+    assert dest.getvalue() == data
+
+
+def test_declared_length_bounds_decompression():
+    # A bz2 stream of 2 MB of zeros declaring only 1000 bytes must not be inflated.
+    data = bz2.compress(bytes(2 << 20))
+    header = pack_header(FORMAT_BINARY, len(data), 1, CODEC_BZ2, raw_length=1000)
+    image = forged_image(header, data, 1)
+    with pytest.raises(ValueError, match="more than 1000 bytes"):
+        extract_payload(image)
+    with pytest.raises(ValueError, match="more than 1000 bytes"):
+        extract_stream(image, io.BytesIO())
+
+
+def test_declared_length_over_budget(monkeypatch):
+    data = bz2.compress(bytes(2 << 20))
+    header = pack_header(FORMAT_BINARY, len(data), 1, CODEC_BZ2, raw_length=2 << 20)
+    image = forged_image(header, data, 1)
+    monkeypatch.setenv(MEMORY_BUDGET_ENV, "1")
+    with pytest.raises(ValueError, match="over the 1.0 MB memory budget"):
+        extract_payload(image)
+
+
+def test_stored_payloads_declare_their_own_length():
+    header = pack_header(FORMAT_BINARY, 4, 1, CODEC_NONE, raw_length=5)
+    assert read_header(forged_image(header, b"abcd", 1)) is None
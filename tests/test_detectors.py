@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from cipher_engine.detectors import (
+    TILE_SIZE,
+    batch_detector_scores,
+    chi_square_attack,
+    detector_scores,
+    rs_analysis,
+    sample_pair_analysis,
+)
+
+from conftest import embed_at_rate, smooth_cover
+
+
+@pytest.fixture(scope="module")
+def cover():
+    return smooth_cover()
+
+
+@pytest.mark.parametrize("rate", [0.0, 0.25, 0.5])
+@pytest.mark.parametrize("detector", [rs_analysis, sample_pair_analysis])
+def test_estimates_the_embedding_rate(cover, detector, rate):
+    assert detector(embed_at_rate(cover, rate)) == pytest.approx(rate, abs=0.05)
+
+
+def test_chi_square_flags_full_embedding(cover):
+    assert chi_square_attack(cover) < 0.05
+    assert chi_square_attack(embed_at_rate(cover, 1.0)) > 0.95
+
+
+def test_tiles_add_up_to_the_whole_image(cover):
+    stego = embed_at_rate(cover, 0.3)
+    assert stego.shape[0] > TILE_SIZE and stego.shape[1] > TILE_SIZE
+    whole = batch_detector_scores(stego[None])[0]
+    tiled = detector_scores(stego)
+    # Chi-square and RS counts are exact; SPA only loses the pairs straddling a tile edge.
+    np.testing.assert_allclose(tiled[:2], whole[:2])
+    assert tiled[2] == pytest.approx(whole[2], abs=1e-3)
+    assert np.array_equal(detector_scores(Image.fromarray(stego)), tiled)
+
+
+def test_batch_matches_single_images(cover):
+    batch = np.stack([embed_at_rate(cover[:64, 64 * i : 64 * (i + 1)], 0.1 * i) for i in range(9)])
+    scores = batch_detector_scores(batch)
+    for arr, row in zip(batch, scores):
+        np.testing.assert_allclose(row, detector_scores(arr))
+
+
+def test_degenerate_images_score_zero():
+    flat = np.full((8, 3, 3), 128, dtype=np.uint8)
+    assert rs_analysis(flat) == 0.0
+    assert chi_square_attack(flat) == 0.0
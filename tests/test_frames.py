@@ -0,0 +1,111 @@
+import io
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from cipher_engine.frames import (
+    analyze_frames,
+    embed_frames,
+    extract_frames,
+    frame_capacities,
+    is_animated,
+    probe_frames,
+    write_apng,
+)
+from cipher_engine.model import read_model
+
+from conftest import make_carrier, png_bytes
+
+FRAMES = 4
+
+
+@pytest.fixture
+def frames():
+    return [make_carrier(64, 48, seed=i) for i in range(FRAMES)]
+
+
+@pytest.fixture
+def gif(frames):
+    buf = io.BytesIO()
+    images = [Image.fromarray(f).quantize(256) for f in frames]
+    images[0].save(buf, format="GIF", save_all=True, append_images=images[1:], duration=80, loop=0)
+    return buf.getvalue()
+
+
+@pytest.fixture
+def apng(frames):
+    buf = io.BytesIO()
+    images = [Image.fromarray(f) for f in frames]
+    images[0].save(buf, format="PNG", save_all=True, append_images=images[1:], duration=50, loop=2)
+    return buf.getvalue()
+
+
+def read_frames(data: bytes):
+    with Image.open(io.BytesIO(data)) as img:
+        out = []
+        for i in range(img.n_frames):
+            img.seek(i)
+            out.append((np.array(img.convert("RGB")), img.info.get("duration")))
+        return out
+
+
+def test_write_apng(frames):
+    buf = io.BytesIO()
+    write_apng(buf, (png_bytes(f) for f in frames), [40, 50, 60, 70], FRAMES, loop=3)
+    decoded = read_frames(buf.getvalue())
+    assert [d for _, d in decoded] == [40, 50, 60, 70]
+    for (arr, _), frame in zip(decoded, frames):
+        assert np.array_equal(arr, frame)
+    assert probe_frames(buf.getvalue()).loop == 3
+
+
+def test_write_apng_rejects_mismatched_frames(frames):
+    pngs = [png_bytes(frames[0]), png_bytes(make_carrier(32, 32))]
+    with pytest.raises(ValueError, match="Frame 1"):
+        write_apng(io.BytesIO(), pngs, [100, 100], 2)
+
+
+def test_probe_and_capacity(apng, gif):
+    assert is_animated(apng) and is_animated(io.BytesIO(gif))
+    assert not is_animated(png_bytes(make_carrier()))
+    info = probe_frames(apng)
+    assert (info.frames, info.size, info.loop) == (FRAMES, (64, 48), 2)
+    assert len(frame_capacities(gif)) == FRAMES
+
+
+@pytest.mark.parametrize("source", ["apng", "gif"])
+def test_round_trip(source, request):
+    data = os.urandom(1500)
+    out = io.BytesIO()
+    shards = embed_frames(request.getfixturevalue(source), data, out, bits=2, key="k")
+    assert len(shards) == FRAMES
+    encoded = out.getvalue()
+    assert probe_frames(encoded).frames == FRAMES
+    result = extract_frames(encoded, key="k")
+    assert result.payload.data == data
+    assert result.missing == [] and result.corrupt == []
+
+
+def test_durations_survive(apng):
+    out = io.BytesIO()
+    embed_frames(apng, "timed", out)
+    assert [d for _, d in read_frames(out.getvalue())] == [50] * FRAMES
+
+
+def test_directory_of_frames(frames, tmp_path):
+    src = tmp_path / "src"
+    src.mkdir()
+    for i, frame in enumerate(frames):
+        Image.fromarray(frame).save(src / f"frame{i}.png")
+    out = tmp_path / "out"
+    embed_frames(str(src), "per frame " * 30, str(out), workers=2)
+    assert len(list(out.iterdir())) == FRAMES
+    assert extract_frames(str(out), workers=2).payload.data == ("per frame " * 30).encode("utf-8")
+
+
+def test_analyze_frames(apng, model_path):
+    result = analyze_frames(apng, read_model(model_path))
+    assert result.errors == [None] * FRAMES
+    assert ((result.probabilities >= 0) & (result.probabilities <= 1)).all()
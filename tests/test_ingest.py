@@ -0,0 +1,86 @@
+import threading
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from cipher_engine import ingest
+from cipher_engine.ingest import ImageHandle
+from cipher_engine.stego import MEMORY_BUDGET_ENV
+
+from conftest import png_bytes
+
+
+@pytest.fixture
+def handle(carrier):
+    return ImageHandle(png_bytes(carrier))
+
+
+def test_metadata_without_decoding(handle, carrier):
+    h, w, _ = carrier.shape
+    info = handle.info
+    assert (info.size, info.mode, info.format, info.frames) == ((w, h), "RGB", "PNG", 1)
+    assert handle.capacity(2) > handle.capacity(1) > 0
+    assert not handle.decoded
+    assert handle.open().size == (w, h)
+    assert not handle.decoded
+
+
+def test_pixels_decode_once(handle, carrier):
+    first = handle.pixels()
+    assert handle.decoded
+    assert handle.pixels() is first
+    assert not first.flags.writeable
+    assert np.array_equal(first, carrier)
+    assert np.array_equal(np.array(handle.rgb()), carrier)
+
+
+def test_idle_pixels_are_taken_over(handle, carrier):
+    handle.rgb()
+    assert handle.decoded
+    taken = handle.carrier()
+    assert taken.flags.writeable
+    assert not handle.decoded
+    taken[...] = 0
+    assert np.array_equal(handle.carrier(), carrier)
+
+
+def test_lent_pixels_are_copied(handle, carrier):
+    shared = handle.pixels()
+    own = handle.carrier()
+    assert not np.shares_memory(own, shared)
+    own[...] = 0
+    assert np.array_equal(shared, carrier)
+    assert handle.take() is None
+
+
+def test_copy_counts_against_the_budget(handle, monkeypatch):
+    handle.pixels()
+    monkeypatch.setenv(MEMORY_BUDGET_ENV, str(handle.info.working_set / 2**20))
+    with pytest.raises(ValueError, match="in use elsewhere"):
+        handle.carrier()
+
+
+def test_reader_on_another_thread_keeps_its_pixels(handle, carrier, monkeypatch):
+    # Hold a reader inside rgb() while another thread asks for a carrier.
+    inside, release = threading.Event(), threading.Event()
+    fromarray = Image.fromarray
+
+    def slow_fromarray(arr):
+        inside.set()
+        release.wait(10)
+        return fromarray(arr)
+
+    handle.rgb()
+    monkeypatch.setattr(ingest.Image, "fromarray", slow_fromarray)
+    result = {}
+    reader = threading.Thread(target=lambda: result.setdefault("rgb", handle.rgb()))
+    reader.start()
+    assert inside.wait(10)
+
+    own = handle.carrier()
+    own[...] = 255
+    release.set()
+    reader.join(10)
+    assert np.array_equal(np.array(result["rgb"]), carrier)
+    assert handle.decoded
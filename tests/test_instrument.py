@@ -0,0 +1,85 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from cipher_engine.instrument import (
+    SPANS_PATH_ENV,
+    progress,
+    propagate,
+    recording,
+    span,
+    write_spans,
+)
+from cipher_engine.stego import embed_message_inplace
+
+from conftest import make_carrier
+
+
+def test_nested_spans_record_self_time():
+    with recording("nested") as recorder:
+        with span("outer"):
+            time.sleep(0.02)
+            with span("inner"):
+                time.sleep(0.05)
+        with span("inner"):
+            pass
+    stages = {stage.name: stage for stage in recorder.stages()}
+    assert set(stages) == {"outer", "inner"}
+    assert stages["inner"].calls == 2
+    assert 0.015 < stages["outer"].seconds < 0.045
+    assert sum(s.seconds for s in stages.values()) <= recorder.seconds
+    assert recorder.untracked >= 0
+
+
+def test_spans_outside_a_recording_cost_nothing():
+    with span("ignored"):
+        progress(1, 2)
+
+
+def test_memory_peaks_are_traced():
+    with recording("memory", trace_memory=True) as recorder:
+        with span("alloc"):
+            np.ones(4 << 20, dtype=np.uint8)
+    (stage,) = recorder.stages()
+    assert stage.peak_bytes >= 4 << 20
+
+
+def test_progress_is_visible_from_another_thread():
+    seen = []
+    with recording("progress") as recorder:
+        progress(3, 4, "rows")
+        reader = threading.Thread(target=lambda: seen.append(recorder.progress))
+        reader.start()
+        reader.join()
+    assert seen[0].fraction == 0.75 and seen[0].unit == "rows"
+
+
+def test_pool_threads_record_into_the_callers_recording():
+    def work(_):
+        with span("work"):
+            pass
+
+    with recording("pool") as recorder:
+        with ThreadPoolExecutor(2) as pool:
+            list(pool.map(propagate(work), range(4)))
+    assert [(s.name, s.calls) for s in recorder.stages()] == [("work", 4)]
+
+
+def test_spans_are_written_as_json_lines(tmp_path, monkeypatch):
+    with recording("embed") as recorder:
+        embed_message_inplace(make_carrier(), "spans")
+    assert write_spans(recorder) is None
+    path = tmp_path / "spans.jsonl"
+    monkeypatch.setenv(SPANS_PATH_ENV, str(path))
+    write_spans(recorder)
+    write_spans(recorder)
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert len(records) == 2 * len(recorder.stages())
+    assert {r["stage"] for r in records} >= {"compress"}
+    assert all(r["run"] == recorder.run_id and r["label"] == "embed" for r in records)
+    assert set(records[0]) == {
+        "run", "label", "started", "wall_seconds", "stage", "seconds", "calls", "peak_bytes",
+    }
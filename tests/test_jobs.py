@@ -0,0 +1,88 @@
+import threading
+
+import pytest
+
+from cipher_engine.instrument import progress, span
+from cipher_engine.jobs import DONE, FAILED, QUEUED, RUNNING, JobQueue
+
+
+@pytest.fixture
+def queue():
+    queue = JobQueue(workers=1)
+    yield queue
+    queue.shutdown()
+
+
+def wait(job, timeout=10.0):
+    for _ in range(int(timeout / 0.01)):
+        if job.done:
+            return job
+        threading.Event().wait(0.01)
+    raise AssertionError(f"job {job.label} did not finish")
+
+
+def test_result_and_stages(queue):
+    def work(x):
+        with span("work"):
+            progress(1, 2, "steps")
+            return x * 2
+
+    job = wait(queue.submit("double", work, 21, meta={"tab": "encode"}))
+    assert job.state == DONE
+    assert job.result == 42 and job.error is None
+    assert job.meta == {"tab": "encode"}
+    assert [stage.name for stage in job.recorder.stages()] == ["work"]
+    assert job.progress.fraction == 0.5
+    assert queue.get(job.id) is job
+
+
+def test_failure_is_kept(queue):
+    def fail():
+        raise ValueError("nope")
+
+    job = wait(queue.submit("fail", fail))
+    assert job.state == FAILED
+    assert isinstance(job.error, ValueError)
+
+
+def test_jobs_wait_for_a_worker(queue):
+    release = threading.Event()
+    first = queue.submit("first", release.wait, 10)
+    second = queue.submit("second", lambda: "ran")
+    for _ in range(1000):
+        if first.state == RUNNING:
+            break
+        threading.Event().wait(0.01)
+    assert (first.state, second.state) == (RUNNING, QUEUED)
+    stats = queue.stats()
+    assert (stats.workers, stats.queued, stats.running) == (1, 1, 1)
+    release.set()
+    assert wait(second).result == "ran"
+
+
+def test_unwritable_spans_still_finish(queue, tmp_path, monkeypatch):
+    monkeypatch.setenv("CIPHER_ENGINE_SPANS_PATH", str(tmp_path / "missing" / "dir" / "spans.jsonl"))
+    (tmp_path / "missing").write_text("a file where a directory should be")
+    job = wait(queue.submit("spans", lambda: 1))
+    assert job.state == DONE and job.spans_path is None
+
+
+def test_finished_jobs_are_evicted():
+    queue = JobQueue(workers=1, keep=2)
+    try:
+        jobs = [wait(queue.submit(f"job{i}", lambda i=i: i)) for i in range(4)]
+        assert [queue.get(job.id) for job in jobs] == [None, None, jobs[2], jobs[3]]
+        assert queue.stats().finished == 2
+    finally:
+        queue.shutdown()
+
+
+def test_newest_job_survives_the_byte_budget():
+    queue = JobQueue(workers=1, max_bytes=10)
+    try:
+        old = wait(queue.submit("old", bytes, 100))
+        new = wait(queue.submit("new", bytes, 100))
+        assert queue.get(old.id) is None
+        assert queue.get(new.id) is new
+    finally:
+        queue.shutdown()
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from cipher_engine.detectors import detector_scores, window_detector_scores
+from cipher_engine.localization import cell_thumbnails, heatmap_overlay, localize
+from cipher_engine.model import read_model
+
+from conftest import embed_at_rate, smooth_cover
+
+GRID = (4, 4)
+
+
+@pytest.fixture(scope="module")
+def stego():
+    # Cells are 500x200: narrower than a tile, and taller than one band of a grid row.
+    arr = smooth_cover(2000, 800)
+    arr[200:400, 1000:1500] = embed_at_rate(arr[200:400, 1000:1500], 0.5)
+    return arr
+
+
+def test_window_scores_match_each_cell(stego):
+    scores = window_detector_scores(stego, GRID)
+    assert scores.shape == (*GRID, 3)
+    for r in range(GRID[0]):
+        for c in range(GRID[1]):
+            cell = stego[r * 200 : (r + 1) * 200, c * 500 : (c + 1) * 500]
+            np.testing.assert_allclose(scores[r, c], detector_scores(cell))
+
+
+def test_the_embedded_cell_stands_out(stego):
+    rs = window_detector_scores(stego, GRID)[..., 1]
+    assert np.unravel_index(np.argmax(rs), GRID) == (1, 2)
+    assert rs[1, 2] == pytest.approx(0.5, abs=0.1)
+
+
+def test_cell_thumbnails_follow_the_grid():
+    colours = np.arange(GRID[0] * GRID[1] * 3, dtype=np.uint8).reshape(*GRID, 3) * 5
+    image = Image.fromarray(np.repeat(np.repeat(colours, 300, axis=0), 300, axis=1))
+    thumbs = cell_thumbnails(image, GRID)
+    assert thumbs.shape == (GRID[0] * GRID[1], 128, 128, 3)
+    assert np.array_equal(thumbs[:, 64, 64], colours.reshape(-1, 3))
+
+
+def test_localize(stego, model_path):
+    result = localize(Image.fromarray(stego), read_model(model_path), GRID, top_k=3)
+    assert result.probabilities.shape == GRID
+    assert result.cell_size == (500, 200)
+    probs = [region.probability for region in result.regions]
+    assert len(probs) == 3 and probs == sorted(probs, reverse=True)
+    top = result.regions[0]
+    assert top.box == (top.col * 500, top.row * 200, (top.col + 1) * 500, (top.row + 1) * 200)
+    assert heatmap_overlay(Image.fromarray(stego), result, max_side=400).size == (400, 160)
+
+
+def test_grid_larger_than_the_image():
+    with pytest.raises(ValueError, match="too small"):
+        window_detector_scores(np.zeros((3, 3, 3), dtype=np.uint8), GRID)
@@ -0,0 +1,72 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import joblib
+
+from cipher_engine import model as model_module
+from cipher_engine.model import (
+    FEATURE_SCHEMA,
+    MODEL_VERSION,
+    feature_schema_hash,
+    load_steganalysis_model,
+    read_model,
+    save_model,
+    warm_up,
+)
+
+
+def test_schema_hash_follows_the_schema(monkeypatch):
+    current = feature_schema_hash()
+    assert len(current) == 16
+    monkeypatch.setitem(FEATURE_SCHEMA, "version", FEATURE_SCHEMA["version"] + 1)
+    feature_schema_hash.cache_clear()
+    try:
+        assert feature_schema_hash() != current
+    finally:
+        monkeypatch.undo()
+        feature_schema_hash.cache_clear()
+    assert feature_schema_hash() == current
+
+
+def test_save_and_read(model_path, tmp_path):
+    model = read_model(model_path)
+    assert model is not None
+    path = tmp_path / "copy.joblib"
+    save_model(model, path)
+    assert read_model(path) is not None
+    assert load_steganalysis_model(path) is load_steganalysis_model(path)
+
+
+def test_stale_artifacts_are_ignored(model_path, tmp_path):
+    model = read_model(model_path)
+    for version, schema in ((MODEL_VERSION + 1, feature_schema_hash()), (MODEL_VERSION, "0" * 16)):
+        path = tmp_path / f"{version}-{schema}.joblib"
+        joblib.dump({"version": version, "schema": schema, "model": model}, path)
+        assert read_model(path) is None
+    assert read_model(tmp_path / "missing.joblib") is None
+
+
+def test_import_defers_the_heavy_dependencies():
+    code = (
+        "import sys, cipher_engine\n"
+        "print(sorted({m.split('.')[0] for m in sys.modules} & {'sklearn', 'scipy', 'joblib'}))"
+    )
+    root = Path(__file__).resolve().parents[1]
+    out = subprocess.run(
+        [sys.executable, "-c", code], cwd=root, capture_output=True, text=True, check=True
+    )
+    assert out.stdout.strip() == "[]"
+
+
+def test_missing_model_is_trained_on_first_use(model_path, tmp_path, monkeypatch):
+    trained = []
+    monkeypatch.setattr(
+        model_module, "train_steganalysis_model", lambda: trained.append(1) or read_model(model_path)
+    )
+    path = tmp_path / "fresh.joblib"
+    thread = warm_up(path)
+    thread.join()
+    assert path.exists() and read_model(path) is not None
+    assert load_steganalysis_model(path) is load_steganalysis_model(path)
+    assert trained == [1]
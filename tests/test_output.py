@@ -0,0 +1,48 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from cipher_engine.output import (
+    DEFAULT_OUTPUT,
+    OUTPUT_FORMATS,
+    available_outputs,
+    encode_output,
+    output_format,
+    save_output,
+)
+from cipher_engine.stego import embed_message_inplace, extract_message
+
+
+@pytest.mark.parametrize("output", list(OUTPUT_FORMATS))
+@pytest.mark.parametrize("key", [None, "k"])
+def test_outputs_keep_the_payload(carrier, output, key):
+    if output not in available_outputs():
+        pytest.skip(f"this Pillow build cannot write {output}")
+    embed_message_inplace(carrier, "survives " * 20, bits=2, key=key)
+    data = encode_output(Image.fromarray(carrier), output)
+    with Image.open(io.BytesIO(data)) as image:
+        assert image.format == OUTPUT_FORMATS[output].format
+        assert Image.MIME[image.format] == OUTPUT_FORMATS[output].mime
+        assert np.array_equal(np.asarray(image.convert("RGB")), carrier)
+        assert extract_message(image, key) == "survives " * 20
+
+
+def test_save_output_to_a_path(carrier, tmp_path):
+    fmt = output_format(DEFAULT_OUTPUT)
+    path = tmp_path / f"out.{fmt.extension}"
+    save_output(Image.fromarray(carrier), path)
+    assert np.array_equal(np.asarray(Image.open(path)), carrier)
+
+
+def test_png_levels_trade_size():
+    image = Image.fromarray(np.tile(np.arange(256, dtype=np.uint8), (64, 3)).reshape(64, 256, 3))
+    sizes = [len(encode_output(image, name)) for name in ("none", "fast", "smallest")]
+    assert sizes == sorted(sizes, reverse=True)
+
+
+def test_unknown_output():
+    assert available_outputs()[:4] == ["none", "fast", "balanced", "smallest"]
+    with pytest.raises(ValueError, match="Unknown output format 'jpeg'"):
+        output_format("jpeg")
@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from cipher_engine.scatter import BLOCK_SIZE, ScatterKey
+
+
+@pytest.mark.parametrize("n", [2, 3, 100, 4097, 3 * 640 * 480])
+def test_positions_are_a_permutation(n):
+    positions = ScatterKey("key", n).positions(0, n)
+    assert np.array_equal(np.sort(positions), np.arange(n))
+
+
+def test_runs_match_the_full_permutation():
+    n = BLOCK_SIZE + 12345
+    scatter = ScatterKey(b"key", n)
+    full = scatter.positions(0, n)
+    assert np.array_equal(scatter.positions(1000, 1500), full[1000:1500])
+    edge = slice(BLOCK_SIZE - 7, BLOCK_SIZE + 7)
+    assert np.array_equal(scatter.positions(edge.start, edge.stop), full[edge])
+    assert scatter.positions(10, 10).size == 0
+
+
+def test_key_decides_the_order():
+    n = 10_000
+    first = ScatterKey("alpha", n).positions(0, n)
+    assert np.array_equal(first, ScatterKey("alpha", n).positions(0, n))
+    assert np.array_equal(first, ScatterKey(b"alpha", n).positions(0, n))
+    assert not np.array_equal(first, ScatterKey("beta", n).positions(0, n))
+    assert not np.array_equal(first, np.arange(n))
+
+
+def test_wide_carriers_use_64_bit_words():
+    n = (1 << 32) + 5
+    scatter = ScatterKey("key", n)
+    assert scatter.dtype == np.uint64
+    positions = scatter.positions(n - 100, n)
+    assert ((positions >= 0) & (positions < n)).all()
+    assert np.unique(positions).size == positions.size
@@ -0,0 +1,115 @@
+import asyncio
+import base64
+import http.client
+import json
+import threading
+
+import pytest
+
+from cipher_engine.server import ApiServer, _run
+from cipher_engine.stego import MEMORY_BUDGET_ENV
+
+from conftest import make_carrier, png_bytes
+
+MAX_BODY = 1 << 20
+
+
+@pytest.fixture(scope="module")
+def port(model_path):
+    server = ApiServer(workers=1, max_body=MAX_BODY, model_path=model_path)
+    loop = asyncio.new_event_loop()
+    listener = loop.run_until_complete(server.start("127.0.0.1", 0))
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    yield listener.sockets[0].getsockname()[1]
+    asyncio.run_coroutine_threadsafe(shutdown(server), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.close()
+
+
+async def shutdown(server: ApiServer) -> None:
+    # Let connections still discarding a refused body finish before the loop stops.
+    handlers = asyncio.all_tasks() - {asyncio.current_task()}
+    if handlers:
+        await asyncio.wait(handlers, timeout=10)
+    await server.close()
+
+
+def call(port, method, route, body=None):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    try:
+        data = body if isinstance(body, (bytes, type(None))) else json.dumps(body).encode("utf-8")
+        conn.request(method, route, body=data)
+        response = conn.getresponse()
+        return response.status, json.loads(response.read())
+    finally:
+        conn.close()
+
+
+def b64(data: bytes) -> str:
+    return base64.b64encode(data).decode("ascii")
+
+
+def test_health(port):
+    status, record = call(port, "GET", "/health")
+    assert status == 200
+    assert record["status"] == "ok" and record["workers"] == 1
+
+
+def test_text_round_trip(port):
+    request = {"image": b64(png_bytes(make_carrier())), "message": "over http", "key": "k"}
+    status, encoded = call(port, "POST", "/encode", request)
+    assert status == 200, encoded
+    assert encoded["mime"] == "image/png"
+    status, decoded = call(port, "POST", "/decode", {"image": encoded["image"], "key": "k"})
+    assert status == 200
+    assert decoded["found"] and decoded["format"] == "text" and decoded["message"] == "over http"
+
+
+def test_binary_round_trip(port):
+    data = bytes(range(256)) * 8
+    request = {"image": b64(png_bytes(make_carrier())), "data": b64(data), "bits": 2}
+    _, encoded = call(port, "POST", "/encode", request)
+    _, decoded = call(port, "POST", "/decode", {"image": encoded["image"]})
+    assert decoded["format"] == "binary"
+    assert base64.b64decode(decoded["data"]) == data
+
+
+def test_unmarked_image(port):
+    status, record = call(port, "POST", "/decode", {"image": b64(png_bytes(make_carrier()))})
+    assert status == 200 and record["found"] is False
+
+
+def test_analyze(port):
+    status, record = call(port, "POST", "/analyze", {"image": b64(png_bytes(make_carrier()))})
+    assert status == 200, record
+    assert 0.0 <= record["probability"] <= 1.0
+    assert record["detectors"]
+
+
+@pytest.mark.parametrize(
+    "method, route, body, status",
+    [
+        ("POST", "/encode", b"not json", 400),
+        ("POST", "/encode", {"image": "!!!", "message": "x"}, 400),
+        ("POST", "/decode", {}, 400),
+        ("POST", "/nowhere", {}, 404),
+        ("GET", "/encode", None, 405),
+        ("POST", "/decode", b"x" * (MAX_BODY + 1), 413),
+    ],
+)
+def test_errors(port, method, route, body, status):
+    got, record = call(port, method, route, body)
+    assert got == status
+    assert "error" in record
+
+
+@pytest.mark.parametrize("route, key", [("encode", None), ("decode", "k"), ("analyze", None)])
+def test_over_memory_budget(monkeypatch, route, key):
+    # Run the handler in-process, where the budget from the environment applies.
+    monkeypatch.setenv(MEMORY_BUDGET_ENV, "0.001")
+    body = json.dumps({"image": b64(png_bytes(make_carrier())), "message": "x", "key": key})
+    status, record = _run(route, body.encode("utf-8"))
+    assert status == 413
+    assert "MemoryBudgetError" in json.loads(record)["error"]
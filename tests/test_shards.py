@@ -0,0 +1,97 @@
+import bz2
+import hashlib
+import io
+import os
+import zlib
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from cipher_engine.compression import CODEC_BZ2
+from cipher_engine.shards import (
+    SHARD_HEADER,
+    embed_shards,
+    extract_shards,
+    plan_shards,
+    shard_capacity,
+)
+from cipher_engine.stego import FORMAT_BINARY, FORMAT_SHARD, FORMAT_TEXT, _embed_bytes
+
+from conftest import make_carrier, png_bytes
+
+
+@pytest.fixture
+def carriers():
+    return [png_bytes(make_carrier(96 - 8 * i, 64, seed=i)) for i in range(4)]
+
+
+def test_plan_shards():
+    assert plan_shards([10, 30, 60], 50) == [5, 15, 30]
+    sizes = plan_shards([7, 3, 11], 20)
+    assert sum(sizes) == 20
+    assert all(size <= cap for size, cap in zip(sizes, [7, 3, 11]))
+    with pytest.raises(ValueError, match="exceeds"):
+        plan_shards([1, 2], 4)
+
+
+def test_round_trip_in_any_order(carriers):
+    data = os.urandom(3000)
+    shards = embed_shards(carriers, data, bits=2)
+    assert [s.index for s in shards] == [0, 1, 2, 3]
+    assert sum(s.length for s in shards) == len(data)
+    result = extract_shards([shards[i].png for i in (2, 0, 3, 1)])
+    assert result.payload.format == FORMAT_BINARY
+    assert result.payload.data == data
+    assert (result.count, result.found, result.missing, result.corrupt) == (4, [0, 1, 2, 3], [], [])
+
+
+def test_keyed_text_to_files(carriers, tmp_path):
+    outputs = [tmp_path / f"shard{i}.png" for i in range(len(carriers))]
+    embed_shards(carriers, "spread thin " * 50, key="k", outputs=outputs)
+    result = extract_shards(outputs, key="k")
+    assert result.payload.format == FORMAT_TEXT
+    assert result.payload.data == ("spread thin " * 50).encode("utf-8")
+    assert extract_shards(outputs, key="wrong").payload is None
+
+
+def test_missing_and_foreign_shards(carriers):
+    shards = embed_shards(carriers, os.urandom(2000))
+    other = embed_shards(carriers[:2], b"another set")
+    result = extract_shards([shards[0].png, shards[2].png, other[0].png, carriers[3]])
+    assert result.payload is None
+    assert result.missing == [1, 3]
+    assert [pos for pos, _ in result.corrupt] == [2, 3]
+
+
+def test_tampered_shard(carriers):
+    shards = embed_shards(carriers, os.urandom(2000), compress=False)
+    arr = np.array(Image.open(io.BytesIO(shards[1].png)))
+    arr.reshape(-1)[400:800] ^= 1
+    result = extract_shards([shards[0].png, png_bytes(arr), shards[2].png, shards[3].png])
+    assert result.payload is None
+    assert result.corrupt and result.corrupt[0][0] == 1
+
+
+def test_capacity_is_checked(carriers):
+    total = sum(shard_capacity(c) for c in carriers)
+    with pytest.raises(ValueError, match="capacity"):
+        embed_shards(carriers, os.urandom(total + 1), compress=False)
+
+
+def test_worker_processes(carriers):
+    data = os.urandom(2500)
+    shards = embed_shards(carriers, data, workers=2)
+    assert extract_shards([s.png for s in shards], workers=2).payload.data == data
+
+
+def test_declared_length_bounds_reassembly():
+    stored = bz2.compress(bytes(4 << 20))
+    digest = hashlib.blake2b(stored, digest_size=16).digest()
+    crc = zlib.crc32(stored)
+    header = SHARD_HEADER.pack(digest, 0, 1, FORMAT_BINARY, CODEC_BZ2, len(stored), 1000, crc)
+    carrier = make_carrier()
+    _embed_bytes(carrier, FORMAT_SHARD, header + stored, 1, None)
+    result = extract_shards([carrier])
+    assert result.payload is None
+    assert result.corrupt == [(-1, "Payload decompresses to more than 1000 bytes.")]
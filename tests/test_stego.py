@@ -0,0 +1,274 @@
+import io
+import os
+import struct
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from cipher_engine.compression import CODEC_NONE
+from cipher_engine.stego import (
+    FORMAT_BINARY,
+    FORMAT_TEXT,
+    HEADER_SIZE,
+    HEADER_VERSION,
+    MAGIC,
+    MAX_BITS,
+    MEMORY_BUDGET_ENV,
+    NO_MESSAGE,
+    MemoryBudgetError,
+    binary_to_text,
+    embed_message,
+    embed_message_inplace,
+    embed_stream_inplace,
+    extract_file,
+    extract_message,
+    extract_payload,
+    extract_stream,
+    load_carrier,
+    locate,
+    pack_header,
+    payload_capacity,
+    read_header,
+    text_to_binary,
+)
+from cipher_engine import stego
+from cipher_engine.stego import _leading_rows
+
+from conftest import forged_image, make_carrier, png_bytes, write_fields
+
+
+def reopen(arr: np.ndarray) -> Image.Image:
+    return Image.open(io.BytesIO(png_bytes(arr)))
+
+
+def test_text_round_trip(carrier):
+    message = "héllo, wörld " * 20
+    written = embed_message_inplace(carrier, message, compress=False)
+    image = reopen(carrier)
+    assert extract_message(image) == message
+    header = read_header(image)
+    assert header == written
+    assert (header.version, header.format, header.bits) == (HEADER_VERSION, FORMAT_TEXT, 1)
+    assert header.length == header.raw_length == len(message.encode("utf-8"))
+
+
+def test_binary_round_trip(carrier):
+    data = os.urandom(900) + bytes(900)
+    embed_message_inplace(carrier, data, compress=False)
+    payload = extract_payload(reopen(carrier))
+    assert payload.format == FORMAT_BINARY
+    assert payload.data == data
+
+
+def test_embed_message_leaves_the_image_untouched(carrier):
+    image = Image.fromarray(carrier)
+    encoded = embed_message(image, "hidden")
+    assert np.array_equal(np.array(image), carrier)
+    assert extract_message(encoded) == "hidden"
+
+
+def test_stream_round_trip(carrier, tmp_path):
+    data = os.urandom(2000)
+    written = embed_stream_inplace(carrier, io.BytesIO(data), chunk_size=512, compress=False)
+    assert written.format == FORMAT_BINARY and written.length == len(data)
+    image = reopen(carrier)
+    dest = io.BytesIO()
+    assert extract_stream(image, dest, chunk_size=512) == len(data)
+    assert dest.getvalue() == data
+    out = tmp_path / "payload.bin"
+    assert extract_file(image, out) == len(data)
+    assert out.read_bytes() == data
+
+
+def test_stream_reads_only_length_bytes(carrier):
+    source = io.BytesIO(b"x" * 100 + b"rest")
+    embed_stream_inplace(carrier, source, length=100, compress=False)
+    assert source.tell() == 100
+    assert extract_payload(reopen(carrier)).data == b"x" * 100
+
+
+def test_short_stream(carrier):
+    with pytest.raises(ValueError, match="ended 10 bytes short"):
+        embed_stream_inplace(carrier, io.BytesIO(bytes(90)), length=100, compress=False)
+
+
+def test_nothing_is_written_for_an_unmarked_image(carrier, tmp_path):
+    assert extract_file(reopen(carrier), tmp_path / "out.bin") is None
+    assert not (tmp_path / "out.bin").exists()
+
+
+def test_unmarked_image(carrier):
+    image = reopen(carrier)
+    assert read_header(image) is None
+    assert extract_payload(image) is None
+    assert extract_message(image) == NO_MESSAGE
+
+
+@pytest.mark.parametrize("rows", [1, 5, 64, 100])
+def test_leading_rows_match_a_full_decode(rows):
+    arr = make_carrier(width=97, seed=3)
+    image = reopen(arr)
+    partial = _leading_rows(image, rows)
+    assert image.tile, "the source image should still be undecoded"
+    assert np.array_equal(partial, arr[:rows])
+    assert np.array_equal(np.asarray(image), arr)
+
+
+def test_leading_rows_of_other_images(carrier):
+    buf = io.BytesIO()
+    Image.fromarray(carrier).save(buf, format="PNG", optimize=True, interlace=1)
+    assert np.array_equal(_leading_rows(Image.open(buf), 3), carrier[:3])
+    loaded = Image.fromarray(carrier)
+    assert np.array_equal(_leading_rows(loaded, 3), carrier[:3])
+
+
+def test_embedding_writes_into_the_carrier(carrier):
+    original = carrier.copy()
+    embed_message_inplace(carrier, "in place")
+    assert not np.array_equal(carrier, original)
+    assert extract_message(Image.fromarray(carrier)) == "in place"
+    with pytest.raises(ValueError, match="C-contiguous"):
+        embed_message_inplace(np.asfortranarray(original), "lost")
+
+
+def test_load_carrier(tmp_path, carrier, monkeypatch):
+    path = tmp_path / "carrier.png"
+    Image.fromarray(carrier).convert("RGBA").save(path)
+    # Small bands, so the destination is filled in several pieces.
+    monkeypatch.setattr(stego, "_BAND_BYTES", carrier.shape[1] * 3 * 5)
+    loaded = load_carrier(path)
+    assert loaded.flags.writeable and loaded.flags.c_contiguous
+    assert np.array_equal(loaded, carrier)
+
+
+def test_load_carrier_memory_budget(tmp_path, carrier, monkeypatch):
+    path = tmp_path / "carrier.png"
+    Image.fromarray(carrier).save(path)
+    monkeypatch.setenv(MEMORY_BUDGET_ENV, "0.001")
+    with pytest.raises(MemoryBudgetError, match="over the 0.0 MB budget"):
+        load_carrier(path)
+    assert load_carrier(path, budget=1 << 20).shape == carrier.shape
+
+
+def test_capacity(carrier):
+    h, w, _ = carrier.shape
+    capacity = payload_capacity((w, h))
+    assert capacity == (w * h * 3 - HEADER_SIZE * 8) // 8
+    embed_message_inplace(carrier, bytes(capacity), compress=False)
+    with pytest.raises(ValueError, match="exceeds image capacity"):
+        embed_message_inplace(carrier, bytes(capacity + 1), compress=False)
+
+
+def test_carrier_too_small_for_header():
+    with pytest.raises(ValueError, match="too small for the"):
+        embed_message_inplace(np.zeros((2, 2, 3), dtype=np.uint8), b"")
+
+
+def test_binary_text_helpers():
+    assert text_to_binary("A") == "01000001"
+    assert binary_to_text(text_to_binary("héllo") + "101") == "héllo"
+
+
+@pytest.mark.parametrize("version", [3, 99])
+def test_other_header_versions_are_not_payloads(version):
+    header = struct.pack(">2sBBBBII", MAGIC, version, FORMAT_TEXT, 1, CODEC_NONE, 4, 4)
+    image = forged_image(header, b"nope", 1)
+    assert read_header(image) is None
+    assert extract_message(image) == NO_MESSAGE
+
+
+def test_length_over_capacity_is_not_a_payload():
+    header = struct.pack(">2sBBBBII", MAGIC, HEADER_VERSION, FORMAT_BINARY, 1, CODEC_NONE, 10**6, 10**6)
+    assert read_header(forged_image(header, b"", 1)) is None
+
+
+@pytest.mark.parametrize("bits", range(1, MAX_BITS + 1))
+def test_k_bit_round_trip(carrier, bits):
+    message = "héllo, wörld " * 20
+    written = embed_message_inplace(carrier, message, bits, compress=False)
+    assert written.bits == bits
+    image = reopen(carrier)
+    assert extract_message(image) == message
+    assert read_header(image) == written
+
+
+@pytest.mark.parametrize("bits", range(1, MAX_BITS + 1))
+def test_k_bit_fields_match_the_reference_writer(carrier, bits):
+    data = os.urandom(500)
+    expected = carrier.copy()
+    flat = expected.reshape(-1)
+    offset = write_fields(flat, 0, pack_header(FORMAT_BINARY, len(data), bits), 1)
+    write_fields(flat, offset, data, bits)
+    embed_message_inplace(carrier, data, bits, compress=False)
+    assert np.array_equal(carrier, expected)
+
+
+def test_only_low_bits_change(carrier):
+    original = carrier.copy()
+    embed_message_inplace(carrier, os.urandom(2000), bits=2, compress=False)
+    assert not ((original ^ carrier) & 0xFC).any()
+
+
+def test_k_bit_capacity(carrier):
+    h, w, _ = carrier.shape
+    capacity = payload_capacity((w, h), bits=3)
+    assert capacity == (w * h * 3 - HEADER_SIZE * 8) * 3 // 8
+    embed_message_inplace(carrier, bytes(capacity), 3, compress=False)
+    with pytest.raises(ValueError, match="exceeds image capacity"):
+        embed_message_inplace(carrier, bytes(capacity + 1), 3, compress=False)
+
+
+@pytest.mark.parametrize("bits", [0, MAX_BITS + 1])
+def test_bits_out_of_range(carrier, bits):
+    with pytest.raises(ValueError, match="Bits per channel"):
+        embed_message_inplace(carrier, "x", bits)
+
+
+@pytest.mark.parametrize("bits", [1, 3])
+def test_keyed_round_trip(carrier, bits):
+    message = "scattered " * 30
+    written = embed_message_inplace(carrier, message, bits, "correct horse")
+    image = reopen(carrier)
+    assert extract_message(image, "correct horse") == message
+    assert read_header(image, "correct horse") == written
+    assert read_header(image) is None
+
+
+def test_keyed_stream_round_trip(carrier):
+    data = os.urandom(3000)
+    embed_stream_inplace(carrier, io.BytesIO(data), bits=2, key=b"k", chunk_size=512, compress=False)
+    image = reopen(carrier)
+    dest = io.BytesIO()
+    assert extract_stream(image, dest, chunk_size=512, key=b"k") == len(data)
+    assert dest.getvalue() == data
+
+
+def test_wrong_key_finds_nothing(carrier, tmp_path):
+    embed_message_inplace(carrier, "keyed", key="right")
+    image = reopen(carrier)
+    assert read_header(image, "wrong") is None
+    assert extract_message(image, "wrong") == NO_MESSAGE
+    assert extract_file(image, tmp_path / "out.bin", key="wrong") is None
+    assert not (tmp_path / "out.bin").exists()
+
+
+def test_located_payload_is_reused(carrier):
+    data = b"located " * 100
+    embed_message_inplace(carrier, data, 2, "k", compress=False)
+    image = reopen(carrier)
+    located = locate(image, "k")
+    assert located.header == read_header(image, "k")
+    assert extract_payload(image, located=located).data == data
+    dest = io.BytesIO()
+    extract_stream(image, dest, located=located)
+    assert dest.getvalue() == data
+
+
+def test_keyed_decode_checks_the_memory_budget(carrier, monkeypatch):
+    embed_message_inplace(carrier, "keyed", key="k")
+    image = reopen(carrier)
+    monkeypatch.setenv(MEMORY_BUDGET_ENV, "0.001")
+    with pytest.raises(MemoryBudgetError):
+        locate(image, "k")
+    assert image.tile, "the check comes before the decode"
@@ -0,0 +1,55 @@
+import json
+
+import numpy as np
+from PIL import Image
+
+from cipher_engine import training
+from cipher_engine.analysis import FEATURE_NAMES
+from cipher_engine.cli import main
+from cipher_engine.model import read_model
+from cipher_engine.training import carrier_samples, synthetic_samples, train_model
+
+from conftest import make_carrier
+
+
+def test_samples_do_not_depend_on_the_worker_count(monkeypatch):
+    monkeypatch.setattr(training, "CHUNK_SIZE", 16)
+    X1, y1, *_ = synthetic_samples(40, workers=1)
+    X2, y2, *_ = synthetic_samples(40, workers=2)
+    assert X1.shape == (40, len(FEATURE_NAMES))
+    assert np.array_equal(X1, X2) and np.array_equal(y1, y2)
+    assert y1.sum() == 20
+
+
+def test_unreadable_carriers_are_skipped(tmp_path):
+    paths = []
+    for i in range(2):
+        paths.append(tmp_path / f"img{i}.png")
+        Image.fromarray(make_carrier(seed=i)).save(paths[-1])
+    paths.append(tmp_path / "broken.png")
+    paths[-1].write_bytes(b"not a png")
+    X, y, _, _, skipped = carrier_samples(paths)
+    assert skipped == 1
+    assert y.tolist() == [0, 1, 0, 1]
+    _, report = train_model(n_synthetic=20, carriers=paths, n_estimators=2)
+    assert (report.samples, report.skipped) == (24, 1)
+
+
+def test_extend_forest_keeps_the_fitted_trees():
+    model, _ = train_model(n_synthetic=20, n_estimators=3)
+    first = list(model.estimators_)
+    extended, report = train_model(n_synthetic=20, n_estimators=2, base=model, seed=7)
+    assert len(extended.estimators_) == 5
+    assert extended.estimators_[:3] == first
+    assert report.samples == 20
+
+
+def test_train_and_update_from_the_cli(tmp_path, capsys):
+    path = tmp_path / "model.joblib"
+    train = ["-j", "1", "train", "--path", str(path), "--samples", "20"]
+    assert main([*train, "--update"]) == 2
+    assert main([*train, "--trees", "3"]) == 0
+    assert main([*train, "--trees", "2", "--update"]) == 0
+    records = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [r["trees"] for r in records] == [3, 5]
+    assert len(read_model(path).estimators_) == 5